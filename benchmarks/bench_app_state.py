@@ -0,0 +1,79 @@
+# coding: utf-8
+"""AppState lookup + reconcile cost on a synthetic 10k-anime / 50k-torrent state.
+
+Run from the repo root:  python benchmarks/bench_app_state.py [n_animes] [n_torrents]
+"""
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from ani_me_downloader.core.anime import Anime, EpStatus  # noqa: E402
+from ani_me_downloader.core.torrent import Torrent  # noqa: E402
+from ani_me_downloader.persistence.state_store import JsonStateStore  # noqa: E402
+from ani_me_downloader.state.app_state import AppState  # noqa: E402
+
+
+def _magnet(ih: str) -> str:
+    return f"magnet:?xt=urn:btih:{ih}&dn=x"
+
+
+def build(n_animes: int, n_torrents: int, seed: int = 1) -> tuple[list[Anime], list[Torrent]]:
+    rnd = random.Random(seed)
+    animes = [
+        Anime(id=i + 1, name=f"Show {i}", total_episodes=24, last_aired_episode=24)
+        for i in range(n_animes)
+    ]
+    torrents: list[Torrent] = []
+    for k in range(n_torrents):
+        ih = f"{k:040x}"
+        anime = animes[rnd.randrange(n_animes)]
+        ep = len(anime.episodes) + 1
+        anime.episodes.set(ep, EpStatus.DOWNLOADING, _magnet(ih))
+        torrents.append(Torrent(info_hash=ih, magnet=_magnet(ih), name=f"t{k}", save_path="",
+                                anime_ids={anime.id}))
+    return animes, torrents
+
+
+def _time(label: str, fn, repeat: int = 1) -> None:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:<32} {elapsed * 1000:10.3f} ms")
+
+
+def main() -> None:
+    n_animes = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    n_torrents = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+    animes, torrents = build(n_animes, n_torrents)
+    tmp = Path(tempfile.mkdtemp())
+    print(f"{n_animes} animes, {n_torrents} torrents")
+
+    state: AppState | None = None
+
+    def construct():
+        nonlocal state
+        state = AppState(
+            list(animes), list(torrents), JsonStateStore(tmp / "a.json", tmp / "t.json")
+        )
+
+    _time("build indexes", construct)
+    rnd = random.Random(2)
+    ids = [rnd.randrange(1, n_animes + 1) for _ in range(10_000)]
+    hashes = [f"{rnd.randrange(n_torrents):040x}" for _ in range(10_000)]
+    _time("10k get_anime", lambda: [state.get_anime(i) for i in ids])
+    _time("10k get_torrent", lambda: [state.get_torrent(h) for h in hashes])
+    _time("10k episodes_for", lambda: [state.episodes_for(h) for h in hashes])
+    _time("reconcile (nothing missing)", state.reconcile)
+    for h in hashes[:1000]:
+        state.remove_torrent(h)
+    _time("reconcile (recover <=1k rows)", state.reconcile)
+    state.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# coding: utf-8
+"""Nyaa result parsing: RSS feed vs HTML listing, over recorded fixtures.
+
+Run from the repo root:
+
+    python benchmarks/bench_nyaa_parse.py
+    python benchmarks/bench_nyaa_parse.py --repeat 50
+
+`fixtures/nyaa_search.rss` and `fixtures/nyaa_search.html` are the two
+forms of the same 75-row, seeder-sorted search page. Both parsers must
+agree on titles, sizes, seeders and info hashes before anything is timed.
+Reports the best of `--repeat` runs, in milliseconds."""
+import argparse
+import sys
+from pathlib import Path
+
+import synthetic  # noqa: F401  (puts src/ on sys.path)
+from bench_persistence import measure
+
+from ani_me_downloader.core.identity import info_hash_from_magnet  # noqa: E402
+from ani_me_downloader.search.nyaa import parse_html, parse_rss  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+CHUNK = 64 * 1024
+
+
+def _chunks(raw: bytes) -> list[bytes]:
+    return [raw[i:i + CHUNK] for i in range(0, len(raw), CHUNK)]
+
+
+def _key(r) -> tuple:
+    return r.title, r.size, r.seeds, info_hash_from_magnet(r.magnet)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    rss = _chunks((FIXTURES / "nyaa_search.rss").read_bytes())
+    html = (FIXTURES / "nyaa_search.html").read_text(encoding="utf-8")
+
+    from_rss, from_html = parse_rss(rss), parse_html(html)
+    if not from_rss or [_key(r) for r in from_rss] != [_key(r) for r in from_html]:
+        print("RSS and HTML parsers disagree on the fixtures", file=sys.stderr)
+        return 1
+
+    cases = {
+        "nyaa.parse_rss": measure(lambda: parse_rss(rss), repeat=args.repeat),
+        "nyaa.parse_html": measure(lambda: parse_html(html), repeat=args.repeat),
+    }
+    print(f"{'case':<20} {'ms':>10} {'rows':>6}")
+    for name, seconds in cases.items():
+        print(f"{name:<20} {seconds * 1000:10.2f} {len(from_rss):6d}")
+    print(f"speedup {cases['nyaa.parse_html'] / cases['nyaa.parse_rss']:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
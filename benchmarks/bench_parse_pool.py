@@ -0,0 +1,80 @@
+# coding: utf-8
+"""GUI-thread stalls while a worker thread parses Nyaa HTML pages.
+
+Run from the repo root:
+
+    python benchmarks/bench_parse_pool.py
+    python benchmarks/bench_parse_pool.py --pages 40 --workers 2
+
+Stands in for the app's event loop with a main-thread loop that asks to
+wake every `--frame-ms` and records how late each wake-up is. Meanwhile
+a worker thread parses `fixtures/nyaa_search.html` `--pages` times, the
+way a search pass would: once in-thread, once through the parse pool.
+Lateness is GIL wait; the report gives the worst and 99th-percentile
+frame delay and the number of frames over 16 ms for each mode."""
+import argparse
+import sys
+import threading
+import time
+from pathlib import Path
+
+import synthetic  # noqa: F401  (puts src/ on sys.path)
+
+from ani_me_downloader.core import parse_pool  # noqa: E402
+from ani_me_downloader.search.nyaa import parse_html_rows  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+FRAME_BUDGET = 0.016
+
+
+def stalls(raw: bytes, pages: int, frame: float) -> tuple[list[float], float]:
+    """Frame delays in seconds while `pages` parses run, and their wall time."""
+    done = threading.Event()
+
+    def parse_all():
+        for _ in range(pages):
+            parse_pool.run(parse_html_rows, raw)
+        done.set()
+
+    delays: list[float] = []
+    start = time.perf_counter()
+    threading.Thread(target=parse_all, daemon=True).start()
+    while not done.is_set():
+        due = time.perf_counter() + frame
+        time.sleep(frame)
+        delays.append(max(0.0, time.perf_counter() - due))
+    return delays, time.perf_counter() - start
+
+
+def _report(name: str, delays: list[float], wall: float) -> None:
+    ordered = sorted(delays)
+    p99 = ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))]
+    over = sum(d > FRAME_BUDGET for d in delays)
+    print(f"{name:<12} {ordered[-1] * 1000:9.1f} {p99 * 1000:9.1f} {over:6d} {wall * 1000:9.0f}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--frame-ms", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    raw = (FIXTURES / "nyaa_search.html").read_bytes()
+    frame = args.frame_ms / 1000
+
+    print(f"{'mode':<12} {'max ms':>9} {'p99 ms':>9} {'>16ms':>6} {'wall ms':>9}")
+    _report("in-thread", *stalls(raw, args.pages, frame))
+    if not parse_pool.start(args.workers):
+        print("Process pool unavailable on this platform", file=sys.stderr)
+        return 1
+    parse_pool.run(parse_html_rows, raw)  # wait out the warm-up
+    try:
+        _report("pool", *stalls(raw, args.pages, frame))
+    finally:
+        parse_pool.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+# coding: utf-8
+"""Persistence benchmark suite over synthetic libraries (see synthetic.py).
+
+Run from the repo root:
+
+    python benchmarks/bench_persistence.py                  # 100, 1k, 10k anime
+    python benchmarks/bench_persistence.py --sizes 100,1000 --out results.json
+    python benchmarks/bench_persistence.py --update-baseline
+    python benchmarks/bench_persistence.py --strict         # exit 1 on regression
+
+Each case reports the best of `--repeat` runs, in seconds. Results are
+written as JSON and compared against `benchmarks/baseline.json`. A case
+slower than baseline by more than `--threshold` and by at least
+`--min-delta` seconds is reported as a regression; only `--strict` turns
+that into exit status 1. The stored baseline is one machine's numbers:
+refresh it with `--update-baseline` before gating on another machine.
+"""
+import argparse
+import copy
+import json
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic import make_library, magnet
+
+from ani_me_downloader.core.anime import EpStatus  # noqa: E402
+from ani_me_downloader.core.torrent import Torrent  # noqa: E402
+from ani_me_downloader.persistence.anime_repo import AnimeRepository, anime_to_json  # noqa: E402
+from ani_me_downloader.persistence.state_store import JsonStateStore  # noqa: E402
+from ani_me_downloader.persistence.torrent_repo import TorrentRepository  # noqa: E402
+from ani_me_downloader.state.app_state import AppState  # noqa: E402
+from ani_me_downloader.state.merge import merge_anime  # noqa: E402
+
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+
+def measure(fn, *, setup=None, repeat: int = 3) -> float:
+    """Best wall time of `fn(setup())` over `repeat` runs; setup is untimed."""
+    best = float("inf")
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        fn(arg) if setup else fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_size(n: int, repeat: int) -> dict[str, float]:
+    animes, torrents = make_library(n)
+    tmp = Path(tempfile.mkdtemp(prefix=f"bench-{n}-"))
+    anime_file = tmp / "anime_file.json"
+    out: dict[str, float] = {}
+
+    def fresh_repo(_=None):
+        for p in tmp.glob("anime_file.json*"):
+            p.unlink()
+        return AnimeRepository(anime_file)
+
+    out["anime_repo.save.initial"] = measure(
+        lambda repo: repo.save(animes), setup=fresh_repo, repeat=repeat
+    )
+    rows = [anime_to_json(a) for a in animes]
+    out["anime_repo.compact"] = measure(
+        lambda: AnimeRepository(anime_file).compact(rows, 1), repeat=repeat
+    )
+
+    def loaded_repo():
+        repo = AnimeRepository(anime_file)
+        return repo, repo.load()
+
+    out["anime_repo.load"] = measure(lambda: AnimeRepository(anime_file).load(), repeat=repeat)
+    out["anime_repo.load+decode"] = measure(
+        lambda: [a.episodes.materialize() for a in AnimeRepository(anime_file).load()],
+        repeat=repeat,
+    )
+
+    def save_one_change(arg):
+        repo, loaded = arg
+        loaded[len(loaded) // 2].episodes.set(1, EpStatus.DONE)
+        loaded[len(loaded) // 2].next_eta += 1
+        repo.save(loaded)
+
+    out["anime_repo.save.one_change"] = measure(save_one_change, setup=loaded_repo, repeat=repeat)
+
+    # Every tenth torrent repeated under a second owner, as torrents_dedup sees
+    # after a batch and its episodes resolve to the same info_hash.
+    def with_dupes():
+        rows = [copy.copy(t) for t in torrents]
+        rows += [
+            Torrent(info_hash=t.info_hash, magnet=t.magnet, name=t.name,
+                    save_path=t.save_path, anime_ids={-1})
+            for t in torrents[::10]
+        ]
+        return rows
+
+    out["torrent_repo.save"] = measure(
+        lambda rows: TorrentRepository(tmp / "torrent_file.json").save(rows),
+        setup=with_dupes, repeat=repeat,
+    )
+
+    def state_missing_torrents():
+        kept = [t for i, t in enumerate(torrents) if i % 10]
+        return AppState(animes, kept, JsonStateStore(tmp / "a.json", tmp / "t.json"))
+
+    def reconcile(state):
+        state.reconcile()
+        state.close()
+
+    out["app_state.reconcile"] = measure(reconcile, setup=state_missing_torrents, repeat=repeat)
+
+    def pass_results():
+        current = copy.deepcopy(animes)
+        updated = copy.deepcopy(animes)
+        for k, a in enumerate(updated):
+            a.next_eta += 60
+            if k % 10 == 0 and a.last_aired_episode < a.total_episodes:
+                a.last_aired_episode += 1
+                n = a.last_aired_episode
+                a.episodes.set(n, EpStatus.DOWNLOADING, magnet(f"{k:020x}{n:020x}"))
+        return current, updated
+
+    out["merge_anime"] = measure(
+        lambda arg: [merge_anime(c, u) for c, u in zip(*arg)],
+        setup=pass_results, repeat=repeat,
+    )
+    out["anime.pending_eps"] = measure(
+        lambda: [a.pending_eps() for a in animes], repeat=repeat
+    )
+    return {f"{name}[{n}]": seconds for name, seconds in out.items()}
+
+
+def compare(results: dict[str, float], baseline: dict[str, float],
+            threshold: float, min_delta: float) -> list[str]:
+    regressions = []
+    print(f"{'case':<42} {'ms':>10} {'baseline':>10} {'ratio':>7}")
+    for name, seconds in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<42} {seconds * 1000:10.2f} {'-':>10} {'-':>7}")
+            continue
+        ratio = seconds / base if base else float("inf")
+        flag = ""
+        if ratio > 1 + threshold and seconds - base > min_delta:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<42} {seconds * 1000:10.2f} {base * 1000:10.2f} {ratio:7.2f}{flag}")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100,1000,10000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", default="bench-results.json")
+    parser.add_argument("--baseline", default=str(BASELINE))
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown ratio over baseline (0.25 = 25%%)")
+    parser.add_argument("--min-delta", type=float, default=0.005,
+                        help="ignore slowdowns smaller than this many seconds")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--strict", action="store_true",
+                        help="exit with status 1 when a case regressed")
+    args = parser.parse_args(argv)
+
+    results: dict[str, float] = {}
+    for n in (int(s) for s in args.sizes.split(",")):
+        print(f"-- {n} anime", file=sys.stderr)
+        results.update(run_size(n, args.repeat))
+
+    doc = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    Path(args.out).write_text(json.dumps(doc, indent=2), encoding="utf-8")
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        baseline_path.write_text(json.dumps(doc, indent=2), encoding="utf-8")
+        print(f"Baseline written to {baseline_path}")
+        return 0
+    try:
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))["results"]
+    except (OSError, ValueError, KeyError):
+        print(f"No baseline at {baseline_path}; run with --update-baseline", file=sys.stderr)
+        baseline = {}
+    regressions = compare(results, baseline, args.threshold, args.min_delta)
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}", file=sys.stderr)
+    return 1 if regressions and args.strict else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
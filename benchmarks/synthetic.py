@@ -0,0 +1,77 @@
+# coding: utf-8
+"""Deterministic synthetic libraries for the benchmarks.
+
+Episode counts run from 10 to 2000 per anime, skewed the way real
+libraries are: most entries are 12-26 episode seasons, one in ten is a
+long runner. Episodes are mostly done, with a few in flight (holding a
+magnet and a matching Torrent) and gaps left to download."""
+import math
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from ani_me_downloader.core.anime import (  # noqa: E402
+    AiringStatus,
+    Anime,
+    DownloadMode,
+    EpStatus,
+)
+from ani_me_downloader.core.torrent import Torrent  # noqa: E402
+
+MIN_EPISODES = 10
+MAX_EPISODES = 2000
+
+
+def magnet(info_hash: str) -> str:
+    return f"magnet:?xt=urn:btih:{info_hash}&dn=synthetic"
+
+
+def _episode_count(rnd: random.Random) -> int:
+    if rnd.random() < 0.9:
+        return rnd.randint(MIN_EPISODES, 26)
+    return int(math.exp(rnd.uniform(math.log(27), math.log(MAX_EPISODES))))
+
+
+def make_library(n_animes: int, seed: int = 1) -> tuple[list[Anime], list[Torrent]]:
+    rnd = random.Random(seed)
+    animes: list[Anime] = []
+    torrents: list[Torrent] = []
+    for i in range(n_animes):
+        total = _episode_count(rnd)
+        aired = total if rnd.random() < 0.7 else rnd.randint(1, total)
+        anime = Anime(
+            id=100_000 + i,
+            name=f"Synthetic Show {i}",
+            search_name=f"synthetic show {i}",
+            output_dir=f"/library/show-{i}",
+            img=f"https://img.example/{i}.jpg",
+            status=AiringStatus.FINISHED if aired == total else AiringStatus.RELEASING,
+            next_eta=0 if aired == total else 1_700_000_000 + i,
+            last_aired_episode=aired,
+            total_episodes=total,
+        )
+        if total > 500 and rnd.random() < 0.5:
+            anime.download_mode = DownloadMode.TRACK_ONLY
+            for n in range(1, aired + 1):
+                anime.episodes.set(n, EpStatus.TRACK_ONLY)
+            animes.append(anime)
+            continue
+
+        done_to = rnd.randint(0, aired)
+        for n in range(1, done_to + 1):
+            if rnd.random() < 0.97:
+                anime.episodes.set(n, EpStatus.DONE)
+        for n in range(done_to + 1, min(aired, done_to + rnd.randint(0, 3)) + 1):
+            ih = f"{i:024x}{n:016x}"
+            anime.episodes.set(n, EpStatus.DOWNLOADING, magnet(ih))
+            torrents.append(Torrent(
+                info_hash=ih,
+                magnet=magnet(ih),
+                name=f"{anime.name} - {n:02d}",
+                save_path=anime.output_dir,
+                anime_ids={anime.id},
+            ))
+        animes.append(anime)
+    return animes, torrents
@@ -1,4 +1,9 @@
+import multiprocessing
+
 from ani_me_downloader.app import main
 
 if __name__ == "__main__":
+    # Parse-pool workers re-run the entry point; in a frozen build this
+    # turns them into workers instead of second copies of the app.
+    multiprocessing.freeze_support()
     main()
@@ -1,6 +1,7 @@
 """
 A simple and beautiful anime downloader and streamer.
 """
+import logging
 import os
 import sys
 import warnings
@@ -16,8 +17,16 @@ from PyQt5.QtWidgets import QApplication, QSplashScreen
 
 from .config.config import cfg
 from .config.paths import data_dir
-from .persistence.anime_repo import AnimeRepository
-from .persistence.torrent_repo import TorrentRepository
+from .core import parse_pool
+from .metadata import orchestrator
+from .metadata.cache import MetadataCache
+from .persistence.sqlite_store import (
+    SqliteStateStore,
+    SqliteStore,
+    export_json,
+    import_json,
+)
+from .persistence.state_store import JsonStateStore
 from .services.coordinator import Coordinator
 from .state.app_state import AppState
 from .view.main_window import MainWindow
@@ -27,10 +36,28 @@ def get_r_path(path):
     return str(Path(__file__).joinpath("../resources").resolve().joinpath(path))
 
 
+def _state_store():
+    """Group-commit store for the configured storage backend. After a switch
+    of backend, the library is first copied over from the other one."""
+    files = cfg.animeFile.value, cfg.torrentFile.value
+    if cfg.storageBackend.value == "sqlite":
+        store = SqliteStore(cfg.databaseFile.value)
+        import_json(store, *files)
+        return SqliteStateStore(store)
+    if os.path.exists(cfg.databaseFile.value):
+        store = SqliteStore(cfg.databaseFile.value)
+        try:
+            export_json(store, *files)
+        finally:
+            store.close()
+    return JsonStateStore(*files)
+
+
 def main():
     warnings.filterwarnings("ignore", category=DeprecationWarning, module="sip")
     warnings.filterwarnings("ignore", message=".*sipPyTypeDict.*")
     warnings.filterwarnings("ignore", message=".*sipPyTypeDictRef.*")
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
 
     try:
         from ctypes import windll
@@ -56,20 +83,45 @@ def main():
     splash = QSplashScreen(QPixmap(get_r_path("logo.png")))
     splash.show()
     app.processEvents()
+    parse_pool.start(cfg.parseWorkers.value)
 
     if not os.path.exists(data_dir):
         from .setup import setup
         setup(cfg)
 
+    orchestrator.use_cache(MetadataCache(
+        cfg.metadataCacheFile.value,
+        ttl={
+            "airing": lambda: cfg.metadataAiringTtlMinutes.value * 60,
+            "search": lambda: cfg.metadataSearchTtlHours.value * 3600,
+        },
+    ))
     state = AppState.load(
-        anime_repo=AnimeRepository(cfg.animeFile.value),
-        torrent_repo=TorrentRepository(cfg.torrentFile.value),
+        _state_store(), coalesce_seconds=cfg.saveCoalesceMs.value / 1000
     )
     coordinator = Coordinator(
         state,
         use_proxy=lambda: cfg.useProxy.value,
-        tick_interval=lambda: cfg.checkEpisodeInterval.value,
+        sweep_interval=lambda: cfg.sweepInterval.value,
         max_concurrent=cfg.maxConcurrentDownloads.value,
+        resume_file=cfg.resumeFile.value,
+        search_backend=lambda: cfg.searchBackend.value,
+        feed_file=cfg.feedStateFile.value,
+        feed_polling=lambda: cfg.feedPolling.value,
+        feed_uploaders=lambda: cfg.feedUploaders.value,
+        backfill_seconds=lambda: cfg.backfillHours.value * 3600,
+        search_cache_ttl=lambda: cfg.searchCacheTtl.value,
+        page_budget=lambda: cfg.searchPageBudget.value,
+        rules_file=cfg.uploaderRulesFile.value,
+        search_workers=lambda: cfg.searchWorkers.value,
+        max_per_host=lambda: cfg.maxPerHost.value,
+        hedge_requests=lambda: cfg.hedgeRequests.value,
+        miss_file=cfg.missCacheFile.value,
+        miss_backoff_seconds=lambda: cfg.missBackoffMinutes.value * 60,
+        miss_backoff_max_seconds=lambda: cfg.missBackoffMaxHours.value * 3600,
+        release_grace_seconds=lambda: cfg.releaseGraceMinutes.value * 60,
+        burst_window_seconds=lambda: cfg.burstWindowMinutes.value * 60,
+        burst_budget_per_hour=lambda: cfg.burstBudgetPerHour.value,
         compress_videos=lambda: cfg.compressVideos.value,
         compress_use_cuda=lambda: cfg.compressUseCuda.value,
     )
@@ -86,3 +138,6 @@ def main():
 
     splash.finish(main_window)
     app.exec_()
+    orchestrator.flush_cache()
+    state.close()
+    parse_pool.shutdown()
@@ -85,18 +85,18 @@ def _build_cells(anime: Anime) -> list[_Cell]:
 
     For ongoing shows where total_episodes is unknown/zero, falls back to
     last_aired_episode + a small lookahead so the grid is never empty."""
-    by_ep = {e.ep: e for e in anime.episodes if e.ep > 0}
+    eps = anime.episodes
     aired_cap = anime.last_aired_episode
     declared_total = anime.total_episodes
     # Defensive: if total is missing/zero, derive a reasonable upper bound
     # so the grid still shows something useful.
-    effective_total = declared_total or max(aired_cap, max(by_ep, default=0))
+    effective_total = declared_total or max(aired_cap, eps.max_ep())
     upper = anime.ep_to or effective_total or 1
     lower = max(1, anime.ep_from)
     is_episodes = anime.download_mode is DownloadMode.EPISODES
     cells: list[_Cell] = []
     for n in range(1, max(1, effective_total) + 1):
-        rec = by_ep.get(n)
+        rec = eps.get(n)
         if rec is not None:
             cells.append(_Cell(n, _record_key(rec), rec))
             continue
@@ -251,7 +251,7 @@ class EpisodeGridDialog(MaskDialogBase, Ui_MessageBox):
         return cells[start:end]
 
     def _build_batch_placeholder(self, body: QVBoxLayout) -> None:
-        rec = next((e for e in self.anime.episodes if e.ep == 0), None)
+        rec = self.anime.episodes.get(0)
         if rec is None:
             label = "Batch download — no torrent attached yet."
         elif rec.status is EpStatus.BATCH_DONE:
@@ -293,22 +293,21 @@ class EpisodeGridDialog(MaskDialogBase, Ui_MessageBox):
         prev = cell.key
         if prev == _KEY_TRACK_ONLY:
             # Remove record (if any) → derived. QUEUED if aired, NOT_AIRED otherwise.
-            self.anime.episodes = [e for e in self.anime.episodes if e.ep != cell.ep]
+            self.anime.episodes.discard(cell.ep)
             cell.record = None
             cell.key = (
                 _KEY_QUEUED if cell.ep <= self.anime.last_aired_episode else _KEY_NOT_AIRED
             )
         elif prev == _KEY_QUEUED:
-            rec = EpState(ep=cell.ep, status=EpStatus.DONE, magnet=None)
-            self.anime.episodes.append(rec)
-            cell.record = rec
+            self.anime.episodes.set(cell.ep, EpStatus.DONE)
+            cell.record = self.anime.episodes.get(cell.ep)
             cell.key = _KEY_DONE
         elif prev == _KEY_DONE:
             if cell.record is None:
                 # Defensive: shouldn't happen — DONE always has a record after the QUEUED→DONE transition above.
                 return
-            cell.record.status = EpStatus.TRACK_ONLY
-            cell.record.magnet = None
+            self.anime.episodes.set(cell.ep, EpStatus.TRACK_ONLY)
+            cell.record = self.anime.episodes.get(cell.ep)
             cell.key = _KEY_TRACK_ONLY
         else:
             return
@@ -319,7 +318,7 @@ class EpisodeGridDialog(MaskDialogBase, Ui_MessageBox):
         if self.coordinator is None:
             return
         try:
-            self.coordinator.state.save_animes()
+            self.coordinator.state.save()
             self.coordinator.animes_changed.emit()
         except Exception:
             pass
@@ -31,15 +31,53 @@ class Config(QConfig):
     """Application config (persisted to ~/.Ani-Me-Downloader/config.json)."""
 
     downloadFolder = ConfigItem("Folders", "Download", download_dir, FolderValidator())
+    # Fixed check tick from before airing-time scheduling; a custom value is
+    # carried over to SweepInterval once at startup (see _migrate).
     checkEpisodeInterval = RangeConfigItem(
         "Download", "CheckEpisodeInterval", 3600, RangeValidator(60, 86400)
     )
+    # Full pass over the library; anime are otherwise checked when they air.
+    sweepInterval = RangeConfigItem(
+        "Download", "SweepInterval", 21600, RangeValidator(60, 86400)
+    )
+    releaseGraceMinutes = RangeConfigItem(
+        "Download", "ReleaseGraceMinutes", 15, RangeValidator(0, 360)
+    )
+    # Retry a just-aired episode at growing steps until this long after airing.
+    burstWindowMinutes = RangeConfigItem(
+        "Download", "BurstWindowMinutes", 180, RangeValidator(0, 720)
+    )
+    burstBudgetPerHour = RangeConfigItem(
+        "Download", "BurstBudgetPerHour", 60, RangeValidator(0, 600)
+    )
     maxConcurrentDownloads = RangeConfigItem(
         "Download", "MaxConcurrentDownloads", 2, RangeValidator(1, 10)
     )
 
     animeFile = ConfigItem("Folders", "AnimeFile", os.path.join(data_dir, "anime_file.json"))
     torrentFile = ConfigItem("Folders", "TorrentFile", os.path.join(data_dir, "torrent_file.json"))
+    databaseFile = ConfigItem("Folders", "DatabaseFile", os.path.join(data_dir, "library.db"))
+    resumeFile = ConfigItem("Folders", "ResumeFile", os.path.join(data_dir, "resume.db"))
+    uploaderRulesFile = ConfigItem(
+        "Folders", "UploaderRulesFile", os.path.join(data_dir, "uploader_rules.json")
+    )
+    missCacheFile = ConfigItem(
+        "Folders", "MissCacheFile", os.path.join(data_dir, "search_misses.json")
+    )
+    feedStateFile = ConfigItem("Folders", "FeedStateFile", os.path.join(data_dir, "feed_state.json"))
+    metadataCacheFile = ConfigItem(
+        "Folders", "MetadataCacheFile", os.path.join(data_dir, "metadata_cache.json")
+    )
+    storageBackend = OptionsConfigItem(
+        "Persistence",
+        "Backend",
+        "json",
+        OptionsValidator(["json", "sqlite"]),
+        restart=True,
+    )
+    saveCoalesceMs = RangeConfigItem(
+        "Persistence", "SaveCoalesceMs", 250, RangeValidator(0, 5000)
+    )
 
     minimizeToTray = ConfigItem("MainWindow", "MinimizeToTray", False, BoolValidator())
     showNotification = ConfigItem("MainWindow", "ShowNotification", True, BoolValidator())
@@ -64,6 +102,37 @@ class Config(QConfig):
     compressVideos = ConfigItem("Compression", "CompressVideos", False, BoolValidator())
     compressUseCuda = ConfigItem("Compression", "CompressUseCuda", True, BoolValidator())
 
+    searchBackend = OptionsConfigItem(
+        "Search", "Backend", "html", OptionsValidator(["html", "rss"])
+    )
+    feedPolling = ConfigItem("Search", "FeedPolling", True, BoolValidator())
+    feedUploaders = ConfigItem("Search", "FeedUploaders", [])
+    backfillHours = RangeConfigItem("Search", "BackfillHours", 24, RangeValidator(1, 168))
+    searchPageBudget = RangeConfigItem("Search", "PageBudget", 3, RangeValidator(1, 10))
+    searchWorkers = RangeConfigItem("Search", "Workers", 4, RangeValidator(1, 16))
+    maxPerHost = RangeConfigItem("Search", "MaxPerHost", 4, RangeValidator(1, 16))
+    missBackoffMinutes = RangeConfigItem(
+        "Search", "MissBackoffMinutes", 30, RangeValidator(1, 1440)
+    )
+    missBackoffMaxHours = RangeConfigItem(
+        "Search", "MissBackoffMaxHours", 48, RangeValidator(1, 720)
+    )
+    hedgeRequests = ConfigItem("Search", "HedgeRequests", True, BoolValidator())
+    searchCacheTtl = RangeConfigItem(
+        "Search", "CacheTtlSeconds", 600, RangeValidator(0, 3600)
+    )
+    # 0 parses pages in the searching thread instead of worker processes.
+    parseWorkers = RangeConfigItem(
+        "Search", "ParseWorkers", 1, RangeValidator(0, 4), restart=True
+    )
+
+    metadataAiringTtlMinutes = RangeConfigItem(
+        "Metadata", "AiringTtlMinutes", 10, RangeValidator(0, 1440)
+    )
+    metadataSearchTtlHours = RangeConfigItem(
+        "Metadata", "SearchTtlHours", 24, RangeValidator(0, 720)
+    )
+
     useProxy = ConfigItem("Miscellaneous", "UseProxy", True, BoolValidator())
     pingUrl = ConfigItem("Miscellaneous", "PingUrl", "https://example.com/")
     firstTime = ConfigItem("Miscellaneous", "FirstTime", True)
@@ -73,5 +142,17 @@ class Config(QConfig):
     themeColor = ColorConfigItem("QFluentWidgets", "ThemeColor", "#29f1ff")
 
 
+def _migrate(config: Config) -> None:
+    """CheckEpisodeInterval used to be how often every anime was checked.
+    A value the user changed becomes the sweep interval, and the old key
+    goes back to its default so this runs once."""
+    legacy = config.checkEpisodeInterval
+    if legacy.value == legacy.defaultValue:
+        return
+    config.set(config.sweepInterval, legacy.value, save=False)
+    config.set(legacy, legacy.defaultValue)
+
+
 cfg = Config()
 qconfig.load(os.path.join(data_dir, "config.json"), cfg)
+_migrate(cfg)
@@ -1,7 +1,11 @@
 # coding: utf-8
 """Anime dataclass + episode/airing enums. No PyQt."""
+import copy
+import threading
+from bisect import bisect_right
 from dataclasses import dataclass, field
 from enum import Enum
+from typing import Callable, Iterable, Iterator
 
 try:
     from enum import StrEnum
@@ -53,6 +57,302 @@ class EpState:
     magnet: str | None = None
 
 
+# Serializes deferred EpisodeSet decodes between the GUI thread and the
+# background materializer.
+_DECODE_LOCK = threading.Lock()
+
+
+class EpisodeSet:
+    """Compact per-anime episode records.
+
+    Stored as sorted, non-overlapping inclusive runs `(start, end, status)`
+    with adjacent equal-status runs merged, plus a sparse ep → magnet table.
+    A 2000-episode track_only show is one run. Iteration yields fresh
+    `EpState` snapshots in episode order; mutate through `set`/`discard`,
+    never through a yielded EpState.
+
+    A set built with `deferred` holds only a loader and optional per-status
+    counts until first touched; `count` answers from those counts without
+    decoding. It remembers that loader as its origin once decoded.
+
+    `revision` counts `set`/`discard` calls, so a holder can tell whether
+    the set changed since it last looked without comparing contents."""
+
+    __slots__ = (
+        "_starts", "_ends", "_status", "_magnets", "_loader", "_counts", "_origin", "revision",
+    )
+
+    def __init__(self, states: Iterable[EpState] = ()):
+        self._loader: Callable[[], EpisodeSet] | None = None
+        self._counts: dict[EpStatus, int] | None = None
+        self._origin: Callable[[], EpisodeSet] | None = None
+        self.revision = 0
+        self._starts: list[int] = []
+        self._ends: list[int] = []
+        self._status: list[EpStatus] = []
+        self._magnets: dict[int, str] = {}
+        by_ep = {s.ep: s for s in states}
+        for n in sorted(by_ep):
+            st = by_ep[n]
+            if self._ends and self._ends[-1] == n - 1 and self._status[-1] is st.status:
+                self._ends[-1] = n
+            else:
+                self._starts.append(n)
+                self._ends.append(n)
+                self._status.append(st.status)
+            if st.magnet:
+                self._magnets[n] = st.magnet
+
+    @classmethod
+    def from_range(cls, first: int, last: int, status: EpStatus) -> "EpisodeSet":
+        out = cls()
+        if first <= last:
+            out._assign(first, last, status)
+        return out
+
+    @classmethod
+    def from_runs(
+        cls,
+        runs: Iterable[tuple[int, int, EpStatus]],
+        magnets: dict[int, str] | None = None,
+    ) -> "EpisodeSet":
+        """Rebuild from `runs()` / `magnets()` output. Runs already sorted
+        and merged are adopted as-is; anything else goes through `_assign`."""
+        out = cls()
+        starts, ends, stats = out._starts, out._ends, out._status
+        for first, last, status in runs:
+            if first <= last and (not ends or (first > ends[-1] + 1 or (
+                    first == ends[-1] + 1 and status is not stats[-1]))):
+                starts.append(first)
+                ends.append(last)
+                stats.append(status)
+            else:
+                out._assign(first, last, status)
+        for n, magnet in (magnets or {}).items():
+            if magnet and n in out:
+                out._magnets[n] = magnet
+        return out
+
+    @classmethod
+    def deferred(
+        cls,
+        loader: "Callable[[], EpisodeSet]",
+        counts: dict[EpStatus, int] | None = None,
+    ) -> "EpisodeSet":
+        """Decode on first access via `loader()`. `counts` (status → episodes)
+        lets `count` answer before that."""
+        out = cls.__new__(cls)
+        out._starts, out._ends, out._status, out._magnets = [], [], [], {}
+        out._loader = loader
+        out._counts = counts
+        out._origin = loader
+        out.revision = 0
+        return out
+
+    @property
+    def is_deferred(self) -> bool:
+        return self._loader is not None
+
+    def derives_from(self, other: "EpisodeSet") -> bool:
+        """This set was copied from `other` while both were deferred, and
+        `other` still is: `other` holds exactly what this set started from."""
+        loader = other._loader
+        return loader is not None and self._origin is loader
+
+    def materialize(self) -> None:
+        """Run the pending loader, if any. Safe to call from any thread."""
+        if self._loader is None:
+            return
+        with _DECODE_LOCK:
+            loader = self._loader
+            if loader is None:
+                return
+            src = loader()
+            self._starts, self._ends = src._starts, src._ends
+            self._status, self._magnets = src._status, src._magnets
+            self._counts = None
+            self._loader = None
+
+    def copy(self) -> "EpisodeSet":
+        """Independent copy. A deferred set stays deferred: the copy gets the
+        same loader, which builds a new set on each call."""
+        with _DECODE_LOCK:
+            if self._loader is not None:
+                return EpisodeSet.deferred(self._loader, self._counts)
+        out = EpisodeSet()
+        out._starts, out._ends = list(self._starts), list(self._ends)
+        out._status, out._magnets = list(self._status), dict(self._magnets)
+        return out
+
+    def __deepcopy__(self, memo) -> "EpisodeSet":
+        self.materialize()
+        out = EpisodeSet()
+        out._starts, out._ends = list(self._starts), list(self._ends)
+        out._status, out._magnets = list(self._status), dict(self._magnets)
+        return out
+
+    def __iter__(self) -> Iterator[EpState]:
+        if self._loader is not None:
+            self.materialize()
+        magnets = self._magnets
+        for start, end, status in zip(self._starts, self._ends, self._status):
+            for n in range(start, end + 1):
+                yield EpState(ep=n, status=status, magnet=magnets.get(n))
+
+    def __len__(self) -> int:
+        if self._loader is not None:
+            self.materialize()
+        return sum(e - s + 1 for s, e in zip(self._starts, self._ends))
+
+    def __bool__(self) -> bool:
+        if self._loader is not None:
+            self.materialize()
+        return bool(self._starts)
+
+    def __contains__(self, ep: int) -> bool:
+        if self._loader is not None:
+            self.materialize()
+        return self._find(ep) >= 0
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, EpisodeSet):
+            return NotImplemented
+        loader = self._loader
+        if loader is not None and loader is other._loader:
+            return True
+        self.materialize()
+        other.materialize()
+        return (
+            self._starts == other._starts
+            and self._ends == other._ends
+            and self._status == other._status
+            and self._magnets == other._magnets
+        )
+
+    def __repr__(self) -> str:
+        if self._loader is not None:
+            return "EpisodeSet(<deferred>)"
+        runs = ", ".join(
+            f"{s}-{e}:{st.value}" if s != e else f"{s}:{st.value}"
+            for s, e, st in self.runs()
+        )
+        return f"EpisodeSet([{runs}], magnets={len(self._magnets)})"
+
+    def runs(self) -> list[tuple[int, int, EpStatus]]:
+        if self._loader is not None:
+            self.materialize()
+        return list(zip(self._starts, self._ends, self._status))
+
+    def get(self, ep: int) -> EpState | None:
+        if self._loader is not None:
+            self.materialize()
+        i = self._find(ep)
+        if i < 0:
+            return None
+        return EpState(ep=ep, status=self._status[i], magnet=self._magnets.get(ep))
+
+    def set(self, ep: int, status: EpStatus, magnet: str | None = None) -> None:
+        if self._loader is not None:
+            self.materialize()
+        self._assign(ep, ep, status)
+        if magnet:
+            self._magnets[ep] = magnet
+        else:
+            self._magnets.pop(ep, None)
+        self.revision += 1
+
+    def discard(self, ep: int) -> None:
+        if self._loader is not None:
+            self.materialize()
+        self._assign(ep, ep, None)
+        self._magnets.pop(ep, None)
+        self.revision += 1
+
+    def count(self, status: EpStatus) -> int:
+        if self._loader is not None:
+            if self._counts is not None:
+                return self._counts.get(status, 0)
+            self.materialize()
+        return sum(
+            e - s + 1
+            for s, e, st in zip(self._starts, self._ends, self._status)
+            if st is status
+        )
+
+    def status_counts(self) -> dict[EpStatus, int]:
+        """status → number of episodes. Served from the hint while deferred."""
+        if self._loader is not None:
+            if self._counts is not None:
+                return dict(self._counts)
+            self.materialize()
+        out: dict[EpStatus, int] = {}
+        for s, e, st in zip(self._starts, self._ends, self._status):
+            out[st] = out.get(st, 0) + e - s + 1
+        return out
+
+    def magnets(self) -> dict[int, str]:
+        """ep → magnet for every record holding one. Read-only view."""
+        if self._loader is not None:
+            self.materialize()
+        return self._magnets
+
+    def max_ep(self) -> int:
+        if self._loader is not None:
+            self.materialize()
+        return self._ends[-1] if self._ends else 0
+
+    def missing(self, first: int, last: int) -> list[int]:
+        """Episode numbers in first..last with no record."""
+        if self._loader is not None:
+            self.materialize()
+        out: list[int] = []
+        cursor = first
+        i = max(0, bisect_right(self._starts, first) - 1)
+        while cursor <= last and i < len(self._starts):
+            start, end = self._starts[i], self._ends[i]
+            if start > last:
+                break
+            if start > cursor:
+                out.extend(range(cursor, start))
+            cursor = max(cursor, end + 1)
+            i += 1
+        if cursor <= last:
+            out.extend(range(cursor, last + 1))
+        return out
+
+    def _find(self, ep: int) -> int:
+        i = bisect_right(self._starts, ep) - 1
+        return i if i >= 0 and self._ends[i] >= ep else -1
+
+    def _assign(self, lo: int, hi: int, status: EpStatus | None) -> None:
+        """Overwrite lo..hi with `status` (None clears), then re-merge neighbours."""
+        starts, ends, stats = self._starts, self._ends, self._status
+        j1 = bisect_right(starts, hi)
+        j0 = bisect_right(starts, lo) - 1
+        if j0 < 0 or ends[j0] < lo:
+            j0 += 1
+        pieces: list[tuple[int, int, EpStatus]] = []
+        if j0 < j1 and starts[j0] < lo:
+            pieces.append((starts[j0], lo - 1, stats[j0]))
+        if status is not None:
+            pieces.append((lo, hi, status))
+        if j0 < j1 and ends[j1 - 1] > hi:
+            pieces.append((hi + 1, ends[j1 - 1], stats[j1 - 1]))
+        starts[j0:j1] = [p[0] for p in pieces]
+        ends[j0:j1] = [p[1] for p in pieces]
+        stats[j0:j1] = [p[2] for p in pieces]
+
+        i = max(0, j0 - 1)
+        stop = min(len(starts) - 1, j0 + len(pieces))
+        while i < stop:
+            if ends[i] + 1 == starts[i + 1] and stats[i] is stats[i + 1]:
+                ends[i] = ends[i + 1]
+                del starts[i + 1], ends[i + 1], stats[i + 1]
+                stop -= 1
+            else:
+                i += 1
+
+
 @dataclass
 class Anime:
     """Persisted anime record. id is the MAL id."""
@@ -74,7 +374,18 @@ class Anime:
     ep_from: int = 1
     ep_to: int = 0  # 0 means use total_episodes
 
-    episodes: list[EpState] = field(default_factory=list)
+    episodes: EpisodeSet = field(default_factory=EpisodeSet)
+
+    def __post_init__(self):
+        if not isinstance(self.episodes, EpisodeSet):
+            self.episodes = EpisodeSet(self.episodes)
+
+    def copy(self) -> "Anime":
+        """Copy for another thread to read while this one changes."""
+        out = copy.copy(self)
+        out.watch_urls = dict(self.watch_urls)
+        out.episodes = self.episodes.copy()
+        return out
 
     @property
     def is_airing(self) -> bool:
@@ -96,12 +407,11 @@ class Anime:
     def pending_eps(self) -> list[int]:
         """Episode numbers that should be searched this tick. Lazy derivation:
         aired eps minus those with an existing record. ep=0 for batch shows."""
-        known = {e.ep for e in self.episodes}
         if self.download_mode is DownloadMode.BATCH:
-            return [] if 0 in known else [0]
+            return [] if 0 in self.episodes else [0]
         if self.download_mode is DownloadMode.TRACK_ONLY:
             return []
         upper = self.ep_to or self.total_episodes
         cap = min(self.last_aired_episode, upper)
         lower = max(1, self.ep_from)
-        return [n for n in range(lower, cap + 1) if n not in known]
+        return self.episodes.missing(lower, cap)
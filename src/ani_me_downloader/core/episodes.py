@@ -1,6 +1,6 @@
 # coding: utf-8
 """Episode helpers: display names + initial seeding for non-default modes."""
-from .anime import Anime, EpState, EpStatus
+from .anime import Anime, EpisodeSet, EpStatus
 
 
 def episode_display_name(anime: Anime, ep: int) -> str:
@@ -16,11 +16,12 @@ def seed_episodes(
     total_episodes: int,
     from_ep: int = 1,
     to_ep: int | None = None,
-) -> list[EpState]:
-    """Initial `episodes` list. Lazy model: episodic shows seed nothing
+) -> EpisodeSet:
+    """Initial `episodes` set. Lazy model: episodic shows seed nothing
     (pending derived from `Anime.pending_eps`). Only `track_only` mode
-    needs explicit records — those eps must be excluded from derivation."""
+    needs explicit records — those eps must be excluded from derivation.
+    The whole range is stored as a single run."""
     if mode == "track_only":
         last = to_ep if to_ep is not None else total_episodes
-        return [EpState(ep=i, status=EpStatus.TRACK_ONLY) for i in range(from_ep, last + 1)]
-    return []
+        return EpisodeSet.from_range(from_ep, last, EpStatus.TRACK_ONLY)
+    return EpisodeSet()
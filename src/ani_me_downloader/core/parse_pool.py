@@ -0,0 +1,85 @@
+# coding: utf-8
+"""Small persistent process pool for HTML parsing.
+
+BeautifulSoup holds the GIL for the whole parse, so a large page parsed
+in a QThread stalls the GUI thread of the same interpreter. `run(fn,
+data)` ships the raw page to a worker process and returns what `fn`
+made of it; `fn` must be a module-level function and should return
+plain tuples, which pickle far cheaper than objects.
+
+Processes are spawned (never forked: the parent has Qt and network
+threads running) by `start()`, which also imports the parsers in each
+worker so the first real parse does not pay for it. Without a started
+pool, or once the pool is found broken, `run` parses in the calling
+thread."""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+_lock = threading.Lock()
+_pool: ProcessPoolExecutor | None = None
+
+
+def _warm() -> None:
+    # Import here, in the worker: these are what the parses need.
+    from ..metadata import watch_lookup  # noqa: F401
+    from ..search import nyaa
+    nyaa.parse_html_rows(b"<html><body></body></html>")
+
+
+def start(workers: int) -> bool:
+    """Start `workers` processes and warm them up in the background.
+    Returns False (and leaves parsing in-thread) when workers is 0 or
+    this platform cannot run a process pool."""
+    global _pool
+    if workers <= 0:
+        return False
+    with _lock:
+        if _pool is not None:
+            return True
+        try:
+            pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+            for _ in range(workers):
+                pool.submit(_warm)
+        except (ImportError, NotImplementedError, OSError) as e:
+            print(f"Parse pool unavailable, parsing in-thread: {e}")
+            return False
+        _pool = pool
+    return True
+
+
+def shutdown() -> None:
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run(fn: Callable[[T], object], data: T):
+    """`fn(data)` in a worker process, or in this thread without a pool.
+    Exceptions raised by `fn` propagate either way."""
+    pool = _pool
+    if pool is None:
+        return fn(data)
+    try:
+        future = pool.submit(fn, data)
+    except RuntimeError as e:  # broken, or shut down during app exit
+        return _fallback(pool, e, fn, data)
+    try:
+        return future.result()
+    except BrokenProcessPool as e:  # a worker died mid-parse
+        return _fallback(pool, e, fn, data)
+
+
+def _fallback(pool: ProcessPoolExecutor, error: Exception, fn: Callable[[T], object], data: T):
+    global _pool
+    with _lock:
+        if _pool is pool:
+            _pool = None
+            print(f"Parse pool failed, parsing in-thread from now on: {error}")
+    return fn(data)
@@ -1,5 +1,6 @@
 # coding: utf-8
 """Torrent dataclass + status/file enums. No PyQt, no libtorrent."""
+import copy
 from dataclasses import dataclass, field
 from enum import Enum
 
@@ -54,3 +55,10 @@ class Torrent:
     dl_speed: int = 0
     ul_speed: int = 0
     files: list[TorrentFile] = field(default_factory=list)
+
+    def copy(self) -> "Torrent":
+        """Copy for another thread to read while this one changes."""
+        out = copy.copy(self)
+        out.anime_ids = set(self.anime_ids)
+        out.files = list(self.files)
+        return out
@@ -1,30 +1,94 @@
 # coding: utf-8
-"""Per-torrent fast-resume sidecar files."""
+"""Fast-resume blobs in one SQLite file under data_dir, keyed by info_hash."""
+import hashlib
+import logging
 import os
+import sqlite3
+from pathlib import Path
 
 from ..core.torrent import Torrent
 
+logger = logging.getLogger(__name__)
 
-def _path(t: Torrent) -> str:
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS resume (
+    info_hash TEXT PRIMARY KEY,
+    digest    BLOB NOT NULL,
+    data      BLOB NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def _digest(blob: bytes) -> bytes:
+    return hashlib.blake2b(blob, digest_size=16).digest()
+
+
+def _sidecar_path(t: Torrent) -> str:
+    """Legacy per-torrent location, `.{name}.fastresume` in the save path."""
     return os.path.join(t.save_path, f".{t.name}.fastresume")
 
 
-def save_resume(t: Torrent, blob: bytes) -> None:
-    path = _path(t)
-    with open(path, "wb") as f:
-        f.write(blob)
-    print(f"Saved resume data to {path}")
+class ResumeStore:
+    """Resume data for every torrent. Owned by the torrent thread.
+
+    `save` skips blobs byte-identical to the stored one, which is most of
+    them: the periodic resume request fires for every torrent."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._digests: dict[str, bytes] = dict(
+            self._conn.execute("SELECT info_hash, digest FROM resume")
+        )
+
+    def __contains__(self, info_hash: str) -> bool:
+        return info_hash in self._digests
+
+    def load_all(self) -> dict[str, bytes]:
+        """info_hash → blob for every stored torrent, in one read."""
+        return dict(self._conn.execute("SELECT info_hash, data FROM resume"))
 
+    def save(self, info_hash: str, blob: bytes) -> bool:
+        """Store `blob`. Returns False when it matched what is stored."""
+        digest = _digest(blob)
+        if self._digests.get(info_hash) == digest:
+            return False
+        self._conn.execute(
+            "INSERT INTO resume(info_hash, digest, data) VALUES (?, ?, ?) "
+            "ON CONFLICT(info_hash) DO UPDATE SET digest = excluded.digest, data = excluded.data",
+            (info_hash, digest, blob),
+        )
+        self._digests[info_hash] = digest
+        return True
 
-def load_resume(t: Torrent) -> bytes | None:
-    path = _path(t)
-    if not os.path.exists(path):
-        return None
-    with open(path, "rb") as f:
-        return f.read()
+    def delete(self, info_hash: str) -> None:
+        if self._digests.pop(info_hash, None) is not None:
+            self._conn.execute("DELETE FROM resume WHERE info_hash = ?", (info_hash,))
 
+    def migrate_sidecars(self, torrents: list[Torrent]) -> int:
+        """Move legacy `.{name}.fastresume` files into the store. A sidecar is
+        only removed once its blob is stored; torrents that already have a
+        blob keep theirs and the stale sidecar is dropped."""
+        moved = 0
+        for t in torrents:
+            path = _sidecar_path(t)
+            if not t.info_hash or not os.path.isfile(path):
+                continue
+            try:
+                if t.info_hash not in self:
+                    with open(path, "rb") as f:
+                        self.save(t.info_hash, f.read())
+                    moved += 1
+                os.remove(path)
+            except OSError as e:
+                logger.warning("Could not migrate resume sidecar %s: %s", path, e)
+        if moved:
+            logger.info("Migrated %d resume sidecar(s) into %s", moved, self.path)
+        return moved
 
-def delete_resume(t: Torrent) -> None:
-    path = _path(t)
-    if os.path.exists(path):
-        os.remove(path)
+    def close(self) -> None:
+        self._conn.close()
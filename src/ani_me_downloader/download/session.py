@@ -5,7 +5,7 @@ import os
 import sys
 
 from ..core.torrent import FilePriority, Torrent
-from . import resume
+from .resume import ResumeStore
 
 print(f"Python version: {sys.version}")
 print(f"Platform: {sys.platform}")
@@ -87,9 +87,12 @@ def default_settings(max_concurrent_downloads: int) -> dict:
 
 
 class TorrentSession:
-    """Thin wrapper around `lt.session`. Keyed by `info_hash`."""
+    """Thin wrapper around `lt.session`. Keyed by `info_hash`.
 
-    def __init__(self, settings: dict):
+    Resume blobs for every stored torrent are read from `resume_store` once,
+    here, and handed out by `add`."""
+
+    def __init__(self, settings: dict, resume_store: ResumeStore | None = None):
         if lt is None:
             raise RuntimeError(
                 "libtorrent failed to load. Install Visual C++ Redistributable on Windows."
@@ -98,6 +101,8 @@ class TorrentSession:
         self._session.apply_settings(settings)
         self._handles: dict[str, "lt.torrent_handle"] = {}
         self._torrents: dict[str, Torrent] = {}
+        self._resume = resume_store
+        self._resume_blobs = resume_store.load_all() if resume_store else {}
 
     def add(self, t: Torrent):
         """Add a torrent. Re-applies fast-resume blob if present."""
@@ -109,7 +114,7 @@ class TorrentSession:
         params.save_path = t.save_path
         params.url = t.magnet
 
-        blob = resume.load_resume(t)
+        blob = self._resume_blobs.pop(t.info_hash, None)
         if blob:
             try:
                 params = lt.read_resume_data(blob)
@@ -141,7 +146,8 @@ class TorrentSession:
             self._session.remove_torrent(handle, int(delete_files))
             del self._handles[info_hash]
             del self._torrents[info_hash]
-            resume.delete_resume(t)
+            if self._resume is not None:
+                self._resume.delete(info_hash)
             return True
         except Exception as e:
             print(f"Error removing torrent {t.name}: {e}")
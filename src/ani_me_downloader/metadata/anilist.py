@@ -9,6 +9,7 @@ logger = logging.getLogger(__name__)
 
 API_URL = "https://graphql.anilist.co"
 TIMEOUT = 10
+BATCH_SIZE = 50  # AniList caps perPage at 50
 _DISABLED_MARKERS = ("temporarily disabled", "severe stability")
 
 LIST_QUERY = """
@@ -39,11 +40,32 @@ query ($idMal: Int) {
 }
 """
 
+AIRING_BATCH_QUERY = """
+query ($idMal: [Int]) {
+  Page(perPage: 50) {
+    media(idMal_in: $idMal, type: ANIME) {
+      id
+      idMal
+      status
+      nextAiringEpisode { airingAt episode }
+    }
+  }
+}
+"""
+
 
 class AniListUnavailable(Exception):
     """Transport, HTTP, or upstream-disabled failure."""
 
 
+class AniListDisabled(AniListUnavailable):
+    """AniList answered that its API is switched off."""
+
+
+class AniListNotFound(AniListUnavailable):
+    """AniList is up but has no entry for the MAL ID."""
+
+
 def _post(query: str, variables: dict[str, Any]) -> dict[str, Any]:
     try:
         response = requests.post(
@@ -56,7 +78,10 @@ def _post(query: str, variables: dict[str, Any]) -> dict[str, Any]:
 
     body_lower = (response.text or "").lower()
     if response.status_code == 403 and any(m in body_lower for m in _DISABLED_MARKERS):
-        raise AniListUnavailable("AniList API is currently disabled by upstream")
+        raise AniListDisabled("AniList API is currently disabled by upstream")
+    if response.status_code == 404:
+        # GraphQL "Not Found." for a single-media query with an unknown id.
+        raise AniListNotFound(f"HTTP 404: {response.text[:200]}")
     if not response.ok:
         raise AniListUnavailable(f"HTTP {response.status_code}: {response.text[:200]}")
 
@@ -78,8 +103,22 @@ def get_airing(mal_id: int) -> dict[str, Any]:
     data = _post(AIRING_QUERY, {"idMal": int(mal_id)})
     media = data.get("Media")
     if not media:
-        raise AniListUnavailable(f"no Media for idMal={mal_id}")
+        raise AniListNotFound(f"no Media for idMal={mal_id}")
+    return airing_info(media)
+
+
+def get_airing_batch(mal_ids: list[int]) -> dict[int, dict[str, Any]]:
+    """`get_airing` for up to BATCH_SIZE MAL IDs in one request, keyed by
+    MAL ID. IDs AniList does not know are missing from the result."""
+    if len(mal_ids) > BATCH_SIZE:
+        raise ValueError(f"at most {BATCH_SIZE} ids per batch, got {len(mal_ids)}")
+    data = _post(AIRING_BATCH_QUERY, {"idMal": [int(i) for i in mal_ids]})
+    media = (data.get("Page") or {}).get("media") or []
+    return {int(m["idMal"]): airing_info(m) for m in media if m.get("idMal")}
+
 
+def airing_info(media: dict[str, Any]) -> dict[str, Any]:
+    """`get_airing`'s result from a media dict with status and nextAiringEpisode."""
     status = media.get("status") or "FINISHED"
     next_ep = media.get("nextAiringEpisode")
     if next_ep:
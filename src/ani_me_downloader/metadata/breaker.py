@@ -0,0 +1,146 @@
+# coding: utf-8
+"""Per-provider circuit breaker, so a down source is skipped, not waited on."""
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class BreakerState(Enum):
+    CLOSED = "closed"        # calls go through
+    OPEN = "open"            # calls are refused until the cooldown ends
+    HALF_OPEN = "half_open"  # one probe call decides between the two
+
+
+@dataclass(frozen=True)
+class ProviderHealth:
+    name: str
+    state: BreakerState
+    failure_rate: float  # over the recent window
+    retry_in: float  # seconds until an open breaker lets a probe through
+
+    def __str__(self) -> str:
+        text = f"{self.name} {self.state.value}, {self.failure_rate:.0%} failures"
+        if self.state is BreakerState.OPEN:
+            text += f", retry in {self.retry_in:.0f} s"
+        return text
+
+
+class CircuitBreaker:
+    """Opens when at least `failure_rate` of the last `window` calls (and
+    no fewer than `min_calls`) failed, or at once on `trip()`. While open,
+    `allow()` is False for `cooldown` seconds; then a single probe is let
+    through. Its success closes the breaker; its failure reopens it with
+    the cooldown doubled, up to `max_cooldown`.
+
+    Every change of state is logged and passed to `on_change`. Thread-safe."""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        window: int = 20,
+        min_calls: int = 5,
+        failure_rate: float = 0.5,
+        cooldown: float = 60,
+        max_cooldown: float = 900,
+        on_change: Callable[[ProviderHealth], None] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self._min_calls = min_calls
+        self._threshold = failure_rate
+        self._base_cooldown = cooldown
+        self._max_cooldown = max_cooldown
+        self.on_change = on_change
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._outcomes: deque[bool] = deque(maxlen=window)  # True = failed
+        self._state = BreakerState.CLOSED
+        self._cooldown = cooldown
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state is BreakerState.CLOSED:
+                return True
+            if self._state is BreakerState.OPEN:
+                if self._clock() - self._opened_at < self._cooldown:
+                    return False
+                self._state = BreakerState.HALF_OPEN
+                self._probing = False
+            if self._probing:
+                return False
+            self._probing = True
+            health = self._health()
+        self._changed(health)
+        return True
+
+    def success(self) -> None:
+        with self._lock:
+            self._outcomes.append(False)
+            if self._state is BreakerState.CLOSED:
+                return
+            self._state = BreakerState.CLOSED
+            self._cooldown = self._base_cooldown
+            self._probing = False
+            self._outcomes.clear()
+            health = self._health()
+        self._changed(health)
+
+    def failure(self) -> None:
+        with self._lock:
+            self._outcomes.append(True)
+            if self._state is BreakerState.HALF_OPEN:
+                self._cooldown = min(self._max_cooldown, self._cooldown * 2)
+            elif not (
+                self._state is BreakerState.CLOSED
+                and len(self._outcomes) >= self._min_calls
+                and self._rate() >= self._threshold
+            ):
+                return
+            health = self._open()
+        self._changed(health)
+
+    def trip(self) -> None:
+        """Open now: the provider said it is down. During a probe this
+        counts as a failed probe and doubles the cooldown."""
+        with self._lock:
+            self._outcomes.append(True)
+            if self._state is BreakerState.OPEN:
+                return
+            if self._state is BreakerState.HALF_OPEN:
+                self._cooldown = min(self._max_cooldown, self._cooldown * 2)
+            health = self._open()
+        self._changed(health)
+
+    def health(self) -> ProviderHealth:
+        with self._lock:
+            return self._health()
+
+    def _open(self) -> ProviderHealth:
+        self._state = BreakerState.OPEN
+        self._opened_at = self._clock()
+        self._probing = False
+        return self._health()
+
+    def _rate(self) -> float:
+        return sum(self._outcomes) / len(self._outcomes) if self._outcomes else 0.0
+
+    def _health(self) -> ProviderHealth:
+        retry_in = 0.0
+        if self._state is BreakerState.OPEN:
+            retry_in = max(0.0, self._opened_at + self._cooldown - self._clock())
+        return ProviderHealth(self.name, self._state, self._rate(), retry_in)
+
+    def _changed(self, health: ProviderHealth) -> None:
+        log = logger.warning if health.state is BreakerState.OPEN else logger.info
+        log("Provider health: %s", health)
+        if self.on_change is not None:
+            self.on_change(health)
@@ -0,0 +1,152 @@
+# coding: utf-8
+"""On-disk cache of AniList/Jikan responses, served stale while revalidating."""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Mapping
+
+from ..persistence.json_store import read_json, write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+MAX_AGE = 30 * 86400  # entries older than this are dropped on save
+
+
+@dataclass
+class MetadataCacheStats:
+    fresh: int = 0
+    stale: int = 0  # served while a background refresh ran
+    misses: int = 0
+    offline: int = 0  # served because every source failed
+    entries: int = 0
+    oldest: float = 0.0  # age in seconds of the oldest entry
+
+    def __str__(self) -> str:
+        served = self.fresh + self.stale + self.offline
+        total = served + self.misses
+        rate = f"{served / total:.0%}" if total else "-"
+        return (
+            f"{rate} hit rate ({self.fresh} fresh, {self.stale} stale, "
+            f"{self.offline} offline, {self.misses} misses), {self.entries} entries, "
+            f"oldest {self.oldest / 3600:.1f} h"
+        )
+
+
+class MetadataCache:
+    """Responses by (kind, key), persisted to `path` as JSON.
+
+    An entry younger than `ttl[kind]()` is fresh and returned as is. An
+    older one is returned at once while `load()` refreshes it on a
+    background thread (one refresh per key at a time). Without an entry,
+    or when `usable(value)` rejects it, `get` loads in the caller's thread;
+    if that raises and any entry exists, the entry is returned instead.
+    New entries are only marked dirty; `save()` writes them, once a pass.
+
+    Values must be JSON-serializable and are shared: callers copy before
+    mutating. Thread-safe."""
+
+    def __init__(
+        self,
+        path,
+        *,
+        ttl: Mapping[str, Callable[[], float]],
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = Path(path)
+        self._ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._refreshing: set[str] = set()
+        self._pool = ThreadPoolExecutor(2, thread_name_prefix="metadata-refresh")
+        self._stats = MetadataCacheStats()
+        self._dirty = False
+        data = read_json(self.path, {})
+        self._entries: dict[str, tuple[float, Any]] = {
+            k: (float(v[0]), v[1])
+            for k, v in (data.items() if isinstance(data, dict) else ())
+            if isinstance(v, list) and len(v) == 2 and isinstance(v[0], (int, float))
+        }
+
+    def get(
+        self,
+        kind: str,
+        key: str,
+        load: Callable[[], Any],
+        *,
+        usable: Callable[[Any], bool] = lambda value: True,
+    ) -> Any:
+        full = f"{kind}:{key}"
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(full)
+            if entry is not None and usable(entry[1]):
+                at, value = entry
+                if now - at < self._ttl[kind]():
+                    self._stats.fresh += 1
+                    return value
+                self._stats.stale += 1
+                if full not in self._refreshing:
+                    self._refreshing.add(full)
+                    self._pool.submit(self._refresh, full, load)
+                return value
+            self._stats.misses += 1
+        try:
+            value = load()
+        except Exception as exc:
+            if entry is None:
+                raise
+            with self._lock:
+                self._stats.misses -= 1
+                self._stats.offline += 1
+            logger.warning(
+                "Serving %s from cache, %.1f h old: %s", full, (now - entry[0]) / 3600, exc
+            )
+            return entry[1]
+        self.put(kind, key, value)
+        return value
+
+    def put(self, kind: str, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[f"{kind}:{key}"] = (self._clock(), value)
+            self._dirty = True
+
+    def _refresh(self, full: str, load: Callable[[], Any]) -> None:
+        try:
+            value = load()
+        except Exception as exc:
+            logger.info("Background refresh of %s failed: %s", full, exc)
+            return
+        finally:
+            with self._lock:
+                self._refreshing.discard(full)
+        with self._lock:
+            self._entries[full] = (self._clock(), value)
+            self._dirty = True
+
+    def stats(self) -> MetadataCacheStats:
+        now = self._clock()
+        with self._lock:
+            stats = MetadataCacheStats(**vars(self._stats))
+            stats.entries = len(self._entries)
+            stats.oldest = max((now - at for at, _ in self._entries.values()), default=0.0)
+        return stats
+
+    def save(self) -> None:
+        """Write the entries if they changed, dropping ones past MAX_AGE."""
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                horizon = self._clock() - MAX_AGE
+                for k in [k for k, (at, _) in self._entries.items() if at < horizon]:
+                    del self._entries[k]
+                data = {k: [at, value] for k, (at, value) in self._entries.items()}
+                self._dirty = False
+            try:
+                write_json_atomic(self.path, data)
+            except OSError as e:
+                logger.warning("Could not save metadata cache: %s", e)
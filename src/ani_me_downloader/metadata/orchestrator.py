@@ -1,15 +1,26 @@
 # coding: utf-8
-"""Metadata orchestrator. AniList → Jikan fallback. Normalizes status to AiringStatus."""
+"""Metadata orchestrator. AniList → Jikan fallback. Normalizes status to AiringStatus.
+
+With `use_cache`, responses are kept on disk and served stale while they
+revalidate, or while both sources are down. Each source sits behind a
+circuit breaker: while one is open its calls fail at once, so AniList
+being down costs no timeouts before the Jikan fallback."""
+import copy
 import logging
-from typing import Any
+import time
+from typing import Any, Callable, Iterable, TypeVar
 
 from ..core.anime import AiringStatus
 from . import anilist, jikan
-from .anilist import AniListUnavailable
+from .anilist import AniListDisabled, AniListNotFound, AniListUnavailable
+from .breaker import CircuitBreaker, ProviderHealth
+from .cache import MetadataCache
 from .jikan import JikanUnavailable
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 
 class MetadataUnavailable(Exception):
     """Both AniList and Jikan failed for the same request."""
@@ -30,27 +41,145 @@ def _normalize(info: dict[str, Any]) -> dict[str, Any]:
     return info
 
 
+_cache: MetadataCache | None = None
+
+
+def use_cache(cache: MetadataCache | None) -> None:
+    global _cache
+    _cache = cache
+
+
+def flush_cache() -> None:
+    """Write the responses cached since the last flush and log the hit
+    rate. Called at the end of each pass and on exit."""
+    if _cache is None:
+        return
+    _cache.save()
+    logger.info("Metadata cache: %s", _cache.stats())
+
+
+_anilist_breaker = CircuitBreaker("AniList")
+_jikan_breaker = CircuitBreaker("Jikan")
+
+
+def provider_health() -> list[ProviderHealth]:
+    return [_anilist_breaker.health(), _jikan_breaker.health()]
+
+
+def on_health_change(callback: Callable[[ProviderHealth], None] | None) -> None:
+    """Call `callback` (from whichever thread made the call) whenever a
+    provider's breaker changes state."""
+    _anilist_breaker.on_change = _jikan_breaker.on_change = callback
+
+
+def _anilist(call: Callable[..., T], *args) -> T:
+    if not _anilist_breaker.allow():
+        raise AniListUnavailable("circuit open")
+    try:
+        result = call(*args)
+    except AniListDisabled:
+        _anilist_breaker.trip()
+        raise
+    except AniListNotFound:
+        _anilist_breaker.success()
+        raise
+    except Exception:
+        _anilist_breaker.failure()
+        raise
+    _anilist_breaker.success()
+    return result
+
+
+def _jikan(call: Callable[..., T], *args) -> T:
+    if not _jikan_breaker.allow():
+        raise JikanUnavailable("circuit open")
+    try:
+        result = call(*args)
+    except Exception:
+        _jikan_breaker.failure()
+        raise
+    _jikan_breaker.success()
+    return result
+
+
 def search(query: str) -> list[dict[str, Any]]:
     """Search by title. Returns AniList-shaped media dicts."""
+    if _cache is None:
+        return _search(query)
+    key = " ".join(query.split()).casefold()
+    return copy.deepcopy(_cache.get("search", key, lambda: _search(query)))
+
+
+def _search(query: str) -> list[dict[str, Any]]:
     try:
-        return anilist.search(query)
+        results = _anilist(anilist.search, query)
     except AniListUnavailable as exc:
         logger.info("AniList search failed (%s); falling back to Jikan", exc)
+    else:
+        if _cache is not None:
+            # The add flow asks for the picked show's airing status next.
+            for media in results:
+                if media.get("idMal"):
+                    _cache.put("airing", str(media["idMal"]), anilist.airing_info(media))
+        return results
     try:
-        return jikan.search(query)
+        return _jikan(jikan.search, query)
     except JikanUnavailable as exc:
         logger.error("Jikan search also failed: %s", exc)
         raise MetadataUnavailable(str(exc)) from exc
 
 
-def get_airing(mal_id: int) -> dict[str, Any]:
-    """Return airing status. info['status'] is an AiringStatus enum value."""
-    try:
-        return _normalize(anilist.get_airing(mal_id))
-    except AniListUnavailable as exc:
-        logger.info("AniList get_airing(%s) failed (%s); falling back to Jikan", mal_id, exc)
+def get_airing(mal_id: int, *, anilist_first: bool = True) -> dict[str, Any]:
+    """Return airing status. info['status'] is an AiringStatus enum value.
+
+    `anilist_first=False` goes straight to Jikan, for ids a batched
+    AniList lookup already failed to return. A cached status is used until
+    its next episode is due to air."""
+    if _cache is None:
+        return _normalize(_get_airing(mal_id, anilist_first))
+    info = _cache.get(
+        "airing", str(int(mal_id)), lambda: _get_airing(mal_id, anilist_first), usable=_ahead
+    )
+    return _normalize(dict(info))
+
+
+def _ahead(info: dict[str, Any]) -> bool:
+    """The status still describes the show: no airing time has passed."""
+    return not info.get("next_eta") or info["next_eta"] > time.time()
+
+
+def _get_airing(mal_id: int, anilist_first: bool) -> dict[str, Any]:
+    if anilist_first:
+        try:
+            return _anilist(anilist.get_airing, mal_id)
+        except AniListUnavailable as exc:
+            logger.info("AniList get_airing(%s) failed (%s); falling back to Jikan", mal_id, exc)
     try:
-        return _normalize(jikan.get_airing(mal_id))
+        return _jikan(jikan.get_airing, mal_id)
     except JikanUnavailable as exc:
         logger.error("Jikan get_airing(%s) also failed: %s", mal_id, exc)
         raise MetadataUnavailable(str(exc)) from exc
+
+
+def get_airing_many(mal_ids: Iterable[int]) -> dict[int, dict[str, Any]]:
+    """Airing status for many MAL ids from AniList, 50 per request.
+
+    Ids missing from the result (unknown to AniList, or AniList failed and
+    the remaining chunks were skipped) are for `get_airing(mal_id,
+    anilist_first=False)`; there is no batched Jikan endpoint."""
+    ids = list(dict.fromkeys(int(i) for i in mal_ids))
+    out: dict[int, dict[str, Any]] = {}
+    for start in range(0, len(ids), anilist.BATCH_SIZE):
+        try:
+            found = _anilist(anilist.get_airing_batch, ids[start:start + anilist.BATCH_SIZE])
+        except AniListUnavailable as exc:
+            logger.info(
+                "AniList batched airing lookup failed (%s); %d ids left to Jikan",
+                exc, len(ids) - start,
+            )
+            break
+        for mal_id, info in found.items():
+            if _cache is not None:
+                _cache.put("airing", str(mal_id), dict(info))
+            out[mal_id] = _normalize(info)
+    return out
@@ -12,6 +12,8 @@ from typing import Callable
 import requests
 from bs4 import BeautifulSoup
 
+from ..core import parse_pool
+
 ANIMEKAI_BASE = "https://animekai.to"
 ANIMEPAHE_BASE = "https://animepahe.pw"
 CINEBY_BASE = "https://www.cineby.app"
@@ -54,11 +56,14 @@ def _animekai_deep(title: str) -> str | None:
     if data.get("status") not in ("ok", 200):
         return None
     html = data.get("result", {}).get("html") or ""
-    soup = BeautifulSoup(html, "html.parser")
-    a = soup.find("a", {"class": "aitem"})
-    if a and a.get("href"):
-        return ANIMEKAI_BASE + a["href"]
-    return None
+    href = parse_pool.run(_animekai_href, html)
+    return ANIMEKAI_BASE + href if href else None
+
+
+def _animekai_href(html: str) -> str | None:
+    """Link of the first search hit. Runs in the parse pool."""
+    a = BeautifulSoup(html, "html.parser").find("a", {"class": "aitem"})
+    return str(a["href"]) if a and a.get("href") else None
 
 
 def _animepahe_deep(title: str) -> str | None:
@@ -153,17 +158,20 @@ def get_season(url: str) -> int:
     try:
         r = requests.get(url, timeout=_API_TIMEOUT, headers=_HEADERS)
         if r.status_code == 200:
-            soup = BeautifulSoup(r.text, "html.parser")
-            try:
-                active = soup.select_one(
-                    "div.swiper-slide.aitem.active, div.swiper-slide.active"
-                )
-                if active:
-                    text = active.select_one("div.detail span").text.strip()
-                    season = int(text.split(" ")[1])
-            except Exception as e:
-                season = 1
-                print(f"Error parsing season: {e}")
+            season = parse_pool.run(_parse_season, r.content)
     except Exception as e:
         print(f"Error getting season: {e}")
     return season
+
+
+def _parse_season(page: bytes) -> int:
+    """Season of the active slide on an animekai page. Runs in the parse pool."""
+    soup = BeautifulSoup(page, "html.parser")
+    try:
+        active = soup.select_one("div.swiper-slide.aitem.active, div.swiper-slide.active")
+        if active:
+            text = active.select_one("div.detail span").text.strip()
+            return int(text.split(" ")[1])
+    except Exception as e:
+        print(f"Error parsing season: {e}")
+    return 1
@@ -3,8 +3,17 @@
 import logging
 from pathlib import Path
 
-from ..core.anime import Anime, AnimeFormat, AiringStatus, DownloadMode, EpState, EpStatus
-from .json_store import read_json, write_json_atomic
+from ..core.anime import (
+    Anime,
+    AnimeFormat,
+    AiringStatus,
+    DownloadMode,
+    EpisodeSet,
+    EpState,
+    EpStatus,
+)
+from .journal import Journal, folded
+from .json_store import gc_paused, read_json, unwrap_snapshot, wrap_snapshot, write_json_atomic
 
 logger = logging.getLogger(__name__)
 
@@ -14,10 +23,6 @@ logger = logging.getLogger(__name__)
 _DROPPED_EP_STATUSES = {"not_aired", "queued"}
 
 
-def ep_to_json(e: EpState) -> dict:
-    return {"ep": e.ep, "status": e.status.value, "magnet": e.magnet}
-
-
 def ep_from_json(d: dict) -> EpState | None:
     raw = d.get("status")
     if raw in _DROPPED_EP_STATUSES:
@@ -29,7 +34,8 @@ def ep_from_json(d: dict) -> EpState | None:
     )
 
 
-def anime_to_json(a: Anime) -> dict:
+def anime_summary_to_json(a: Anime) -> dict:
+    """Every persisted field except the episode list."""
     return {
         "id": a.id,
         "name": a.name,
@@ -46,10 +52,32 @@ def anime_to_json(a: Anime) -> dict:
         "download_mode": a.download_mode.value,
         "ep_from": a.ep_from,
         "ep_to": a.ep_to,
-        "episodes": [ep_to_json(e) for e in a.episodes],
     }
 
 
+# On-disk anime row schema, recorded in the snapshot. 2: every field present,
+# episodes as [first, last, status] runs plus [ep, magnet] pairs. 1 (and bare
+# list snapshots): one dict per episode, optional fields, legacy keys.
+ANIME_SCHEMA = 2
+
+
+def anime_to_json(a: Anime) -> dict:
+    eps = a.episodes
+    row = anime_summary_to_json(a)
+    row["ep_counts"] = {st.value: n for st, n in eps.status_counts().items()}
+    row["runs"] = [[first, last, st.value] for first, last, st in eps.runs()]
+    row["magnets"] = sorted([n, m] for n, m in eps.magnets().items())
+    return row
+
+
+def _is_current(d: dict) -> bool:
+    return "runs" in d
+
+
+def _summary_matches(row: dict, a: Anime) -> bool:
+    return all(row.get(k) == v for k, v in anime_summary_to_json(a).items())
+
+
 def _parse_watch_urls(d: dict) -> dict[str, str]:
     """Read new `watch_urls` dict; fall back to legacy `watch_url` string."""
     raw = d.get("watch_urls")
@@ -61,7 +89,7 @@ def _parse_watch_urls(d: dict) -> dict[str, str]:
     return {}
 
 
-def _infer_download_mode(d: dict, eps: list[EpState]) -> DownloadMode:
+def _infer_download_mode(d: dict, eps: EpisodeSet) -> DownloadMode:
     """Used when JSON predates `download_mode`. Heuristic from episode list."""
     raw = d.get("download_mode")
     if raw is not None:
@@ -69,20 +97,136 @@ def _infer_download_mode(d: dict, eps: list[EpState]) -> DownloadMode:
             return DownloadMode(raw)
         except ValueError:
             pass
-    if any(e.ep == 0 for e in eps):
+    if 0 in eps:
         return DownloadMode.BATCH
-    if eps and all(e.status is EpStatus.TRACK_ONLY for e in eps):
+    if eps and all(st is EpStatus.TRACK_ONLY for _, _, st in eps.runs()):
         return DownloadMode.TRACK_ONLY
     return DownloadMode.EPISODES
 
 
-def anime_from_json(d: dict) -> Anime:
-    raw_eps = d.get("episodes", [])
+def _episodes_from_json(raw_eps: list) -> EpisodeSet:
     eps: list[EpState] = []
     for row in raw_eps:
-        ep = ep_from_json(row)
+        try:
+            ep = ep_from_json(row)
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning("Skipping corrupt episode row: %s", e)
+            continue
         if ep is not None:
             eps.append(ep)
+    return EpisodeSet(eps)
+
+
+def _counts_from_json(d: dict) -> dict[EpStatus, int] | None:
+    raw = d.get("ep_counts")
+    if not isinstance(raw, dict):
+        return None
+    try:
+        return {EpStatus(k): int(v) for k, v in raw.items()}
+    except (TypeError, ValueError):
+        return None
+
+
+# value → member, for the schema 2 fast path (skips Enum.__call__).
+_EP_STATUS = {m.value: m for m in EpStatus}
+_FORMAT = {m.value: m for m in AnimeFormat}
+_AIRING = {m.value: m for m in AiringStatus}
+_MODE = {m.value: m for m in DownloadMode}
+
+
+def _episodes_from_runs(runs: list, magnets: list) -> EpisodeSet:
+    return EpisodeSet.from_runs(
+        ((first, last, _EP_STATUS[st]) for first, last, st in runs), dict(magnets)
+    )
+
+
+def _valid_run(run) -> bool:
+    return (
+        type(run) is list and len(run) == 3
+        and type(run[0]) is int and type(run[1]) is int and run[0] <= run[1]
+        and run[2] in _EP_STATUS
+    )
+
+
+def _valid_magnet(pair) -> bool:
+    return type(pair) is list and len(pair) == 2 and type(pair[0]) is int and type(pair[1]) is str
+
+
+def _checked_episodes(d: dict) -> tuple[list, list, bool]:
+    """The row's runs and magnets without malformed entries, and whether
+    any were dropped. Raises TypeError if either is not a list."""
+    runs, magnets = d["runs"], d["magnets"]
+    if type(runs) is not list or type(magnets) is not list:
+        raise TypeError(f"anime {d.get('id')}: runs and magnets must be lists")
+    if all(map(_valid_run, runs)) and all(map(_valid_magnet, magnets)):
+        return runs, magnets, False
+    good_runs = [r for r in runs if _valid_run(r)]
+    good_magnets = [m for m in magnets if _valid_magnet(m)]
+    dropped = len(runs) - len(good_runs) + len(magnets) - len(good_magnets)
+    if dropped:
+        logger.warning("Dropping %d corrupt episode entries of anime %s", dropped, d.get("id"))
+    return good_runs, good_magnets, bool(dropped)
+
+
+def _checked_counts(d: dict, runs: list) -> dict[EpStatus, int]:
+    raw = d.get("ep_counts")
+    if type(raw) is dict:
+        try:
+            counts = {_EP_STATUS[k]: v for k, v in raw.items()}
+        except (KeyError, TypeError):
+            counts = None
+        if counts is not None and all(type(v) is int for v in counts.values()):
+            return counts
+    counts: dict[EpStatus, int] = {}
+    for first, last, st in runs:
+        counts[_EP_STATUS[st]] = counts.get(_EP_STATUS[st], 0) + last - first + 1
+    return counts
+
+
+def anime_from_json(d: dict, *, defer_episodes: bool = False) -> Anime:
+    """`defer_episodes` leaves the episode list undecoded until first use.
+    Schema 2 rows have their runs and magnets checked here so a deferred
+    decode cannot fail later; a row with malformed entries is decoded at
+    once without them, so the next save rewrites it. Older rows go through
+    `_anime_from_legacy_json`."""
+    if not _is_current(d):
+        return _anime_from_legacy_json(d, defer_episodes=defer_episodes)
+    runs, magnets, repaired = _checked_episodes(d)
+    if defer_episodes and not repaired:
+        counts = _checked_counts(d, runs)
+        episodes = EpisodeSet.deferred(lambda: _episodes_from_runs(runs, magnets), counts)
+    else:
+        episodes = _episodes_from_runs(runs, magnets)
+    return Anime(
+        id=d["id"],
+        name=d["name"],
+        search_name=d["search_name"],
+        season=d["season"],
+        format=_FORMAT[d["format"]],
+        output_dir=d["output_dir"],
+        img=d["img"],
+        watch_urls=d["watch_urls"],
+        status=_AIRING[d["status"]],
+        next_eta=d["next_eta"],
+        last_aired_episode=d["last_aired_episode"],
+        total_episodes=d["total_episodes"],
+        download_mode=_MODE[d["download_mode"]],
+        ep_from=d["ep_from"],
+        ep_to=d["ep_to"],
+        episodes=episodes,
+    )
+
+
+def _anime_from_legacy_json(d: dict, *, defer_episodes: bool = False) -> Anime:
+    """Schema 1 rows. Rows that predate `download_mode` are always decoded
+    (the mode is inferred from the episodes)."""
+    raw_eps = d.get("episodes", [])
+    if defer_episodes and "download_mode" in d:
+        episodes = EpisodeSet.deferred(
+            lambda: _episodes_from_json(raw_eps), _counts_from_json(d)
+        )
+    else:
+        episodes = _episodes_from_json(raw_eps)
 
     return Anime(
         id=d["id"],
@@ -97,28 +241,158 @@ def anime_from_json(d: dict) -> Anime:
         next_eta=d.get("next_eta", 0),
         last_aired_episode=d.get("last_aired_episode", 0),
         total_episodes=d.get("total_episodes", 1),
-        download_mode=_infer_download_mode(d, eps),
+        download_mode=_infer_download_mode(d, episodes),
         ep_from=int(d.get("ep_from", 1)),
         ep_to=int(d.get("ep_to", 0)),
-        episodes=eps,
+        episodes=episodes,
     )
 
 
+# Compaction folds the journal into the snapshot once it holds more records
+# than this floor or the library size, whichever is larger. Amortized cost per
+# change record stays O(1).
+COMPACT_MIN_RECORDS = 256
+
+
+def _apply_record(order: list[int], rows: dict[int, dict], rec: dict) -> None:
+    """Replay one journal record. Records for other collections sharing the
+    journal are ignored."""
+    op = rec.get("op")
+    if op == "put" and "anime" in rec:
+        row = rec["anime"]
+        aid = row["id"]
+        if aid not in rows:
+            order.insert(min(int(rec.get("at", len(order))), len(order)), aid)
+        rows[aid] = row
+    elif op == "del" and "id" in rec:
+        aid = rec["id"]
+        if rows.pop(aid, None) is not None:
+            order.remove(aid)
+
+
 class AnimeRepository:
-    """Loads and saves the anime list. Sole writer of `anime_file.json`."""
+    """Loads and saves the anime list. Sole writer of `anime_file.json`.
+
+    `anime_file.json` is a snapshot; per-anime changes since the snapshot go
+    to `anime_file.json.journal` (or a journal shared with the torrent
+    repository, see `JsonStateStore`). `stage` diffs against what was last
+    persisted and returns only the changed rows as journal records.
 
-    def __init__(self, path):
+    `load` leaves episode lists deferred; an anime whose episodes were never
+    touched is compared on its summary fields alone and keeps its stored row,
+    so saving does not force a decode."""
+
+    def __init__(self, path, journal: Journal | None = None):
         self.path = Path(path)
+        self.journal = journal or Journal(self.path.with_name(self.path.name + ".journal"))
+        self.generation: int | None = None
+        self.needs_migration = False
+        self._persisted: dict[int, dict] = {}
+        self._order: list[int] = []
+        self._staged: tuple[dict[int, dict], list[int]] | None = None
 
-    def load(self) -> list[Anime]:
-        items = read_json(self.path, default=[])
-        out: list[Anime] = []
+    def load(self, batches: list[tuple[int | None, list[dict]]] | None = None) -> list[Anime]:
+        """`batches` are the journal already replayed by its owner; by
+        default this repository replays its own journal. Batches at or below
+        the snapshot's generation are already folded into it and skipped;
+        `generation` ends up at the last batch applied."""
+        with gc_paused():
+            return self._load(batches)
+
+    def _load(self, batches) -> list[Anime]:
+        # No snapshot yet (a new library saved only to the journal) is
+        # current; a bare list is schema 1.
+        default = wrap_snapshot([], None, ANIME_SCHEMA)
+        items, self.generation, schema = unwrap_snapshot(read_json(self.path, default=default))
+        order: list[int] = []
+        rows: dict[int, dict] = {}
         for d in items:
             try:
-                out.append(anime_from_json(d))
-            except (KeyError, ValueError) as e:
+                aid = d["id"]
+            except (KeyError, TypeError) as e:
                 logger.warning("Skipping corrupt anime row: %s", e)
+                continue
+            if aid not in rows:
+                order.append(aid)
+            rows[aid] = d
+        for gen, records in self.journal.replay() if batches is None else batches:
+            if folded(gen, self.generation):
+                continue
+            for rec in records:
+                try:
+                    _apply_record(order, rows, rec)
+                except (KeyError, TypeError, ValueError) as e:
+                    logger.warning("Skipping corrupt journal record: %s", e)
+            self.generation = gen
+        self.needs_migration = bool(rows) and (
+            schema < ANIME_SCHEMA or not all(_is_current(row) for row in rows.values())
+        )
+
+        out: list[Anime] = []
+        self._persisted = {}
+        for aid in order:
+            try:
+                a = anime_from_json(rows[aid], defer_episodes=True)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning("Skipping corrupt anime row: %s", e)
+                continue
+            out.append(a)
+            self._persisted[a.id] = rows[aid]
+        self._order = [a.id for a in out]
         return out
 
+    def stage(self, animes: list[Anime]) -> tuple[list[dict], bool]:
+        """Journal records turning the persisted list into `animes`, and
+        whether replaying them would not reproduce its order (the snapshot
+        must be rewritten instead). Call `commit_staged` once written."""
+        ids = [a.id for a in animes]
+        live = set(ids)
+
+        records: list[dict] = [
+            {"op": "del", "id": aid} for aid in self._order if aid not in live
+        ]
+        order = [aid for aid in self._order if aid in live]
+        known = set(order)
+        persisted: dict[int, dict] = {}
+        for index, a in enumerate(animes):
+            row = self._persisted.get(a.id)
+            if (row is None or not _is_current(row)
+                    or not (a.episodes.is_deferred and _summary_matches(row, a))):
+                new = anime_to_json(a)
+                if new != row:
+                    records.append({"op": "put", "at": index, "anime": new})
+                    if a.id not in known:
+                        order.insert(min(index, len(order)), a.id)
+                        known.add(a.id)
+                row = new
+            persisted[a.id] = row
+        self._staged = (persisted, ids)
+        return records, order != ids
+
+    def staged_rows(self) -> list[dict]:
+        persisted, ids = self._staged
+        return [persisted[aid] for aid in ids]
+
+    def commit_staged(self) -> None:
+        self._persisted, self._order = self._staged
+        self._staged = None
+
     def save(self, animes: list[Anime]) -> None:
-        write_json_atomic(self.path, [anime_to_json(a) for a in animes])
+        records, reorder = self.stage(animes)
+        limit = max(COMPACT_MIN_RECORDS, len(self._staged[1]))
+        if reorder or self.needs_migration or len(self.journal) + len(records) > limit:
+            self.compact(self.staged_rows(), (self.generation or 0) + 1)
+        elif records:
+            self.journal.append(records, gen=(self.generation or 0) + 1)
+            self.generation = (self.generation or 0) + 1
+        self.commit_staged()
+
+    def write_snapshot(self, rows: list[dict], generation: int) -> None:
+        write_json_atomic(self.path, wrap_snapshot(rows, generation, ANIME_SCHEMA))
+        self.generation = generation
+        self.needs_migration = False
+
+    def compact(self, rows: list[dict], generation: int) -> None:
+        """Rewrite the snapshot from `rows` and drop the folded journal."""
+        self.write_snapshot(rows, generation)
+        self.journal.reset()
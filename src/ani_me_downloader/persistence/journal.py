@@ -0,0 +1,90 @@
+# coding: utf-8
+"""Append-only JSON-lines change journal with batch commit markers."""
+import logging
+import os
+from pathlib import Path
+
+from .json_store import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+def folded(batch_gen: int | None, snapshot_gen: int | None) -> bool:
+    """True if a batch of generation `batch_gen` is already contained in a
+    snapshot written at `snapshot_gen`."""
+    return batch_gen is not None and snapshot_gen is not None and batch_gen <= snapshot_gen
+
+
+class Journal:
+    """Change records appended in batches; one fsync per batch.
+
+    A batch only counts once its trailing commit marker is on disk. Replay
+    drops a torn tail (crash mid-append) and truncates the file back to the
+    last complete batch so later appends stay readable.
+
+    A commit marker may carry a `gen`eration number, handed back by
+    `replay` with its batch."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._records = 0
+
+    def __len__(self) -> int:
+        """Records appended since the last `reset` (as of the last replay)."""
+        return self._records
+
+    def append(self, records: list[dict], *, gen: int | None = None) -> None:
+        if not records:
+            return
+        commit = {"op": "commit"} if gen is None else {"op": "commit", "gen": gen}
+        payload = b"".join(dumps(r) + b"\n" for r in (*records, commit))
+        with open(self.path, "ab") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        self._records += len(records)
+
+    def replay(self) -> list[tuple[int | None, list[dict]]]:
+        """Every complete batch as (generation, records), in append order."""
+        try:
+            with open(self.path, "rb") as f:
+                raw = f.read()
+        except OSError:
+            self._records = 0
+            return []
+
+        out: list[tuple[int | None, list[dict]]] = []
+        batch: list[dict] = []
+        good_end = 0
+        pos = 0
+        while pos < len(raw):
+            nl = raw.find(b"\n", pos)
+            if nl < 0:
+                break
+            try:
+                rec = loads(raw[pos:nl])
+            except ValueError:
+                break
+            pos = nl + 1
+            if rec.get("op") == "commit":
+                out.append((rec.get("gen"), batch))
+                batch = []
+                good_end = pos
+            else:
+                batch.append(rec)
+
+        if good_end < len(raw):
+            logger.warning("Dropping torn journal tail in %s", self.path)
+            with open(self.path, "r+b") as f:
+                f.truncate(good_end)
+                f.flush()
+                os.fsync(f.fileno())
+        self._records = sum(len(records) for _, records in out)
+        return out
+
+    def reset(self) -> None:
+        """Discard all records. Call only after they were compacted elsewhere."""
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self._records = 0
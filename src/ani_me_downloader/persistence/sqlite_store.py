@@ -0,0 +1,548 @@
+# coding: utf-8
+"""SQLite (WAL) storage backend for animes, episode states and torrents.
+
+Drop-in alternative to the JSON repositories, selected by
+`cfg.storageBackend`. Saves diff against the last persisted rows and touch
+only the anime/torrent rows that changed."""
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+
+from ..core.anime import (
+    Anime,
+    AnimeFormat,
+    AiringStatus,
+    DownloadMode,
+    EpisodeSet,
+    EpStatus,
+)
+from ..core.identity import info_hash_from_magnet
+from ..core.torrent import Torrent, TorrentStatus
+from .anime_repo import anime_summary_to_json
+from .state_store import JsonStateStore
+from .torrent_repo import torrent_to_json, torrents_dedup
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS anime (
+    id                 INTEGER PRIMARY KEY,
+    position           REAL    NOT NULL,
+    name               TEXT    NOT NULL,
+    search_name        TEXT    NOT NULL DEFAULT '',
+    season             INTEGER NOT NULL DEFAULT 1,
+    format             TEXT    NOT NULL DEFAULT 'unknown',
+    output_dir         TEXT    NOT NULL DEFAULT '',
+    img                TEXT    NOT NULL DEFAULT '',
+    watch_urls         TEXT    NOT NULL DEFAULT '{}',
+    status             TEXT    NOT NULL DEFAULT 'unknown',
+    next_eta           INTEGER NOT NULL DEFAULT 0,
+    last_aired_episode INTEGER NOT NULL DEFAULT 0,
+    total_episodes     INTEGER NOT NULL DEFAULT 1,
+    download_mode      TEXT    NOT NULL DEFAULT 'episodes',
+    ep_from            INTEGER NOT NULL DEFAULT 1,
+    ep_to              INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS anime_status ON anime(status);
+CREATE INDEX IF NOT EXISTS anime_position ON anime(position);
+CREATE TABLE IF NOT EXISTS episode_run (
+    anime_id INTEGER NOT NULL REFERENCES anime(id) ON DELETE CASCADE,
+    first_ep INTEGER NOT NULL,
+    last_ep  INTEGER NOT NULL,
+    status   TEXT    NOT NULL,
+    PRIMARY KEY (anime_id, first_ep)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS episode_run_status ON episode_run(status);
+CREATE TABLE IF NOT EXISTS episode_magnet (
+    anime_id  INTEGER NOT NULL REFERENCES anime(id) ON DELETE CASCADE,
+    ep        INTEGER NOT NULL,
+    magnet    TEXT    NOT NULL,
+    info_hash TEXT,
+    PRIMARY KEY (anime_id, ep)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS episode_magnet_hash ON episode_magnet(info_hash);
+CREATE TABLE IF NOT EXISTS torrent (
+    info_hash     TEXT PRIMARY KEY,
+    position      INTEGER NOT NULL,
+    magnet        TEXT    NOT NULL,
+    name          TEXT    NOT NULL DEFAULT '',
+    save_path     TEXT    NOT NULL,
+    desired_state TEXT    NOT NULL DEFAULT 'downloading'
+);
+CREATE TABLE IF NOT EXISTS torrent_owner (
+    info_hash TEXT    NOT NULL REFERENCES torrent(info_hash) ON DELETE CASCADE,
+    anime_id  INTEGER NOT NULL,
+    PRIMARY KEY (info_hash, anime_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS torrent_owner_anime ON torrent_owner(anime_id);
+"""
+
+_ANIME_COLUMNS = (
+    "id", "name", "search_name", "season", "format", "output_dir", "img",
+    "watch_urls", "status", "next_eta", "last_aired_episode", "total_episodes",
+    "download_mode", "ep_from", "ep_to",
+)
+
+
+class SqliteStore:
+    """One WAL-mode connection shared by both repositories.
+
+    Opened with `check_same_thread=False`: loads run on the GUI thread,
+    saves on the write-behind worker. `lock` serializes them."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        with self.lock:
+            self.conn.executescript(_SCHEMA)
+            self.set_meta("schema_version", str(SCHEMA_VERSION))
+
+    def get_meta(self, key: str) -> str | None:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        self.conn.execute(
+            "INSERT INTO meta(key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+    def transaction(self):
+        return _Transaction(self)
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+
+class _Transaction:
+    def __init__(self, store: SqliteStore):
+        self._store = store
+
+    def __enter__(self) -> sqlite3.Connection:
+        self._store.lock.acquire()
+        self._store.conn.execute("BEGIN IMMEDIATE")
+        return self._store.conn
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            self._store.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self._store.lock.release()
+
+
+def _anime_params(a: Anime, position: float) -> tuple:
+    return (
+        a.id, position, a.name, a.search_name, a.season, a.format.value,
+        a.output_dir, a.img, json.dumps(a.watch_urls, ensure_ascii=False),
+        a.status.value, a.next_eta, a.last_aired_episode, a.total_episodes,
+        a.download_mode.value, a.ep_from, a.ep_to,
+    )
+
+
+def _anime_from_row(row: tuple, episodes: EpisodeSet) -> Anime:
+    (aid, name, search_name, season, fmt, output_dir, img, watch_urls, status,
+     next_eta, last_aired, total, mode, ep_from, ep_to) = row
+    return Anime(
+        id=aid,
+        name=name,
+        search_name=search_name,
+        season=season,
+        format=AnimeFormat(fmt),
+        output_dir=output_dir,
+        img=img,
+        watch_urls=json.loads(watch_urls or "{}"),
+        status=AiringStatus(status),
+        next_eta=next_eta,
+        last_aired_episode=last_aired,
+        total_episodes=total,
+        download_mode=DownloadMode(mode),
+        ep_from=ep_from,
+        ep_to=ep_to,
+        episodes=episodes,
+    )
+
+
+def _positions(order: list[int], current: dict[int, float], ids: list[int]) -> dict[int, float] | None:
+    """New positions for `ids`, reusing `current` where the surviving order is
+    unchanged. Returns None when the list was reordered and needs renumbering."""
+    live = set(ids)
+    survivors = [aid for aid in ids if aid in current]
+    if survivors != [aid for aid in order if aid in live]:
+        return None
+    out: dict[int, float] = {}
+    prev: float | None = None
+    i = 0
+    while i < len(ids):
+        aid = ids[i]
+        if aid in current:
+            out[aid] = prev = current[aid]
+            i += 1
+            continue
+        j = i
+        while j < len(ids) and ids[j] not in current:
+            j += 1
+        nxt = current[ids[j]] if j < len(ids) else None
+        lo = prev if prev is not None else (nxt - (j - i + 1) if nxt is not None else 0.0)
+        hi = nxt if nxt is not None else lo + (j - i + 1)
+        step = (hi - lo) / (j - i + 1)
+        if step <= 0 or lo + step == lo:
+            return None
+        for k in range(i, j):
+            out[ids[k]] = lo + step * (k - i + 1)
+        prev = out[ids[j - 1]]
+        i = j
+    return out
+
+
+def _episodes_key(eps: EpisodeSet) -> tuple:
+    return eps.runs(), dict(eps.magnets())
+
+
+class SqliteAnimeRepository:
+    """AnimeRepository over `SqliteStore`. Writes only changed anime rows.
+
+    `load` reads anime rows plus per-status episode counts; each episode set
+    is fetched from `episode_run`/`episode_magnet` on first use. Episodes
+    never decoded are known to match the database and are not compared."""
+
+    def __init__(self, store: SqliteStore):
+        self._store = store
+        self._persisted: dict[int, dict] = {}
+        self._persisted_eps: dict[int, tuple] = {}
+        self._position: dict[int, float] = {}
+        self._order: list[int] = []
+        self._staged: tuple | None = None
+
+    def load(self) -> list[Anime]:
+        with self._store.lock:
+            conn = self._store.conn
+            rows = conn.execute(
+                f"SELECT {', '.join(_ANIME_COLUMNS)}, position FROM anime ORDER BY position"
+            ).fetchall()
+            counts: dict[int, dict[EpStatus, int]] = {}
+            for aid, status, n in conn.execute(
+                "SELECT anime_id, status, SUM(last_ep - first_ep + 1) FROM episode_run "
+                "GROUP BY anime_id, status"
+            ):
+                try:
+                    counts.setdefault(aid, {})[EpStatus(status)] = n
+                except ValueError:
+                    pass
+
+        out: list[Anime] = []
+        self._persisted, self._persisted_eps, self._position = {}, {}, {}
+        for row in rows:
+            aid = row[0]
+            try:
+                eps = EpisodeSet.deferred(
+                    lambda aid=aid: self._load_episodes(aid), counts.get(aid, {})
+                )
+                a = _anime_from_row(row[:-1], eps)
+            except (TypeError, ValueError) as e:
+                logger.warning("Skipping corrupt anime row %s: %s", aid, e)
+                continue
+            out.append(a)
+            self._persisted[aid] = anime_summary_to_json(a)
+            self._position[aid] = row[-1]
+        self._order = [a.id for a in out]
+        return out
+
+    def _load_episodes(self, aid: int) -> EpisodeSet:
+        with self._store.lock:
+            runs = self._store.conn.execute(
+                "SELECT first_ep, last_ep, status FROM episode_run WHERE anime_id = ? "
+                "ORDER BY first_ep",
+                (aid,),
+            ).fetchall()
+            magnets = dict(self._store.conn.execute(
+                "SELECT ep, magnet FROM episode_magnet WHERE anime_id = ?", (aid,)
+            ).fetchall())
+        valid = []
+        for first, last, status in runs:
+            try:
+                valid.append((first, last, EpStatus(status)))
+            except ValueError:
+                logger.warning("Skipping corrupt episode run %s/%s: %s", aid, first, status)
+        eps = EpisodeSet.from_runs(valid, magnets)
+        self._persisted_eps.setdefault(aid, _episodes_key(eps))
+        return eps
+
+    def stage(self, animes: list[Anime]) -> bool:
+        """Diff `animes` against the database. Returns True if `write` has
+        anything to do."""
+        ids = [a.id for a in animes]
+        live = set(ids)
+        summaries = {a.id: anime_summary_to_json(a) for a in animes}
+        changed: list[tuple[Anime, tuple]] = []
+        for a in animes:
+            if a.episodes.is_deferred and self._persisted.get(a.id) == summaries[a.id]:
+                continue
+            key = _episodes_key(a.episodes)
+            if (self._persisted.get(a.id) != summaries[a.id]
+                    or self._persisted_eps.get(a.id) != key):
+                changed.append((a, key))
+        removed = [aid for aid in self._order if aid not in live]
+
+        positions = _positions(self._order, self._position, ids)
+        renumber = positions is None
+        if renumber:
+            positions = {aid: float(i) for i, aid in enumerate(ids)}
+        self._staged = (ids, summaries, changed, removed, positions, renumber)
+        return bool(changed or removed or renumber)
+
+    def write(self, conn: sqlite3.Connection) -> None:
+        """Apply the staged diff inside the caller's transaction."""
+        ids, _, changed, removed, positions, renumber = self._staged
+        conn.executemany("DELETE FROM anime WHERE id = ?", [(aid,) for aid in removed])
+        if renumber:
+            conn.executemany(
+                "UPDATE anime SET position = ? WHERE id = ?",
+                [(positions[aid], aid) for aid in ids if aid in self._position],
+            )
+        for a, (runs, magnets) in changed:
+            conn.execute(
+                f"INSERT INTO anime(id, position, {', '.join(_ANIME_COLUMNS[1:])}) "
+                f"VALUES ({', '.join('?' * (len(_ANIME_COLUMNS) + 1))}) "
+                "ON CONFLICT(id) DO UPDATE SET "
+                + ", ".join(f"{c} = excluded.{c}" for c in ("position", *_ANIME_COLUMNS[1:])),
+                _anime_params(a, positions[a.id]),
+            )
+            conn.execute("DELETE FROM episode_run WHERE anime_id = ?", (a.id,))
+            conn.execute("DELETE FROM episode_magnet WHERE anime_id = ?", (a.id,))
+            conn.executemany(
+                "INSERT INTO episode_run(anime_id, first_ep, last_ep, status) VALUES (?, ?, ?, ?)",
+                [(a.id, s, e, st.value) for s, e, st in runs],
+            )
+            conn.executemany(
+                "INSERT INTO episode_magnet(anime_id, ep, magnet, info_hash) VALUES (?, ?, ?, ?)",
+                [(a.id, n, m, info_hash_from_magnet(m)) for n, m in magnets.items()],
+            )
+
+    def commit_staged(self) -> None:
+        ids, summaries, changed, removed, positions, _ = self._staged
+        for a, key in changed:
+            self._persisted_eps[a.id] = key
+        for aid in removed:
+            self._persisted_eps.pop(aid, None)
+        self._persisted = summaries
+        self._position = positions
+        self._order = ids
+        self._staged = None
+
+    def save(self, animes: list[Anime]) -> None:
+        if self.stage(animes):
+            with self._store.transaction() as conn:
+                self.write(conn)
+        self.commit_staged()
+
+
+class SqliteTorrentRepository:
+    """TorrentRepository over `SqliteStore`. Writes only changed torrent rows."""
+
+    def __init__(self, store: SqliteStore):
+        self._store = store
+        self._persisted: dict[str, dict] = {}
+        self._next_position = 0
+        self._staged: tuple | None = None
+
+    def load(self) -> list[Torrent]:
+        with self._store.lock:
+            conn = self._store.conn
+            rows = conn.execute(
+                "SELECT info_hash, magnet, name, save_path, desired_state FROM torrent ORDER BY position"
+            ).fetchall()
+            (top,) = conn.execute("SELECT COALESCE(MAX(position), -1) FROM torrent").fetchone()
+            self._next_position = top + 1
+            owners: dict[str, set[int]] = {}
+            for ih, aid in conn.execute("SELECT info_hash, anime_id FROM torrent_owner"):
+                owners.setdefault(ih, set()).add(aid)
+
+        out: list[Torrent] = []
+        for ih, magnet, name, save_path, desired in rows:
+            try:
+                t = Torrent(
+                    info_hash=ih,
+                    magnet=magnet,
+                    name=name,
+                    save_path=save_path,
+                    anime_ids=owners.get(ih, set()),
+                    desired_state=TorrentStatus(desired),
+                )
+            except ValueError as e:
+                logger.warning("Skipping corrupt torrent row %s: %s", ih, e)
+                continue
+            out.append(t)
+        self._persisted = {t.info_hash: torrent_to_json(t) for t in out}
+        return out
+
+    def stage(self, torrents: list[Torrent]) -> bool:
+        torrents = torrents_dedup(torrents)
+        rows = {t.info_hash: torrent_to_json(t) for t in torrents}
+        changed = [
+            t for t in torrents
+            if self._persisted.get(t.info_hash, {}) != rows[t.info_hash]
+        ]
+        removed = [ih for ih in self._persisted if ih not in rows]
+        self._staged = (rows, changed, removed)
+        return bool(changed or removed)
+
+    def write(self, conn: sqlite3.Connection) -> None:
+        _, changed, removed = self._staged
+        conn.executemany("DELETE FROM torrent WHERE info_hash = ?", [(ih,) for ih in removed])
+        for t in changed:
+            conn.execute(
+                "INSERT INTO torrent(info_hash, position, magnet, name, save_path, desired_state) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(info_hash) DO UPDATE SET "
+                "magnet = excluded.magnet, name = excluded.name, "
+                "save_path = excluded.save_path, desired_state = excluded.desired_state",
+                (t.info_hash, self._next_position, t.magnet, t.name, t.save_path,
+                 t.desired_state.value),
+            )
+            self._next_position += 1
+            conn.execute("DELETE FROM torrent_owner WHERE info_hash = ?", (t.info_hash,))
+            conn.executemany(
+                "INSERT INTO torrent_owner(info_hash, anime_id) VALUES (?, ?)",
+                [(t.info_hash, aid) for aid in sorted(t.anime_ids)],
+            )
+
+    def commit_staged(self) -> None:
+        self._persisted = self._staged[0]
+        self._staged = None
+
+    def save(self, torrents: list[Torrent]) -> None:
+        if self.stage(torrents):
+            with self._store.transaction() as conn:
+                self.write(conn)
+        self.commit_staged()
+
+
+class SqliteStateStore:
+    """Both SQLite repositories, committed together in one transaction.
+
+    Each group commit bumps `generation` in `meta`; it is only ever written
+    by this class, so its presence means the anime and torrent tables were
+    last changed together and `load` reports them `consistent`."""
+
+    def __init__(self, store: SqliteStore):
+        self.store = store
+        self.animes = SqliteAnimeRepository(store)
+        self.torrents = SqliteTorrentRepository(store)
+        self.generation = 0
+        self.consistent = False
+        self.needs_migration = False
+
+    def load(self) -> tuple[list[Anime], list[Torrent]]:
+        with self.store.lock:
+            gen = self.store.get_meta("generation")
+        self.generation = int(gen) if gen else 0
+        self.consistent = gen is not None
+        return self.animes.load(), self.torrents.load()
+
+    def save(self, animes: list[Anime], torrents: list[Torrent]) -> None:
+        dirty_animes = self.animes.stage(animes)
+        dirty_torrents = self.torrents.stage(torrents)
+        if dirty_animes or dirty_torrents:
+            with self.store.transaction() as conn:
+                if dirty_animes:
+                    self.animes.write(conn)
+                if dirty_torrents:
+                    self.torrents.write(conn)
+                self.store.set_meta("generation", str(self.generation + 1))
+            self.generation += 1
+        self.animes.commit_staged()
+        self.torrents.commit_staged()
+
+    def close(self) -> None:
+        self.store.close()
+
+
+def _has_rows(store: SqliteStore) -> bool:
+    conn = store.conn
+    return bool(
+        conn.execute("SELECT 1 FROM anime LIMIT 1").fetchone()
+        or conn.execute("SELECT 1 FROM torrent LIMIT 1").fetchone()
+    )
+
+
+def import_json(store: SqliteStore, anime_file, torrent_file) -> bool:
+    """Copy the JSON repositories into the database when they changed since
+    the two were last in sync (`json_generation` in `meta`): on first use,
+    and after running on the JSON backend again. The database rows are
+    replaced in one transaction with the sync markers, so an import that
+    fails halfway leaves nothing behind and runs again on the next start.
+    The JSON files are left in place. Returns True if anything was imported."""
+    with store.lock:
+        synced = store.get_meta("json_generation")
+        legacy = store.get_meta("imported_json")
+        has_rows = _has_rows(store)
+    source = JsonStateStore(anime_file, torrent_file)
+    animes, torrents = source.load()
+    if not animes and not torrents:
+        return False
+    if has_rows and (synced == str(source.generation) or (synced is None and legacy)):
+        if synced is None:
+            # Imported before the markers existed: the database is current.
+            with store.transaction():
+                _mark_synced(store, source.generation)
+        return False
+
+    target = SqliteStateStore(store)
+    target.animes.stage(animes)
+    target.torrents.stage(torrents)
+    with store.transaction() as conn:
+        conn.execute("DELETE FROM anime")
+        conn.execute("DELETE FROM torrent")
+        target.animes.write(conn)
+        target.torrents.write(conn)
+        store.set_meta("imported_json", str(anime_file))
+        if source.consistent:
+            gen = store.get_meta("generation")
+            store.set_meta("generation", str(int(gen or 0) + 1))
+        else:
+            # No generation: the first start reconciles, as it would have
+            # on JSON.
+            conn.execute("DELETE FROM meta WHERE key = 'generation'")
+        _mark_synced(store, source.generation)
+    logger.info("Imported %d anime, %d torrents from JSON", len(animes), len(torrents))
+    return True
+
+
+def export_json(store: SqliteStore, anime_file, torrent_file) -> bool:
+    """Write the database back to the JSON repositories when it changed since
+    the two were last in sync, for a switch back to the JSON backend.
+    Returns True if anything was exported."""
+    with store.lock:
+        gen = store.get_meta("generation") or "0"
+        synced = store.get_meta("synced_generation")
+        if not _has_rows(store) or gen == synced:
+            return False
+    animes, torrents = SqliteStateStore(store).load()
+    target = JsonStateStore(anime_file, torrent_file)
+    target.load()
+    target.replace(animes, torrents)
+    with store.transaction():
+        _mark_synced(store, target.generation)
+    logger.info("Exported %d anime, %d torrents to JSON", len(animes), len(torrents))
+    return True
+
+
+def _mark_synced(store: SqliteStore, json_generation: int) -> None:
+    """Record that the database and the JSON files at `json_generation` hold
+    the same library. Call inside a transaction."""
+    store.set_meta("json_generation", str(json_generation))
+    store.set_meta("synced_generation", store.get_meta("generation") or "0")
@@ -5,7 +5,8 @@ from pathlib import Path
 
 from ..core.identity import info_hash_from_magnet
 from ..core.torrent import Torrent, TorrentStatus
-from .json_store import read_json, write_json_atomic
+from .journal import Journal, folded
+from .json_store import gc_paused, read_json, unwrap_snapshot, wrap_snapshot, write_json_atomic
 
 logger = logging.getLogger(__name__)
 
@@ -47,23 +48,119 @@ def torrents_dedup(torrents: list[Torrent]) -> list[Torrent]:
     return list(by_hash.values())
 
 
+# Snapshot schema. 2: compact encoding inside a {schema, generation, items}
+# wrapper; rows are unchanged from 1.
+TORRENT_SCHEMA = 2
+
+
+def _apply_record(order: list[str], rows: dict[str, dict], rec: dict) -> None:
+    """Replay one torrent journal record; other collections' are ignored."""
+    op = rec.get("op")
+    if op == "put" and "torrent" in rec:
+        row = rec["torrent"]
+        ih = row["info_hash"]
+        if ih not in rows:
+            order.append(ih)
+        rows[ih] = row
+    elif op == "del" and "info_hash" in rec:
+        if rows.pop(rec["info_hash"], None) is not None:
+            order.remove(rec["info_hash"])
+
+
 class TorrentRepository:
-    """Loads and saves the torrent list. Sole writer of `torrent_file.json`."""
+    """Loads and saves the torrent list. Sole writer of `torrent_file.json`.
 
-    def __init__(self, path):
+    Without a journal every save rewrites the file. With one (shared with
+    the anime repository by `JsonStateStore`) changes are staged as journal
+    records the same way `AnimeRepository` does."""
+
+    def __init__(self, path, journal: Journal | None = None):
         self.path = Path(path)
+        self.journal = journal
+        self.generation: int | None = None
+        self.needs_migration = False
+        self._persisted: dict[str, dict] = {}
+        self._order: list[str] = []
+        self._staged: tuple[dict[str, dict], list[str]] | None = None
 
-    def load(self) -> list[Torrent]:
-        items = read_json(self.path, default=[])
-        out: list[Torrent] = []
+    def load(self, batches: list[tuple[int | None, list[dict]]] | None = None) -> list[Torrent]:
+        """See `AnimeRepository.load`."""
+        with gc_paused():
+            return self._load(batches)
+
+    def _load(self, batches) -> list[Torrent]:
+        items, self.generation, schema = unwrap_snapshot(read_json(self.path, default=[]))
+        self.needs_migration = bool(items) and schema < TORRENT_SCHEMA
+        if batches is None and self.journal is not None:
+            batches = self.journal.replay()
+        order: list[str] = []
+        rows: dict[str, dict] = {}
         for d in items:
             try:
-                out.append(torrent_from_json(d))
-            except (KeyError, ValueError) as e:
+                t = torrent_from_json(d)
+            except (KeyError, TypeError, ValueError) as e:
                 logger.warning("Skipping corrupt torrent row: %s", e)
+                continue
+            if t.info_hash not in rows:
+                order.append(t.info_hash)
+            rows[t.info_hash] = torrent_to_json(t)
+        for gen, records in batches or ():
+            if folded(gen, self.generation):
+                continue
+            for rec in records:
+                try:
+                    _apply_record(order, rows, rec)
+                except (KeyError, TypeError, ValueError) as e:
+                    logger.warning("Skipping corrupt journal record: %s", e)
+            self.generation = gen
+
+        out: list[Torrent] = []
+        self._persisted = {}
+        for ih in order:
+            try:
+                t = torrent_from_json(rows[ih])
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning("Skipping corrupt torrent row: %s", e)
+                continue
+            out.append(t)
+            self._persisted[ih] = rows[ih]
+        self._order = [t.info_hash for t in out]
         return out
 
+    def stage(self, torrents: list[Torrent]) -> tuple[list[dict], bool]:
+        """Journal records for the changes since the last commit, and whether
+        the snapshot must be rewritten to keep the list order."""
+        rows = {t.info_hash: torrent_to_json(t) for t in torrents_dedup(torrents)}
+        ids = list(rows)
+        records: list[dict] = [
+            {"op": "del", "info_hash": ih} for ih in self._order if ih not in rows
+        ]
+        order = [ih for ih in self._order if ih in rows]
+        for ih, row in rows.items():
+            if self._persisted.get(ih) != row:
+                records.append({"op": "put", "torrent": row})
+                if ih not in self._persisted:
+                    order.append(ih)
+        self._staged = (rows, ids)
+        return records, order != ids
+
+    def staged_rows(self) -> list[dict]:
+        return list(self._staged[0].values())
+
+    def commit_staged(self) -> None:
+        self._persisted, self._order = self._staged
+        self._staged = None
+
     def save(self, torrents: list[Torrent]) -> None:
-        write_json_atomic(
-            self.path, [torrent_to_json(t) for t in torrents_dedup(torrents)]
-        )
+        """Rewrite the snapshot. A journaled repository is saved by its
+        journal's owner instead."""
+        if self.journal is not None:
+            raise RuntimeError("journaled TorrentRepository: save through its JsonStateStore")
+        self.stage(torrents)
+        self.write_snapshot(self.staged_rows(), (self.generation or 0) + 1)
+        self.commit_staged()
+
+    def write_snapshot(self, rows: list[dict], generation: int) -> None:
+        write_json_atomic(self.path, wrap_snapshot(rows, generation, TORRENT_SCHEMA))
+        self.generation = generation
+        self.needs_migration = False
@@ -0,0 +1,97 @@
+# coding: utf-8
+"""Coalescing write-behind worker. Keeps fsync'd saves off the caller's thread."""
+import logging
+import threading
+import time
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+# Back-off before retrying a job that raised (disk full, file locked, ...).
+_RETRY_SECONDS = 1.0
+
+
+class WriteBehind:
+    """Runs save jobs on a daemon thread.
+
+    Jobs are keyed; submitting under a key that is already pending replaces
+    the older job, so a burst of saves collapses into one write. A batch is
+    written `window` seconds after the first submit that dirtied it, or
+    immediately on `flush()` / `close()`."""
+
+    def __init__(self, window: float, *, name: str = "write-behind"):
+        self._window = max(0.0, window)
+        self._cond = threading.Condition()
+        self._pending: dict[str, Callable[[], None]] = {}
+        self._due: float | None = None
+        self._submitted = 0
+        self._written = 0
+        self._failing: set[str] = set()  # keys whose last attempt raised
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, key: str, job: Callable[[], None]) -> None:
+        with self._cond:
+            if self._closed:
+                job()
+                return
+            self._pending[key] = job
+            self._submitted += 1
+            if self._due is None:
+                self._due = time.monotonic() + self._window
+            self._cond.notify_all()
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Barrier: block until every job submitted so far has been attempted.
+        Returns False on timeout or while a job's last attempt failed (it is
+        retried in the background)."""
+        with self._cond:
+            target = self._submitted
+            if self._pending:
+                self._due = time.monotonic()
+                self._cond.notify_all()
+            done = self._cond.wait_for(lambda: self._written >= target, timeout)
+            return done and not self._failing
+
+    def close(self, timeout: float | None = None) -> None:
+        """Write whatever is pending and stop the worker. Later submits run inline."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                while self._pending and not self._closed:
+                    delay = self._due - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                if not self._pending:
+                    return
+                jobs, self._pending = self._pending, {}
+                target = self._submitted
+                self._due = None
+
+            failed: dict[str, Callable[[], None]] = {}
+            for key, job in jobs.items():
+                try:
+                    job()
+                except Exception:
+                    logger.exception("Write-behind job %r failed", key)
+                    failed[key] = job
+
+            with self._cond:
+                self._failing.difference_update(jobs)
+                self._failing.update(failed)
+                if failed and not self._closed:
+                    for key, job in failed.items():
+                        self._pending.setdefault(key, job)
+                    if self._due is None:
+                        self._due = time.monotonic() + max(self._window, _RETRY_SECONDS)
+                self._written = target
+                self._cond.notify_all()
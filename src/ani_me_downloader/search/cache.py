@@ -0,0 +1,154 @@
+# coding: utf-8
+"""TTL + LRU cache for Nyaa search results, with single-flight loads."""
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Hashable
+
+from .nyaa import NyaaResult
+
+MAX_ENTRIES = 256
+MAX_BYTES = 8 * 1024 * 1024
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0  # lookups that waited on an identical in-flight load
+    expired: int = 0
+    evicted: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.hits} hits, {self.misses} misses, {self.coalesced} coalesced, "
+            f"{self.entries} entries ({self.bytes // 1024} KiB)"
+        )
+
+
+def result_size(results: list[NyaaResult]) -> int:
+    """Rough resident size of a result list: the strings dominate."""
+    size = sys.getsizeof(results)
+    for r in results:
+        size += 64 + sys.getsizeof(r.title) + sys.getsizeof(r.magnet) + sys.getsizeof(r.size)
+    return size
+
+
+class _Flight:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: list[NyaaResult] = []
+        self.error: BaseException | None = None
+
+
+class SearchCache:
+    """Search results by key for `ttl()` seconds, least recently used first
+    out once `max_entries` or `max_bytes` is exceeded.
+
+    Concurrent lookups of a key that is being loaded wait for that load
+    instead of issuing their own. Empty results are not kept: search_nyaa
+    returns [] on network errors too, and those should be retried."""
+
+    def __init__(
+        self,
+        *,
+        ttl: Callable[[], float],
+        max_entries: int = MAX_ENTRIES,
+        max_bytes: int = MAX_BYTES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (expires_at, size, results), least recently used first
+        self._entries: OrderedDict[Hashable, tuple[float, int, list[NyaaResult]]] = OrderedDict()
+        self._flights: dict[Hashable, _Flight] = {}
+        self._stats = CacheStats()
+
+    def get_or_load(
+        self, key: Hashable, load: Callable[[], list[NyaaResult]]
+    ) -> list[NyaaResult]:
+        """Cached results for `key`, or `load()` them. Returns a new list."""
+        with self._lock:
+            hit = self._lookup(key)
+            if hit is not None:
+                self._stats.hits += 1
+                return list(hit)
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self._stats.misses += 1
+            else:
+                self._stats.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return list(flight.value)
+
+        try:
+            flight.value = load()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                if flight.error is None:
+                    self._store(key, flight.value)
+            flight.done.set()
+        return list(flight.value)
+
+    def invalidate(self, key: Hashable | None = None) -> None:
+        """Drop `key`, or everything."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._stats.bytes = 0
+            elif key in self._entries:
+                self._stats.bytes -= self._entries.pop(key)[1]
+            self._stats.entries = len(self._entries)
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(**vars(self._stats))
+
+    def _lookup(self, key: Hashable) -> list[NyaaResult] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, size, results = entry
+        if self._clock() >= expires_at:
+            del self._entries[key]
+            self._stats.bytes -= size
+            self._stats.entries = len(self._entries)
+            self._stats.expired += 1
+            return None
+        self._entries.move_to_end(key)
+        return results
+
+    def _store(self, key: Hashable, results: list[NyaaResult]) -> None:
+        ttl = self._ttl()
+        size = result_size(results)
+        if ttl <= 0 or not results or size > self._max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._stats.bytes -= old[1]
+        self._entries[key] = (self._clock() + ttl, size, results)
+        self._stats.bytes += size
+        while len(self._entries) > self._max_entries or self._stats.bytes > self._max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._stats.bytes -= evicted_size
+            self._stats.evicted += 1
+        self._stats.entries = len(self._entries)
@@ -0,0 +1,132 @@
+# coding: utf-8
+"""Hedged requests across two origins, timed by recent per-origin latency."""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+WINDOW = 32  # recent outcomes kept per origin
+MIN_SAMPLES = 5
+
+
+class Cancelled(Exception):
+    """Raised inside the losing request once the other origin answered."""
+
+
+class LatencyTracker:
+    """Outcome of the last WINDOW requests per origin: latency in seconds
+    for successes, None for errors."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples: dict[str, deque[float | None]] = {}
+
+    def record(self, origin: str, seconds: float | None) -> None:
+        with self._lock:
+            self._samples.setdefault(origin, deque(maxlen=WINDOW)).append(seconds)
+
+    def quantile(self, origin: str, q: float) -> float | None:
+        """Latency quantile of recent successes, or None with too few."""
+        with self._lock:
+            ok = sorted(s for s in self._samples.get(origin, ()) if s is not None)
+        if len(ok) < MIN_SAMPLES:
+            return None
+        return ok[min(len(ok) - 1, int(q * len(ok)))]
+
+    def error_rate(self, origin: str) -> float:
+        with self._lock:
+            samples = self._samples.get(origin, ())
+            return sum(s is None for s in samples) / len(samples) if samples else 0.0
+
+    def summary(self) -> str:
+        parts = []
+        for origin in sorted(self._samples):
+            p50 = self.quantile(origin, 0.5)
+            p50_text = f"{p50 * 1000:.0f} ms" if p50 is not None else "-"
+            parts.append(f"{origin} p50 {p50_text}, {self.error_rate(origin):.0%} errors")
+        return "; ".join(parts)
+
+
+class Hedge:
+    """Run `call(origin, cancel, started)` on the preferred origin; if it
+    has not answered after `delay(preferred)` (or failed), run it on the
+    alternate too. The first success wins and the other call's `cancel`
+    event is set. Raises the last error when both fail.
+
+    A call invokes `started()` once its request actually goes out (after
+    any wait for a host slot); latency is measured from there, or from the
+    start of the call if it never does.
+
+    The delay is the `quantile` latency of the preferred origin's recent
+    successes, clamped to [min_delay, max_delay]; `initial_delay` until
+    enough samples exist, and no delay while most recent calls failed."""
+
+    def __init__(
+        self,
+        tracker: LatencyTracker | None = None,
+        *,
+        quantile: float = 0.9,
+        min_delay: float = 0.2,
+        max_delay: float = 3.0,
+        initial_delay: float = 1.0,
+        max_workers: int = 16,
+    ):
+        self.tracker = tracker or LatencyTracker()
+        self._quantile = quantile
+        self._min_delay = min_delay
+        self._max_delay = max_delay
+        self._initial_delay = initial_delay
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix="hedge")
+
+    def delay(self, origin: str) -> float:
+        if self.tracker.error_rate(origin) > 0.5:
+            return 0.0
+        q = self.tracker.quantile(origin, self._quantile)
+        if q is None:
+            return self._initial_delay
+        return min(self._max_delay, max(self._min_delay, q))
+
+    def run(self, call: Callable[[str, threading.Event, Callable[[], None]], T], origins: tuple[str, str]) -> T:
+        preferred, alternate = origins
+        cancel = {preferred: threading.Event(), alternate: threading.Event()}
+        futures: dict[Future, str] = {
+            self._pool.submit(self._timed, call, preferred, cancel[preferred]): preferred
+        }
+        done, _ = wait(futures, timeout=self.delay(preferred))
+        first = next(iter(done), None)
+        if first is not None and first.exception() is None:
+            return first.result()
+        futures[self._pool.submit(self._timed, call, alternate, cancel[alternate])] = alternate
+
+        error: BaseException | None = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None:
+                    for other in pending:
+                        cancel[futures[other]].set()
+                    return f.result()
+                error = f.exception()
+        raise error
+
+    def _timed(self, call: Callable[[str, threading.Event, Callable[[], None]], T],
+               origin: str, cancel: threading.Event) -> T:
+        start = time.monotonic()
+
+        def started() -> None:
+            nonlocal start
+            start = time.monotonic()
+
+        try:
+            result = call(origin, cancel, started)
+        except Cancelled:
+            raise
+        except Exception:
+            self.tracker.record(origin, None)
+            raise
+        self.tracker.record(origin, time.monotonic() - start)
+        return result
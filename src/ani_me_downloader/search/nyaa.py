@@ -1,13 +1,56 @@
 # coding: utf-8
-"""Nyaa.si torrent scraping. Pure function; takes use_proxy as a param."""
+"""Nyaa.si torrent search. Pure function; takes use_proxy as a param.
+
+Two backends return the same rows. "html", the default, scrapes the
+listing page with BeautifulSoup, in the parse pool when it runs. "rss"
+(opt-in) asks for `page=rss` and streams the feed through an XML pull
+parser, reading seeders, size and infoHash from the nyaa namespace; it
+falls back to the listing page when the feed fails.
+
+Either backend can be hedged across nyaa.si and the proxy mirror."""
+import threading
+from contextlib import AbstractContextManager, nullcontext
 from dataclasses import dataclass
+from functools import partial
+from typing import Callable, Iterable, Iterator
+from urllib.parse import quote, urlparse
+from xml.etree import ElementTree
 
 import requests
 from bs4 import BeautifulSoup
 
+from ..core import parse_pool
+from .hedge import Cancelled, Hedge
+
 NYAA_URL = "https://nyaa.si"
 PROXY_URL = "https://ani-me-downloader-proxy.vercel.app"
 
+BACKENDS = ("html", "rss")
+PAGE_SIZE = 75  # rows per listing page and per feed page
+
+# Searches: every anime category, most seeded first. `q` and `p` are added.
+SEARCH_PARAMS = {"f": "0", "c": "1_0", "s": "seeders", "o": "desc"}
+# The new-upload feed: English-translated anime, 1080p releases only.
+FEED_CATEGORY = "1_2"
+FEED_QUERY = "1080p"
+
+# The feed has no magnet links, only the info hash; these are the trackers
+# nyaa puts in the magnets on its listing page.
+NYAA_TRACKERS = (
+    "http://nyaa.tracker.wf:7777/announce",
+    "udp://open.stealth.si:80/announce",
+    "udp://tracker.opentrackr.org:1337/announce",
+    "udp://exodus.desync.com:6969/announce",
+    "udp://tracker.torrent.eu.org:451/announce",
+)
+
+_NS = "{https://nyaa.si/xmlns/nyaa}"
+_SEEDERS = _NS + "seeders"
+_SIZE = _NS + "size"
+_INFO_HASH = _NS + "infoHash"
+_TRACKER_PARAMS = "".join(f"&tr={quote(t, safe='')}" for t in NYAA_TRACKERS)
+_CHUNK = 64 * 1024
+
 
 @dataclass
 class NyaaResult:
@@ -15,35 +58,201 @@ class NyaaResult:
     magnet: str
     size: str
     seeds: int
+    id: int = 0  # nyaa.si/view/<id>; increases with upload order, 0 if unknown
 
 
-def search_nyaa(query: str, *, use_proxy: bool, timeout: int = 10) -> list[NyaaResult]:
-    """Scrape Nyaa torrent rows for `query`. Returns seed-sorted descending."""
-    base = PROXY_URL if use_proxy else NYAA_URL
-    params = {"f": "0", "c": "1_0", "q": query, "s": "seeders", "o": "desc"}
+def search_nyaa(
+    query: str,
+    *,
+    use_proxy: bool,
+    timeout: int = 10,
+    backend: str = "html",
+    page: int = 1,
+    hedge: Hedge | None = None,
+    slot: Callable[..., AbstractContextManager] | None = None,
+) -> list[NyaaResult]:
+    """One page of Nyaa torrent rows for `query`. Returns seed-sorted descending.
+
+    With a `hedge`, the other origin (proxy or nyaa.si) is raced against the
+    preferred one when it is slow to answer. `slot(host, cancel)` is held
+    around each request to that host, the hedged one included; it gives up
+    waiting with Cancelled once `cancel` is set."""
+    params = {**SEARCH_PARAMS, "q": query}
+    if page > 1:
+        params["p"] = str(page)
+    origins = (PROXY_URL, NYAA_URL) if use_proxy else (NYAA_URL, PROXY_URL)
+    fetch = partial(_fetch, params=params, timeout=timeout, backend=backend, slot=slot)
     try:
-        response = requests.get(base, params=params, timeout=timeout)
+        if hedge is not None:
+            return hedge.run(fetch, origins)
+        return fetch(origins[0])
     except requests.exceptions.RequestException as e:
         print(f"Network error in search_nyaa: {e}")
         return []
-    print("Request URL:", response.url)
-    if not response:
-        return []
-    soup = BeautifulSoup(response.text, "html.parser")
+
+
+def _fetch(
+    base: str,
+    cancel: threading.Event | None = None,
+    started: Callable[[], None] | None = None,
+    *,
+    params: dict,
+    timeout: int,
+    backend: str,
+    slot: Callable[..., AbstractContextManager] | None = None,
+) -> list[NyaaResult]:
+    """Rows from one origin. Raises on network errors and bad statuses,
+    and Cancelled once `cancel` is set. `started()` is called when the
+    request goes out, after the host slot is held."""
+    _check(cancel)
+    with slot(urlparse(base).netloc, cancel) if slot is not None else nullcontext():
+        _check(cancel)  # the other origin may have answered while we queued
+        if started is not None:
+            started()
+        if backend == "rss":
+            try:
+                return _search_rss(base, params, timeout, cancel)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                # The listing page is on the same host; no point waiting twice.
+                raise
+            except (requests.exceptions.RequestException, ElementTree.ParseError) as e:
+                print(f"Nyaa RSS search failed, falling back to HTML: {e}")
+        return _search_html(base, params, timeout, cancel)
+
+
+def search_pages(
+    fetch_page: Callable[[int], list[NyaaResult]], *, max_pages: int
+) -> Iterator[NyaaResult]:
+    """Rows from `fetch_page(1)`, `fetch_page(2)`, ... up to `max_pages`.
+
+    A page is fetched only when the consumer has taken every row of the
+    previous one, so stopping early saves the remaining requests. Ends at
+    a short or empty page, or one that repeats the previous page (past the
+    last page some mirrors serve page 1 again)."""
+    previous: list[NyaaResult] = []
+    for page in range(1, max_pages + 1):
+        rows = fetch_page(page)
+        if not rows or (previous and rows[0].magnet == previous[0].magnet):
+            return
+        yield from rows
+        if len(rows) < PAGE_SIZE:
+            return
+        previous = rows
+
+
+def fetch_feed(*, use_proxy: bool, uploader: str = "", timeout: int = 10) -> list[NyaaResult]:
+    """Newest uploads in FEED_CATEGORY matching FEED_QUERY, site-wide or
+    for one nyaa user, newest first. Raises on network or XML errors."""
+    base = PROXY_URL if use_proxy else NYAA_URL
+    params = {"f": "0", "c": FEED_CATEGORY, "q": FEED_QUERY}
+    if uploader:
+        params["u"] = uploader
+    return _search_rss(base, params, timeout)
+
+
+def _search_rss(
+    base: str, params: dict, timeout: int, cancel: threading.Event | None = None
+) -> list[NyaaResult]:
+    with requests.get(
+        base, params={**params, "page": "rss"}, timeout=timeout, stream=True
+    ) as response:
+        print("Request URL:", response.url)
+        response.raise_for_status()
+        chunks = response.iter_content(_CHUNK)
+        return parse_rss(chunks if cancel is None else _until(cancel, chunks))
+
+
+def _check(cancel: threading.Event | None) -> None:
+    if cancel is not None and cancel.is_set():
+        raise Cancelled()
+
+
+def _until(cancel: threading.Event, chunks: Iterable[bytes]) -> Iterator[bytes]:
+    for chunk in chunks:
+        if cancel.is_set():
+            raise Cancelled()
+        yield chunk
+
+
+def _search_html(
+    base: str, params: dict, timeout: int, cancel: threading.Event | None = None
+) -> list[NyaaResult]:
+    _check(cancel)
+    with requests.get(base, params=params, timeout=timeout, stream=True) as response:
+        print("Request URL:", response.url)
+        response.raise_for_status()
+        chunks = response.iter_content(_CHUNK)
+        content = b"".join(chunks if cancel is None else _until(cancel, chunks))
+    _check(cancel)  # lost the race; skip the parse
+    return [NyaaResult(*row) for row in parse_pool.run(parse_html_rows, content)]
+
+
+def rss_magnet(info_hash: str, title: str) -> str:
+    """Magnet for a feed item, in the form the listing page links."""
+    return f"magnet:?xt=urn:btih:{info_hash}&dn={quote(title, safe='')}{_TRACKER_PARAMS}"
+
+
+def parse_rss(chunks: Iterable[bytes]) -> list[NyaaResult]:
+    """Parse a Nyaa RSS feed fed as byte chunks. Each <item> is read and
+    cleared as soon as it closes, so the tree never holds the whole feed.
+    Raises ElementTree.ParseError on malformed XML."""
+    parser = ElementTree.XMLPullParser(events=("end",))
+    out: list[NyaaResult] = []
+    for chunk in chunks:
+        parser.feed(chunk)
+        _read_items(parser, out)
+    parser.close()
+    _read_items(parser, out)
+    return out
+
+
+def _view_id(url: str) -> int:
+    tail = url.rstrip("/").rsplit("/", 1)[-1]
+    return int(tail) if tail.isdigit() else 0
+
+
+def _read_items(parser: ElementTree.XMLPullParser, out: list[NyaaResult]) -> None:
+    for _, elem in parser.read_events():
+        if elem.tag != "item":
+            continue
+        title = (elem.findtext("title") or "").strip()
+        info_hash = (elem.findtext(_INFO_HASH) or "").strip().lower()
+        if title and info_hash:
+            seed_text = (elem.findtext(_SEEDERS) or "").strip()
+            out.append(NyaaResult(
+                title=title,
+                magnet=rss_magnet(info_hash, title),
+                size=(elem.findtext(_SIZE) or "").strip(),
+                seeds=int(seed_text) if seed_text.isdigit() else 0,
+                id=_view_id(elem.findtext("guid") or ""),
+            ))
+        elem.clear()
+
+
+def parse_html(text: str | bytes) -> list[NyaaResult]:
+    """Parse the torrent-list table of a Nyaa listing page."""
+    return [NyaaResult(*row) for row in parse_html_rows(text)]
+
+
+def parse_html_rows(page: str | bytes) -> list[tuple[str, str, str, int, int]]:
+    """`parse_html` as plain (title, magnet, size, seeds, id) tuples, cheap
+    to send back from a parse-pool worker."""
+    soup = BeautifulSoup(page, "html.parser")
     if "No results found" in soup.text:
         return []
 
-    out: list[NyaaResult] = []
+    out: list[tuple[str, str, str, int, int]] = []
     try:
         rows = soup.find("table", {"class": "torrent-list"}).find("tbody").find_all("tr")
     except AttributeError:
         return []
     for row in rows:
         try:
-            title = row.find(
+            view = row.find(
                 "a",
                 {"href": lambda x: x.startswith("/view") and not x.endswith("#comments")},
-            )["title"]
+            )
+            title = view["title"]
             magnet = row.find("a", {"href": lambda x: x.startswith("magnet")})["href"]
             # td layout: [category, name, links*, size*, date*, seeds*, leechers*, downloads*]
             links_cell = row.find("td", {"class": "text-center"})
@@ -52,7 +261,7 @@ def search_nyaa(query: str, *, use_proxy: bool, timeout: int = 10) -> list[NyaaR
             size = size_cell.get_text(strip=True)
             seed_text = seed_cell.get_text(strip=True)
             seeds = int(seed_text) if seed_text.isdigit() else 0
-            out.append(NyaaResult(title=title, magnet=magnet, size=size, seeds=seeds))
+            out.append((title, magnet, size, seeds, _view_id(view["href"])))
         except Exception as e:
             print(f"Error parsing nyaa.si row: {e}")
     return out
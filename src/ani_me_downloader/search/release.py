@@ -0,0 +1,111 @@
+# coding: utf-8
+"""Release-title parsing for the selector. Each title is parsed once."""
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable
+
+from .nyaa import NyaaResult
+
+LANGUAGE_MARKERS = (
+    "vostfr",
+    "multi-sub",
+    "multiple subtitle",
+    "eng-sub",
+    "english sub",
+    "dual audio",
+    "multi-audio",
+    "dub",
+)
+BATCH_KEYWORDS = ("batch", "complete")
+
+_GROUP = re.compile(r"^\s*(\[[^\]]+\])")
+_RESOLUTION = re.compile(r"(?<!\d)(\d{3,4})p\b")
+_SXE = re.compile(r"\bs(\d{1,2})e(\d{1,4})(?:\s*-\s*e?(\d{1,4}))?\b")
+_SEASON = re.compile(r"\bseason (\d{1,2})\b|\b(\d{1,2})(?:st|nd|rd|th) season\b")
+_DASH_EPISODE = re.compile(r" - (\d{1,4})(?:v\d)?(?:\s*-\s*(\d{1,4}))?(?= |$)")
+_E_EPISODE = re.compile(r"\be(\d{1,4})(?= |$)")
+_RANGE = re.compile(r"\b(\d{1,4}) ?[-~] ?(\d{1,4})\b")
+
+_NUMBER_THEN_SPACE = re.compile(r"(\d+) ")
+
+
+@dataclass(frozen=True)
+class Release:
+    """Structured view of a release title. Text fields are lowercase.
+
+    `season` comes from an SxxEyy marker or "season N" / "Nth season";
+    `episodes` from SxxEyy, " - 05" or "e05", or a range in a batch title.
+    `resolution` is the first "1080p"-style tag.
+
+    `numbers` holds every integer an episode pattern could match: the value
+    of each suffix of a digit run followed by a space ("x265 " gives 265,
+    65 and 5), plus the ends of `episodes`. Uploader patterns end in an
+    episode number and a space, so an episode absent from `numbers` cannot
+    match any of them, nor the parsed episode."""
+    title_lower: str
+    group: str  # "[subsplease]", or "" when the title has no leading tag
+    season: int | None
+    episodes: tuple[int, int] | None  # first, last; equal for one episode
+    resolution: int | None
+    batch: bool
+    languages: frozenset[str]
+    numbers: frozenset[int]
+
+
+@lru_cache(maxsize=8192)
+def parse_release(title: str) -> Release:
+    t = title.lower()
+    group = _GROUP.match(t)
+    resolution = _RESOLUTION.search(t)
+
+    season = episodes = None
+    if m := _SXE.search(t):
+        season = int(m[1])
+        first = int(m[2])
+        episodes = (first, int(m[3]) if m[3] else first)
+    else:
+        m = _DASH_EPISODE.search(t) or _E_EPISODE.search(t)
+        if m:
+            first = int(m[1])
+            last = int(m[2]) if m.lastindex and m.lastindex > 1 and m[2] else first
+            episodes = (first, last)
+        elif any(k in t for k in BATCH_KEYWORDS) and (m := _RANGE.search(t)):
+            episodes = (int(m[1]), int(m[2]))
+    if season is None and (m := _SEASON.search(t)):
+        season = int(m[1] or m[2])
+
+    numbers = set(episodes or ())
+    for m in _NUMBER_THEN_SPACE.finditer(t):
+        run = m[1]
+        numbers.update(int(run[i:]) for i in range(len(run)))
+
+    return Release(
+        title_lower=t,
+        group=group[1] if group else "",
+        season=season,
+        episodes=episodes,
+        resolution=int(resolution[1]) if resolution else None,
+        batch=any(k in t for k in BATCH_KEYWORDS)
+        or (episodes is not None and episodes[1] > episodes[0]),
+        languages=frozenset(k for k in LANGUAGE_MARKERS if k in t),
+        numbers=frozenset(numbers),
+    )
+
+
+class ReleaseIndex:
+    """Episode number → results that could carry it, in result order.
+
+    Built once for a result list that many anime are matched against, such
+    as the pass-wide feed, so each anime only looks at the few results
+    indexed under its pending episodes."""
+
+    def __init__(self, results: Iterable[NyaaResult]):
+        self.results = list(results)
+        self._by_episode: dict[int, list[int]] = {}
+        for pos, r in enumerate(self.results):
+            for n in parse_release(r.title).numbers:
+                self._by_episode.setdefault(n, []).append(pos)
+
+    def candidates(self, episode: int) -> list[NyaaResult]:
+        return [self.results[pos] for pos in self._by_episode.get(episode, ())]
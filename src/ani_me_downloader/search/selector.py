@@ -1,11 +1,15 @@
 # coding: utf-8
 """Pure torrent selection from a list of NyaaResults."""
 import re
+from functools import lru_cache
+from typing import Callable, Iterable
 
 from .nyaa import NyaaResult
-from .uploader_rules import DEFAULT_RULES, UploaderRule
+from .release import Release, ReleaseIndex, parse_release
+from .uploader_rules import DEFAULT_RULES, RuleMatcher, UploaderRule, compile_rules
 
 
+@lru_cache(maxsize=512)
 def _name_regex(name: str, search_name: str) -> re.Pattern:
     n = re.escape(name)
     sn = re.escape(search_name) if search_name else n
@@ -13,60 +17,148 @@ def _name_regex(name: str, search_name: str) -> re.Pattern:
     return re.compile(pattern, re.IGNORECASE)
 
 
-def _matches_episode_rule(rule: UploaderRule, title_lower: str, season: int, episode: int) -> bool:
-    if rule.tag not in title_lower:
+def library_matcher(names: Iterable[tuple[str, str]]) -> Callable[[str], bool]:
+    """Whether a title names any of the (name, search name) anime, as
+    `select_torrents` requires of a pick. A substring check picks the few
+    anime worth running the name pattern for."""
+    anime = [
+        (name.lower(), (search_name or name).lower(), name, search_name or name)
+        for name, search_name in names
+    ]
+
+    def matches(title: str) -> bool:
+        t = title.lower()
+        return any(
+            (n in t or sn in t) and _name_regex(name, search_name).search(title) is not None
+            for n, sn, name, search_name in anime
+        )
+
+    return matches
+
+
+def _season_matches(release: Release, season: int) -> bool:
+    """A later season must be named; a first-season title may name none."""
+    if season > 1:
+        return release.season == season
+    return release.season in (None, 1)
+
+
+def _fallback_episode_match(release: Release, season: int, episode: int) -> bool:
+    """Generic season+episode markers when no uploader rule matches: an
+    SxxEyy (or "season N" and an episode) for this episode alone, or
+    " e05 " in a first-season title."""
+    if release.episodes != (episode, episode):
         return False
-    return rule.episode_pattern.format(season=season, episode=episode) in title_lower
+    if release.season is not None:
+        return release.season == season
+    return season < 2 and f" e{episode:02d} " in release.title_lower
 
 
-def _fallback_episode_match(title_lower: str, season: int, episode: int) -> bool:
-    """Generic season+episode patterns when no uploader rule matches."""
-    primary = f" s{season:02d}e{episode:02d} "
-    if primary in title_lower:
-        return True
-    if season < 2 and f" e{episode:02d} " in title_lower:
-        return True
-    return False
+def _accepts(release: Release, season: int, episode: int | None, matcher: RuleMatcher) -> bool:
+    """Name already matched; does the title carry `episode` (or a batch)?"""
+    title_lower = release.title_lower
+    present = matcher.present(title_lower)
+    if episode is None:
+        if not _season_matches(release, season):
+            return False
+        return any(
+            rule.accepts_batch
+            and (release.batch or any(k in title_lower for k in rule.batch_keywords))
+            for rule in present
+        )
+
+    if matcher.indexable:
+        if episode in matcher.episodes(title_lower, season):
+            return True
+    else:
+        for rule in present:
+            if not rule.accepts_episodes:
+                continue
+            if rule.episode_pattern.format(season=season, episode=episode) in title_lower:
+                return True
+    return _fallback_episode_match(release, season, episode)
 
 
-def select_torrent(
-    results: list[NyaaResult],
+def select_torrents(
+    results: Iterable[NyaaResult] | ReleaseIndex,
     *,
     name: str,
     search_name: str,
     season: int,
-    episode: int | None,
+    episodes: Iterable[int | None],
     rules: tuple[UploaderRule, ...] = DEFAULT_RULES,
-) -> str | None:
-    """Return the magnet of the best matching torrent, or None.
+) -> dict[int | None, str]:
+    """Magnet of the best matching torrent for each of `episodes`, in one
+    pass over `results`. Episodes without a match are absent.
 
-    `episode is None` selects a batch torrent. Results assumed seed-sorted.
+    Each title is parsed once (memoized) into a Release and only checked
+    against the episodes its numbers could match. A pick's first
+    resolution tag is 1080p, it is not vostfr and it names the anime; a
+    batch must also be of `season`. Stops consuming `results` once every
+    episode has a match, so a lazy paginated search fetches no more pages
+    than it needs. A ReleaseIndex is looked up per episode instead of
+    scanned. `None` selects a batch torrent. Results assumed seed-sorted.
     """
+    wanted = list(dict.fromkeys(episodes))
+    picks: dict[int | None, str] = {}
+    if not wanted:
+        return picks
     regex = _name_regex(name, search_name)
-    season_marker = f"(season {season})" if season > 1 else ""
+    matcher = compile_rules(rules)
+    by_number = matcher.indexable
+
+    def eligible(r: NyaaResult, release: Release) -> bool:
+        return (
+            release.resolution == 1080
+            and "vostfr" not in release.languages
+            and regex.search(r.title) is not None
+        )
+
+    def accepts(r: NyaaResult, episode: int | None) -> bool:
+        release = parse_release(r.title)
+        return eligible(r, release) and _accepts(release, season, episode, matcher)
 
+    if isinstance(results, ReleaseIndex):
+        if by_number:
+            for episode in wanted:
+                candidates = results.results if episode is None else results.candidates(episode)
+                magnet = next((r.magnet for r in candidates if accepts(r, episode)), None)
+                if magnet is not None:
+                    picks[episode] = magnet
+            return picks
+        results = results.results
+
+    remaining = set(wanted)
     for r in results:
-        title_lower = r.title.lower()
-        if not regex.search(r.title) or "vostfr" in title_lower:
+        release = parse_release(r.title)
+        if not eligible(r, release):
             continue
+        check = remaining & release.numbers if by_number else set(remaining)
+        if None in remaining:
+            check.add(None)
+        for episode in check:
+            if _accepts(release, season, episode, matcher):
+                picks[episode] = r.magnet
+                remaining.discard(episode)
+        if not remaining:
+            break
+    return picks
 
-        if episode is None:
-            for rule in rules:
-                if not rule.accepts_batch or rule.tag not in title_lower:
-                    continue
-                if not any(k in title_lower for k in rule.batch_keywords):
-                    continue
-                if season_marker and season_marker not in title_lower:
-                    continue
-                return r.magnet
-            continue
 
-        for rule in rules:
-            if not rule.accepts_episodes:
-                continue
-            if _matches_episode_rule(rule, title_lower, season, episode):
-                return r.magnet
-        if _fallback_episode_match(title_lower, season, episode):
-            return r.magnet
+def select_torrent(
+    results: Iterable[NyaaResult],
+    *,
+    name: str,
+    search_name: str,
+    season: int,
+    episode: int | None,
+    rules: tuple[UploaderRule, ...] = DEFAULT_RULES,
+) -> str | None:
+    """Return the magnet of the best matching torrent, or None.
 
-    return None
+    `episode is None` selects a batch torrent. Results assumed seed-sorted.
+    """
+    return select_torrents(
+        results, name=name, search_name=search_name, season=season,
+        episodes=[episode], rules=rules,
+    ).get(episode)
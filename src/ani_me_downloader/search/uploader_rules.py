@@ -1,6 +1,22 @@
 # coding: utf-8
-"""Data-driven uploader-tag rules used by the selector."""
+"""Data-driven uploader-tag rules used by the selector.
+
+Rule tuples are compiled into a RuleMatcher: one regex scan over a title
+finds every rule whose tag it contains. User rules are read from a JSON
+list in `uploader_rules.json` under data_dir, e.g.
+
+    [{"tag": "[asw]", "episode_pattern": " - {episode:02} "}]
+
+and are tried before the defaults; a user rule replaces the default
+with the same tag."""
+import json
+import os
+import re
 from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+from .release import parse_release
 
 
 @dataclass(frozen=True)
@@ -20,3 +36,126 @@ DEFAULT_RULES: tuple[UploaderRule, ...] = (
     UploaderRule("[toonshub]",   "e{episode} "),
     UploaderRule("[judas]",      " s{season:02}e{episode:02} ", accepts_batch=True),
 )
+
+
+class RuleMatcher:
+    """A rule tuple compiled once for matching many titles.
+
+    `present(title_lower)` scans the title a single time with an
+    alternation of all tags (longest first, tried at every position) and
+    returns the rules whose tag occurs, in rule order. Tags contained in a
+    longer matched tag are added from a precomputed closure, so the result
+    equals testing `rule.tag in title` for each rule.
+
+    `episodes(title_lower, season)` is every episode number some present
+    rule's pattern matches, found by trying only the numbers in the title;
+    checking any number of episodes is then a set lookup. It needs every
+    pattern to end in the episode number (`indexable`). Both are memoized
+    per title."""
+
+    def __init__(self, rules: tuple[UploaderRule, ...]):
+        self.rules = rules
+        tags = sorted({r.tag for r in rules}, key=len, reverse=True)
+        self._scan = re.compile(
+            "(?=(" + "|".join(re.escape(t) for t in tags) + "))"
+        ) if tags else None
+        self._contained = {t: frozenset(u for u in tags if u in t) for t in tags}
+        self.present = lru_cache(maxsize=8192)(self._present)
+        self.episodes = lru_cache(maxsize=8192)(self._episodes)
+        self.indexable = all(_ends_in_episode(r) for r in rules if r.accepts_episodes)
+
+    def _present(self, title_lower: str) -> tuple[UploaderRule, ...]:
+        if self._scan is None:
+            return ()
+        found: set[str] = set()
+        for m in self._scan.finditer(title_lower):
+            found |= self._contained[m[1]]
+        if not found:
+            return ()
+        return tuple(r for r in self.rules if r.tag in found)
+
+    def _episodes(self, title_lower: str, season: int) -> frozenset[int]:
+        patterns = [r.episode_pattern for r in self.present(title_lower) if r.accepts_episodes]
+        if not patterns:
+            return frozenset()
+        return frozenset(
+            n for n in parse_release(title_lower).numbers
+            if any(p.format(season=season, episode=n) in title_lower for p in patterns)
+        )
+
+
+def _ends_in_episode(rule: UploaderRule) -> bool:
+    """The pattern ends in the episode number and a space, so a match implies
+    the number is in `Release.numbers`."""
+    _, sep, tail = rule.episode_pattern.rpartition("{episode")
+    after = tail.partition("}")[2]
+    return bool(sep) and "{" not in after and after.startswith(" ")
+
+
+@lru_cache(maxsize=8)
+def compile_rules(rules: tuple[UploaderRule, ...]) -> RuleMatcher:
+    return RuleMatcher(rules)
+
+
+def _rule_from_json(d: dict) -> UploaderRule:
+    rule = UploaderRule(
+        tag=str(d["tag"]).lower(),
+        episode_pattern=str(d.get("episode_pattern", "")),
+        batch_keywords=tuple(str(k).lower() for k in d.get("batch_keywords", ("batch", "complete"))),
+        accepts_batch=bool(d.get("accepts_batch", False)),
+        accepts_episodes=bool(d.get("accepts_episodes", True)),
+    )
+    if not rule.tag:
+        raise ValueError("empty tag")
+    if rule.accepts_episodes and "{episode" not in rule.episode_pattern:
+        raise ValueError("episode_pattern has no {episode} field")
+    rule.episode_pattern.format(season=1, episode=1)
+    return rule
+
+
+def load_rules(path) -> tuple[UploaderRule, ...]:
+    """User rules from `path`. Invalid entries are skipped with a message;
+    an unreadable file yields no rules."""
+    try:
+        with open(path, "rb") as f:
+            data = json.loads(f.read())
+    except (OSError, ValueError) as e:
+        print(f"Could not read uploader rules {path}: {e}")
+        return ()
+    if not isinstance(data, list):
+        print(f"Uploader rules {path}: expected a JSON list")
+        return ()
+    rules = []
+    for entry in data:
+        try:
+            rules.append(_rule_from_json(entry))
+        except (AttributeError, KeyError, IndexError, TypeError, ValueError) as e:
+            print(f"Skipping uploader rule {entry!r}: {e}")
+    return tuple(rules)
+
+
+class RuleFile:
+    """User rules over the defaults, reloaded when the file changes.
+
+    `rules()` stats the file and re-reads it only when its mtime or size
+    differ from the last load; the selector compiles each distinct tuple
+    once, so an unchanged file costs one stat per call."""
+
+    def __init__(self, path, defaults: tuple[UploaderRule, ...] = DEFAULT_RULES):
+        self.path = Path(path)
+        self._defaults = defaults
+        self._signature: tuple[int, int] | None = None
+        self._rules = defaults
+
+    def rules(self) -> tuple[UploaderRule, ...]:
+        try:
+            st = os.stat(self.path)
+            signature = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            signature = None
+        if signature != self._signature:
+            self._signature = signature
+            user = load_rules(self.path) if signature else ()
+            tags = {r.tag for r in user}
+            self._rules = user + tuple(r for r in self._defaults if r.tag not in tags)
+        return self._rules
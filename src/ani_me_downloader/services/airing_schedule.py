@@ -0,0 +1,97 @@
+# coding: utf-8
+"""When each anime next needs a pass, from airing times and search misses."""
+import heapq
+import time
+from typing import Callable, Iterable
+
+from ..core.anime import Anime
+from .miss_cache import MissCache
+
+
+class AiringSchedule:
+    """Min-heap of per-anime due times. Not thread-safe.
+
+    An anime with episodes to find is due when the miss cache lets one of
+    them be searched again (now, if none has missed). Otherwise an airing
+    anime is due `grace()` seconds after its `next_eta`, when the episode
+    has aired and a release may be up. Anime with neither are left to the
+    sweep. A due time the anime's last pass already reached is pushed to
+    `retry()` seconds after that pass, so a pass that changed nothing
+    (metadata source down, feed without the episode) is not repeated at
+    once.
+
+    Entries are replaced lazily: `update` pushes a new entry and the old
+    one is skipped when it reaches the top."""
+
+    def __init__(
+        self,
+        *,
+        grace: Callable[[], float] = lambda: 900,
+        retry: Callable[[], float] = lambda: 1800,
+        misses: MissCache | None = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._grace = grace
+        self._retry = retry
+        self._misses = misses
+        self._clock = clock
+        self._heap: list[tuple[float, int]] = []
+        self._due: dict[int, float] = {}
+        self._ran_at: dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def due_at(self, anime: Anime) -> float | None:
+        pending = anime.pending_eps()
+        if pending:
+            due = self._misses.retry_at(anime.id, pending) if self._misses else None
+            due = due or 0.0
+        elif anime.needs_metadata_refresh and anime.next_eta:
+            due = anime.next_eta + self._grace()
+        else:
+            return None
+        ran = self._ran_at.get(anime.id)
+        if ran is not None and due <= ran:
+            due = ran + self._retry()
+        return due
+
+    def update(self, animes: Iterable[Anime]) -> None:
+        """Recompute the due times of `animes`."""
+        for anime in animes:
+            due = self.due_at(anime)
+            if due is None:
+                self._due.pop(anime.id, None)
+            elif self._due.get(anime.id) != due:
+                self._due[anime.id] = due
+                heapq.heappush(self._heap, (due, anime.id))
+
+    def retain(self, ids: Iterable[int]) -> None:
+        """Forget anime not in `ids` (removed from the library)."""
+        keep = set(ids)
+        for aid in [aid for aid in self._due if aid not in keep]:
+            del self._due[aid]
+        for aid in [aid for aid in self._ran_at if aid not in keep]:
+            del self._ran_at[aid]
+
+    def ran(self, ids: Iterable[int]) -> None:
+        """A pass over `ids` started now."""
+        now = self._clock()
+        for aid in ids:
+            self._ran_at[aid] = now
+
+    def next_due(self) -> float | None:
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self) -> list[int]:
+        """Ids due by now, earliest first. They stay off the schedule until
+        the next `update`."""
+        now = self._clock()
+        out = []
+        while (due := self.next_due()) is not None and due <= now:
+            _, aid = heapq.heappop(self._heap)
+            del self._due[aid]
+            out.append(aid)
+        return out
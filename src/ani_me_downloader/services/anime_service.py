@@ -1,85 +1,253 @@
 # coding: utf-8
 """Per-anime workflow: refresh metadata, promote, search Nyaa, pick magnets."""
+import heapq
 import time
-from typing import Callable
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Callable, Iterable, Iterator
 
 from PyQt5.QtCore import QObject, pyqtSignal
 
-from ..core.anime import AiringStatus, Anime, EpState, EpStatus
+from ..core.anime import AiringStatus, Anime, EpStatus
 from ..core.episodes import episode_display_name
 from ..core.identity import info_hash_from_magnet
 from ..core.time_util import get_time_difference
 from ..core.torrent import Torrent, TorrentStatus
-from ..metadata.orchestrator import MetadataUnavailable, get_airing
-from ..search.nyaa import NyaaResult, search_nyaa
-from ..search.selector import select_torrent
+from ..metadata.orchestrator import (
+    MetadataUnavailable,
+    flush_cache,
+    get_airing,
+    get_airing_many,
+    provider_health,
+)
+from ..search.cache import SearchCache
+from ..search.hedge import Hedge
+from ..search.nyaa import NyaaResult, search_nyaa, search_pages
+from ..search.release import ReleaseIndex
+from ..search.selector import library_matcher, select_torrents
+from ..search.uploader_rules import DEFAULT_RULES, UploaderRule
+from .feed_poller import FeedPoll, FeedPoller
+from .host_limits import HostLimits
+from .miss_cache import MissCache
 
 
 class SearchFailed(Exception):
     """Nyaa search raised or returned no candidates after retries."""
 
 
+@dataclass
+class Plan:
+    """What `prepare` decided for one anime, for `apply` to carry out.
+
+    Steps are (signal name, args) in the order the sequential workflow
+    emitted them, or ("attach", (ep_index, magnet))."""
+    steps: list[tuple[str, tuple]] = field(default_factory=list)
+
+    def emit(self, signal: str, *args) -> None:
+        self.steps.append((signal, args))
+
+    def attach(self, ep_index: int, magnet: str) -> None:
+        self.steps.append(("attach", (ep_index, magnet)))
+
+
 class AnimeService(QObject):
-    """Qt wrapper. Mutates an Anime in place via `process(anime)`."""
+    """Qt wrapper. Mutates an Anime in place via `process(anime)`.
+
+    `process` is `prepare` then `apply`. `prepare` does the network work
+    and emits nothing, so it may run for different anime on several
+    threads at once; `apply` emits the signals and attaches torrents and
+    is called from one thread in library order."""
     info = pyqtSignal(str)
     error = pyqtSignal(str)
     success = pyqtSignal(str)
     selection = pyqtSignal(int, list)
     add_torrent = pyqtSignal(object)
 
-    def __init__(self, *, use_proxy: Callable[[], bool]):
+    def __init__(
+        self,
+        *,
+        use_proxy: Callable[[], bool],
+        search_backend: Callable[[], str] = lambda: "html",
+        feed: FeedPoller | None = None,
+        feed_polling: Callable[[], bool] = lambda: False,
+        backfill_seconds: Callable[[], int] = lambda: 86400,
+        search_cache: SearchCache | None = None,
+        page_budget: Callable[[], int] = lambda: 3,
+        rules: Callable[[], tuple[UploaderRule, ...]] = lambda: DEFAULT_RULES,
+        host_limits: HostLimits | None = None,
+        hedge: Hedge | None = None,
+        hedging: Callable[[], bool] = lambda: False,
+        misses: MissCache | None = None,
+    ):
         super().__init__()
         self._use_proxy = use_proxy
+        self._search_backend = search_backend
+        self._feed = feed
+        self._feed_polling = feed_polling
+        self._backfill_seconds = backfill_seconds
+        self._searched_at: dict[int, float] = {}
+        self.search_cache = search_cache
+        self._page_budget = page_budget
+        self._rules = rules
+        self._limits = host_limits or HostLimits(lambda: 1)
+        self._hedge = hedge
+        self._hedging = hedging
+        self._misses = misses
+        self._airing: dict[int, dict] = {}
+        self._batched: set[int] = set()
+
+    def begin_pass(self, animes: Iterable[Anime] = ()) -> FeedPoll | None:
+        """Fetch airing status for every anime due a metadata refresh in
+        batched AniList requests, then poll the release feed once for the
+        whole pass. Returns None when feed polling is off and every anime
+        searches on its own."""
+        due = [anime.id for anime in animes if self._metadata_due(anime)]
+        if due:
+            with self._limits.slot("metadata"):
+                self._airing = get_airing_many(due)
+            self._batched = set(due)
+            print(f"Airing status for {len(self._airing)}/{len(due)} anime from AniList")
+        if self._feed is None or not self._feed_polling():
+            return None
+        return self._feed.poll()
+
+    def end_pass(self, feed: FeedPoll | None, library: Iterable[tuple[str, str]] = ()) -> None:
+        """`library` is (name, search name) per anime in the library; the
+        feed holds its unused items that name one of them."""
+        self._airing, self._batched = {}, set()
+        if feed is not None:
+            owned = library_matcher(library)
+            self._feed.commit(feed, lambda item: owned(item.title))
+        if self._misses is not None:
+            self._misses.save()
+        if self.search_cache is not None:
+            print(f"Search cache: {self.search_cache.stats()}")
+        if self._hedge is not None:
+            print(f"Nyaa origins: {self._hedge.tracker.summary()}")
+        flush_cache()
+        print(f"Metadata providers: {'; '.join(str(h) for h in provider_health())}")
+
+    def _needs_backfill(self, anime: Anime, feed: FeedPoll | None) -> bool:
+        """A per-anime search is due: no feed, a gap in it, or the last
+        search for this anime is older than the backfill interval."""
+        if feed is None or feed.gap:
+            return True
+        searched = self._searched_at.get(anime.id)
+        return searched is None or time.monotonic() - searched >= self._backfill_seconds()
 
-    def process(self, anime: Anime) -> Anime:
-        """Run the per-anime workflow once. Mutates `anime` and returns it."""
+    def process(self, anime: Anime, feed: FeedPoll | None = None) -> Anime:
+        """Run the per-anime workflow once. Mutates `anime` and returns it.
+
+        With a `feed`, pending episodes are matched against its new items;
+        Nyaa is searched for this anime only when a backfill is due."""
+        return self.apply(anime, self.prepare(anime, feed))
+
+    def apply(self, anime: Anime, plan: Plan) -> Anime:
+        for kind, args in plan.steps:
+            if kind == "attach":
+                self._attach(anime, ep_index=args[0], magnet=args[1])
+            else:
+                getattr(self, kind).emit(*args)
+        return anime
+
+    def prepare(self, anime: Anime, feed: FeedPoll | None = None) -> Plan:
+        """Refresh metadata and find magnets for the pending episodes.
+        Updates the anime's airing fields but not its episodes."""
+        plan = Plan()
         print("-" * 80)
         print(f"Looking into {anime.name}")
 
-        self._maybe_refresh_metadata(anime)
+        self._maybe_refresh_metadata(anime, plan)
 
         if anime.status in (AiringStatus.NOT_YET_RELEASED, AiringStatus.HIATUS):
-            return anime
+            return plan
 
         pending = anime.pending_eps()
         if not pending:
-            return anime
+            return plan
 
-        results: list[NyaaResult] | None = None
-        for ep_index in pending:
-            if results is None:
-                results = self._search(anime)
-                if not results:
-                    self.error.emit(f"No torrent found for {anime.name}")
-                    return anime
+        if not self._needs_backfill(anime, feed):
+            picks = self._pick(anime, pending, feed.index)
+            feed.take(picks.values())
+            for ep_index, magnet in picks.items():
+                self._record(anime, ep_index, magnet)
+                plan.attach(ep_index, magnet)
+            if self._misses is not None:
+                # Keeps a just-aired episode on its release-window retries.
+                for ep_index in pending:
+                    if ep_index not in picks and self._misses.in_window(anime.id, ep_index):
+                        self._record(anime, ep_index, None)
+            return plan
+
+        if self._misses is not None:
+            pending = self._misses.ready(anime.id, pending)
+            if not pending:
+                print(f"All pending episodes of {anime.name} are backing off")
+                return plan
+
+        # A release-window retry must not get the cached miss of the last one.
+        fresh = self._misses is not None and any(
+            self._misses.bursting(anime.id, ep) for ep in pending
+        )
+        seen: list[NyaaResult] = []
+        stream = self._search(anime, plan, fresh=fresh)
+        try:
+            picks = self._pick(anime, pending, _recording(stream, seen))
+        finally:
+            stream.close()
+        self._searched_at[anime.id] = time.monotonic()
+        if not seen:
+            for ep_index in pending:
+                self._record(anime, ep_index, None)
+            plan.emit("error", f"No torrent found for {anime.name}")
+            return plan
 
-            magnet = self._pick(anime, ep_index, results)
+        for ep_index in pending:
+            magnet = picks.get(ep_index)
+            self._record(anime, ep_index, magnet)
             if magnet is None:
                 if ep_index == 0:
-                    self.selection.emit(anime.id, results)
-                    self.error.emit("Could not auto-pick a batch torrent")
+                    plan.emit("selection", anime.id, seen)
+                    plan.emit("error", "Could not auto-pick a batch torrent")
                 else:
-                    self.error.emit(
-                        f"No matching torrent for {anime.name} ep {ep_index}"
-                    )
+                    plan.emit("error", f"No matching torrent for {anime.name} ep {ep_index}")
                 continue
-            self._attach(anime, ep_index=ep_index, magnet=magnet)
-        return anime
+            plan.attach(ep_index, magnet)
+        return plan
 
-    def _maybe_refresh_metadata(self, anime: Anime) -> None:
-        if not anime.needs_metadata_refresh:
+    def _record(self, anime: Anime, ep_index: int, magnet: str | None) -> None:
+        if self._misses is None:
             return
-        if anime.next_eta and anime.next_eta > int(time.time()):
-            d, h, m = get_time_difference(anime.next_eta)
-            print(f"Next episode airing in about {d}d {h}h {m}m")
-            return
-        try:
-            info = get_airing(anime.id)
-        except MetadataUnavailable as exc:
-            print(f"Could not refresh airing for {anime.name}: {exc}")
-            self.error.emit(f"Could not check {anime.name}: source unavailable")
+        if magnet is not None:
+            self._misses.hit(anime.id, ep_index)
+        else:
+            delay = self._misses.miss(anime.id, ep_index)
+            print(f"{anime.name} ep {ep_index}: next search in {delay / 60:.0f} min")
+
+    @staticmethod
+    def _metadata_due(anime: Anime) -> bool:
+        return anime.needs_metadata_refresh and not (
+            anime.next_eta and anime.next_eta > int(time.time())
+        )
+
+    def _maybe_refresh_metadata(self, anime: Anime, plan: Plan) -> None:
+        if not self._metadata_due(anime):
+            if anime.needs_metadata_refresh:
+                d, h, m = get_time_difference(anime.next_eta)
+                print(f"Next episode airing in about {d}d {h}h {m}m")
             return
+        info = self._airing.pop(anime.id, None)
+        if info is None:
+            # Not in this pass's batch, or AniList did not return it.
+            try:
+                with self._limits.slot("metadata"):
+                    info = get_airing(anime.id, anilist_first=anime.id not in self._batched)
+            except MetadataUnavailable as exc:
+                print(f"Could not refresh airing for {anime.name}: {exc}")
+                plan.emit("error", f"Could not check {anime.name}: source unavailable")
+                return
 
+        aired_before, eta_before = anime.last_aired_episode, anime.next_eta
         anime.status = info["status"]
         anime.next_eta = info.get("next_eta", 0)
         last = info.get("last_aired_episode")
@@ -88,46 +256,72 @@ class AnimeService(QObject):
         if anime.status is not AiringStatus.RELEASING:
             anime.last_aired_episode = anime.total_episodes
             anime.next_eta = 0
-            self.info.emit(f"{anime.name} has finished airing!")
+            plan.emit("info", f"{anime.name} has finished airing!")
+        if anime.last_aired_episode > aired_before and self._misses is not None:
+            self._misses.reset(anime.id)
+            if 0 < eta_before <= time.time():
+                self._misses.aired(anime.id, anime.last_aired_episode, eta_before)
 
-    def _search(self, anime: Anime) -> list[NyaaResult]:
-        self.info.emit(f"Looking for {anime.name}...")
-        self.info.emit("searching")
+    def _search(self, anime: Anime, plan: Plan, *, fresh: bool = False) -> Iterator[NyaaResult]:
+        """Lazy, seed-sorted results for the anime's search name and, when it
+        differs, its name. Pages are fetched as the consumer reaches them;
+        `fresh` skips cached pages."""
+        plan.emit("info", f"Looking for {anime.name}...")
+        plan.emit("info", "searching")
+        queries = [anime.search_name or anime.name]
+        if anime.search_name and anime.search_name != anime.name:
+            queries.append(anime.name)
+        seen: set[tuple] = set()
         try:
-            primary = search_nyaa(anime.search_name or anime.name, use_proxy=self._use_proxy())
-            extra: list[NyaaResult] = []
-            if anime.search_name and anime.search_name != anime.name:
-                extra = search_nyaa(anime.name, use_proxy=self._use_proxy())
-            results = self._merge(primary, extra)
+            streams = [
+                search_pages(
+                    partial(self._search_nyaa, q, fresh=fresh), max_pages=self._page_budget()
+                )
+                for q in queries
+            ]
+            for r in heapq.merge(*streams, key=lambda r: r.seeds, reverse=True):
+                key = (r.title, r.magnet)
+                if key in seen:
+                    continue
+                seen.add(key)
+                yield r
         except Exception as exc:
-            self.error.emit("searching")
             raise SearchFailed(str(exc)) from exc
-        self.error.emit("searching")
-        results.sort(key=lambda r: r.seeds, reverse=True)
-        print(f"Found {len(results)} torrents")
-        return results
+        finally:
+            plan.emit("error", "searching")
+            print(f"Found {len(seen)} torrents")
 
-    @staticmethod
-    def _merge(a: list[NyaaResult], b: list[NyaaResult]) -> list[NyaaResult]:
-        seen: set[tuple] = set()
-        out: list[NyaaResult] = []
-        for r in (*a, *b):
-            key = (r.title, r.magnet)
-            if key in seen:
-                continue
-            seen.add(key)
-            out.append(r)
-        return out
+    def _search_nyaa(self, query: str, page: int, *, fresh: bool = False) -> list[NyaaResult]:
+        use_proxy, backend = self._use_proxy(), self._search_backend()
+        hedge = self._hedge if self._hedging() else None
 
-    def _pick(self, anime: Anime, ep_index: int, results: list[NyaaResult]) -> str | None:
-        episode = None if ep_index == 0 else ep_index
-        return select_torrent(
+        def load() -> list[NyaaResult]:
+            return search_nyaa(
+                query, use_proxy=use_proxy, backend=backend, page=page, hedge=hedge,
+                slot=self._limits.slot,
+            )
+
+        if self.search_cache is None:
+            return load()
+        # search_nyaa always sorts by seeders, descending.
+        key = (" ".join(query.split()).casefold(), use_proxy, backend, "seeders", "desc", page)
+        if fresh:
+            self.search_cache.invalidate(key)
+        return self.search_cache.get_or_load(key, load)
+
+    def _pick(
+        self, anime: Anime, pending: list[int], results: Iterable[NyaaResult] | ReleaseIndex
+    ) -> dict[int, str]:
+        """ep_index -> magnet for the pending episodes that found a match."""
+        picks = select_torrents(
             results,
             name=anime.name,
             search_name=anime.search_name or anime.name,
             season=anime.season,
-            episode=episode,
+            episodes=[None if ep == 0 else ep for ep in pending],
+            rules=self._rules(),
         )
+        return {ep or 0: magnet for ep, magnet in picks.items()}
 
     def _attach(self, anime: Anime, *, ep_index: int, magnet: str) -> None:
         ih = info_hash_from_magnet(magnet)
@@ -136,8 +330,7 @@ class AnimeService(QObject):
             return
         is_batch = ep_index == 0
         new_state = EpStatus.BATCH_PENDING if is_batch else EpStatus.DOWNLOADING
-        anime.episodes = [e for e in anime.episodes if e.ep != ep_index]
-        anime.episodes.append(EpState(ep=ep_index, status=new_state, magnet=magnet))
+        anime.episodes.set(ep_index, new_state, magnet)
         name = episode_display_name(anime, ep_index)
         torrent = Torrent(
             info_hash=ih,
@@ -149,3 +342,9 @@ class AnimeService(QObject):
         )
         self.add_torrent.emit(torrent)
         self.success.emit(f"Download started {name}")
+
+
+def _recording(results: Iterable[NyaaResult], into: list[NyaaResult]) -> Iterator[NyaaResult]:
+    for r in results:
+        into.append(r)
+        yield r
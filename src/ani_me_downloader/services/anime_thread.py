@@ -1,6 +1,6 @@
 # coding: utf-8
-"""Snapshot pattern: deep-copy animes, process, return for merge."""
-import copy
+"""Snapshot pattern: copy animes, process, return for merge."""
+from concurrent.futures import ThreadPoolExecutor
 
 from PyQt5.QtCore import QThread, pyqtSignal
 
@@ -18,23 +18,44 @@ def _network_ok() -> bool:
 
 
 class AnimeThread(QThread):
-    """One pass per tick. Mutates a deep copy; coordinator merges by id."""
+    """One pass per tick. Mutates copies; coordinator merges by id. Episode
+    lists not decoded yet stay deferred in the copies and are decoded here,
+    off the GUI thread.
+
+    `workers` threads run `service.prepare` (metadata and Nyaa requests)
+    for different anime at once. Plans are applied here, one anime at a
+    time in library order, so the service's signals reach the coordinator
+    in the same order as a sequential pass. `library` is the
+    (name, search name) of every anime, so the feed can hold items for
+    anime outside this pass."""
     finished_with = pyqtSignal(list)
     error = pyqtSignal(str)
 
-    def __init__(self, animes: list[Anime], service: AnimeService):
+    def __init__(
+        self,
+        animes: list[Anime],
+        service: AnimeService,
+        workers: int = 1,
+        library: list[tuple[str, str]] = (),
+    ):
         super().__init__()
-        self._animes = copy.deepcopy(animes)
+        self._animes = [a.copy() for a in animes]
+        self._library = list(library)
         self._service = service
+        self._workers = max(1, workers)
 
     def run(self) -> None:
         if not _network_ok():
             self.error.emit("There is something wrong with your Internet connection.")
             return
-        for anime in self._animes:
-            try:
-                self._service.process(anime)
-            except Exception as exc:
-                print(f"Error processing anime {anime.name}: {exc}")
-                self.error.emit(f"Error checking {anime.name}: {exc}")
+        feed = self._service.begin_pass(self._animes)
+        with ThreadPoolExecutor(self._workers, thread_name_prefix="anime-pass") as pool:
+            plans = [pool.submit(self._service.prepare, anime, feed) for anime in self._animes]
+            for anime, plan in zip(self._animes, plans):
+                try:
+                    self._service.apply(anime, plan.result())
+                except Exception as exc:
+                    print(f"Error processing anime {anime.name}: {exc}")
+                    self.error.emit(f"Error checking {anime.name}: {exc}")
+        self._service.end_pass(feed, self._library)
         self.finished_with.emit(self._animes)
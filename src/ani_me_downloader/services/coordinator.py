@@ -3,13 +3,13 @@
 import os
 import queue
 import shutil
-from typing import Any
+from typing import Any, Iterable
 
 from PyQt5.QtCore import QObject, pyqtSignal
 
-from ..core.anime import AiringStatus, Anime, AnimeFormat, DownloadMode, EpState, EpStatus
+from ..core.anime import AiringStatus, Anime, AnimeFormat, DownloadMode, EpStatus
 from ..core.episodes import seed_episodes
-from ..core.identity import info_hash_from_magnet, magnets_match
+from ..core.identity import info_hash_from_magnet
 from ..core.torrent import Torrent, TorrentStatus
 from ..download.commands import (
     AddTorrent,
@@ -19,13 +19,22 @@ from ..download.commands import (
     ResumeTorrent,
     SetFilePriority,
 )
-from ..metadata.orchestrator import MetadataUnavailable, get_airing
+from ..metadata.breaker import BreakerState, ProviderHealth
+from ..metadata.orchestrator import MetadataUnavailable, get_airing, on_health_change
+from ..search.cache import SearchCache
+from ..search.hedge import Hedge
 from ..search.nyaa import NyaaResult
+from ..search.uploader_rules import DEFAULT_RULES, RuleFile
 from ..state.app_state import AppState
+from ..state.merge import merge_anime
+from .airing_schedule import AiringSchedule
 from .anime_service import AnimeService
 from .anime_thread import AnimeThread
 from .compression_thread import CompressionThread
-from .run_thread import RunThread
+from .feed_poller import FeedPoller
+from .host_limits import HostLimits, RequestBudget
+from .miss_cache import BURST_STEPS, MissCache, burst_offsets
+from .scheduler_thread import SchedulerThread
 from .torrent_thread import TorrentThread
 
 
@@ -42,13 +51,33 @@ class Coordinator(QObject):
     torrent_progress = pyqtSignal(str, dict)
     torrent_files_updated = pyqtSignal(str)
 
+    _materialized = pyqtSignal()  # emitted from the materializer thread
+
     def __init__(
         self,
         state: AppState,
         *,
         use_proxy,
-        tick_interval,
+        sweep_interval,
         max_concurrent,
+        resume_file,
+        search_backend=lambda: "html",
+        feed_file=None,
+        feed_polling=lambda: False,
+        feed_uploaders=lambda: [],
+        backfill_seconds=lambda: 86400,
+        search_cache_ttl=lambda: 600,
+        page_budget=lambda: 3,
+        rules_file=None,
+        search_workers=lambda: 1,
+        max_per_host=lambda: 1,
+        hedge_requests=lambda: False,
+        miss_file=None,
+        miss_backoff_seconds=lambda: 1800,
+        miss_backoff_max_seconds=lambda: 172800,
+        release_grace_seconds=lambda: 900,
+        burst_window_seconds=lambda: 10800,
+        burst_budget_per_hour=lambda: 60,
         compress_videos=lambda: False,
         compress_use_cuda=lambda: True,
     ):
@@ -56,16 +85,57 @@ class Coordinator(QObject):
         self.state = state
         self.cmd_queue: "queue.Queue[Command]" = queue.Queue()
         self._max_concurrent = max_concurrent
+        self._resume_file = resume_file
         self._compress_videos = compress_videos
         self._compress_use_cuda = compress_use_cuda
-        self._anime_service = AnimeService(use_proxy=use_proxy)
+        misses = MissCache(
+            miss_file,
+            base=miss_backoff_seconds,
+            cap=miss_backoff_max_seconds,
+            burst=lambda: burst_offsets(
+                release_grace_seconds(), [m * 60 for m in BURST_STEPS], burst_window_seconds()
+            ),
+            budget=RequestBudget(burst_budget_per_hour).take,
+        ) if miss_file else None
+        feed = None
+        if feed_file:
+            feed = FeedPoller(
+                feed_file, use_proxy=use_proxy, uploaders=feed_uploaders,
+                hold_seconds=backfill_seconds,
+            )
+        self._anime_service = AnimeService(
+            use_proxy=use_proxy,
+            search_backend=search_backend,
+            feed=feed,
+            feed_polling=feed_polling,
+            backfill_seconds=backfill_seconds,
+            search_cache=SearchCache(ttl=search_cache_ttl),
+            page_budget=page_budget,
+            rules=RuleFile(rules_file).rules if rules_file else lambda: DEFAULT_RULES,
+            host_limits=HostLimits(max_per_host),
+            hedge=Hedge(),
+            hedging=hedge_requests,
+            misses=misses,
+        )
+        self._search_workers = search_workers
         self._wire_anime_service()
+        on_health_change(self._on_provider_health)
         self._torrent_thread: TorrentThread | None = None
         self._anime_thread: AnimeThread | None = None
         self._compression_thread: CompressionThread | None = None
-        self._run_thread = RunThread(tick_interval)
-        self._run_thread.tick.connect(self.start_anime_pass)
-        self._run_thread.tick.connect(self.start_compression_pass)
+        schedule = AiringSchedule(
+            grace=release_grace_seconds, retry=miss_backoff_seconds, misses=misses
+        )
+        self._scheduler = SchedulerThread(schedule, sweep_interval)
+        self._scheduler.due.connect(self.start_anime_pass)
+        # The full pass covers the anime that came due with the sweep.
+        self._scheduler.sweep.connect(lambda _ids: self.start_anime_pass())
+        self._scheduler.due.connect(lambda _ids: self.start_compression_pass())
+        self._scheduler.sweep.connect(lambda _ids: self.start_compression_pass())
+        # Due times read every episode list; none are computed until the
+        # materializer has decoded them off the GUI thread.
+        self._library_decoded = False
+        self._materialized.connect(self._on_materialized)
 
     def _wire_anime_service(self) -> None:
         s = self._anime_service
@@ -75,14 +145,34 @@ class Coordinator(QObject):
         s.selection.connect(self.selection_needed)
         s.add_torrent.connect(self._handle_service_torrent)
 
+    def _on_provider_health(self, health: ProviderHealth) -> None:
+        """Runs on the thread whose call changed the breaker; signals are
+        delivered to the GUI thread."""
+        if health.state is BreakerState.OPEN:
+            minutes = max(1, round(health.retry_in / 60))
+            self.error.emit(f"{health.name} is not responding; retrying in {minutes} min")
+        elif health.state is BreakerState.CLOSED:
+            self.success.emit(f"{health.name} is reachable again")
+
     def start(self) -> None:
-        self.state.reconcile()
-        self.state.save_torrents()
+        if not self.state.consistent:
+            self.state.reconcile()
+            self.state.save()
+        self.state.materialize_async(self._materialized.emit)
         self._start_torrent_thread()
-        self._run_thread.start()
+        self._scheduler.start()
+
+    def _on_materialized(self) -> None:
+        self._library_decoded = True
+        self._reschedule()
+
+    def _reschedule(self) -> None:
+        if self._library_decoded:
+            self._scheduler.reschedule(self.state.animes)
 
     def shutdown(self, *, timeout_seconds: int = 5) -> None:
-        self._run_thread.stop()
+        on_health_change(None)
+        self._scheduler.stop()
         if self._torrent_thread:
             self._torrent_thread.stop()
             self._torrent_thread.wait(timeout_seconds * 1000)
@@ -90,14 +180,14 @@ class Coordinator(QObject):
             self._anime_thread.wait(timeout_seconds * 1000)
         if self._compression_thread and self._compression_thread.isRunning():
             self._compression_thread.wait(timeout_seconds * 1000)
-        self.state.save_animes()
-        self.state.save_torrents()
+        self.state.save()
+        self.state.close()
 
     def _start_torrent_thread(self) -> None:
         if self._torrent_thread and self._torrent_thread.isRunning():
             return
         self._torrent_thread = TorrentThread(
-            self.state.torrents, self.cmd_queue, self._max_concurrent
+            self.state.torrents, self.cmd_queue, self._max_concurrent, self._resume_file
         )
         self._torrent_thread.progress.connect(self.torrent_progress)
         self._torrent_thread.completed.connect(self._on_torrent_complete)
@@ -164,10 +254,10 @@ class Coordinator(QObject):
             os.makedirs(anime.output_dir, exist_ok=True)
 
         self.state.add_anime(anime)
-        self.state.save_animes()
+        self.state.save()
         self.animes_changed.emit()
         self.success.emit(f"Added {anime.name}")
-        self.start_anime_pass()
+        self.start_anime_pass([anime.id])
 
     def remove_anime(self, id: int) -> None:
         anime = self.state.remove_anime(id)
@@ -186,20 +276,35 @@ class Coordinator(QObject):
             self.error.emit(
                 f"Could not delete folder {anime.output_dir}: something is using it ({exc})"
             )
-        self.state.save_animes()
-        self.state.save_torrents()
+        self.state.save()
+        self._reschedule()
         self.animes_changed.emit()
         self.torrents_changed.emit()
 
-    def start_anime_pass(self) -> None:
+    def start_anime_pass(self, ids: Iterable[int] | None = None) -> None:
+        """Run a pass over the anime with `ids`, or over the whole library.
+        Does nothing while a pass is running; anime it skips are still due
+        when the running pass reschedules."""
         if not self.state.animes:
             self.info.emit("Add Anime by Searching for it.")
             return
         if self._anime_thread and self._anime_thread.isRunning():
             return
-        self._anime_thread = AnimeThread(self.state.animes, self._anime_service)
+        if ids is None:
+            animes = self.state.animes
+        else:
+            wanted = set(ids)
+            animes = [a for a in self.state.animes if a.id in wanted]
+            if not animes:
+                return
+        self._scheduler.ran(a.id for a in animes)
+        self._anime_thread = AnimeThread(
+            animes, self._anime_service, self._search_workers(),
+            library=[(a.name, a.search_name) for a in self.state.animes],
+        )
         self._anime_thread.finished_with.connect(self._on_anime_pass_done)
         self._anime_thread.error.connect(self.error)
+        self._anime_thread.finished.connect(self._reschedule)
         self._anime_thread.start()
 
     def start_compression_pass(self) -> None:
@@ -219,9 +324,9 @@ class Coordinator(QObject):
         merged: list[Anime] = []
         for current in self.state.animes:
             updated = by_id.get(current.id)
-            merged.append(_merge_anime(current, updated) if updated else current)
+            merged.append(merge_anime(current, updated) if updated else current)
         self.state.animes = merged
-        self.state.save_animes()
+        self.state.save()
         self.animes_changed.emit()
 
     def _handle_service_torrent(self, t: Torrent) -> None:
@@ -232,31 +337,23 @@ class Coordinator(QObject):
             t.info_hash = ih
         existing = self.state.get_torrent(t.info_hash)
         canonical = self.state.add_torrent(t)
-        self.state.save_torrents()
+        self.state.save()
         self.torrents_changed.emit()
         if existing is None:
             self.cmd_queue.put(AddTorrent(canonical))
 
     def _on_torrent_complete(self, t: Torrent) -> None:
         canonical = self.state.get_torrent(t.info_hash) or t
-        for aid in list(canonical.anime_ids):
-            anime = self.state.get_anime(aid)
-            if anime is None:
-                continue
-            for ep in anime.episodes:
-                if not ep.magnet or not magnets_match(ep.magnet, canonical.magnet):
-                    continue
-                if ep.status is EpStatus.BATCH_PENDING:
-                    ep.status = EpStatus.BATCH_DONE
-                else:
-                    ep.status = EpStatus.DONE
-                ep.magnet = None
-                self.success.emit(
-                    f"Episode {ep.ep if ep.ep else 'batch'} of {anime.name} completed"
-                )
+        for anime, ep in self.state.episodes_for(canonical.info_hash):
+            if ep.status is EpStatus.BATCH_PENDING:
+                anime.episodes.set(ep.ep, EpStatus.BATCH_DONE)
+            else:
+                anime.episodes.set(ep.ep, EpStatus.DONE)
+            self.success.emit(
+                f"Episode {ep.ep if ep.ep else 'batch'} of {anime.name} completed"
+            )
         self.state.remove_torrent(canonical.info_hash)
-        self.state.save_animes()
-        self.state.save_torrents()
+        self.state.save()
         self.animes_changed.emit()
         self.torrents_changed.emit()
 
@@ -278,7 +375,7 @@ class Coordinator(QObject):
         if t is None:
             return
         self.cmd_queue.put(RemoveTorrent(info_hash, delete_files=delete_files))
-        self.state.save_torrents()
+        self.state.save()
         self.torrents_changed.emit()
         self.success.emit(f"Deleted {t.name}{' with files' if delete_files else ''}")
 
@@ -300,8 +397,8 @@ class Coordinator(QObject):
         ep_index = pending[0]
         is_batch = ep_index == 0
         new_state = EpStatus.BATCH_PENDING if is_batch else EpStatus.DOWNLOADING
-        anime.episodes = [e for e in anime.episodes if e.ep != ep_index]
-        anime.episodes.append(EpState(ep=ep_index, status=new_state, magnet=result.magnet))
+        anime.episodes.set(ep_index, new_state, result.magnet)
+        self.state.index_episode(anime.id, ep_index, result.magnet)
         t = Torrent(
             info_hash=ih,
             magnet=result.magnet,
@@ -311,7 +408,7 @@ class Coordinator(QObject):
             desired_state=TorrentStatus.DOWNLOADING,
         )
         self._handle_service_torrent(t)
-        self.state.save_animes()
+        self.state.save()
         self.animes_changed.emit()
 
 
@@ -342,32 +439,3 @@ def _to_format(value: Any) -> AnimeFormat:
         except ValueError:
             return AnimeFormat.UNKNOWN
     return AnimeFormat.UNKNOWN
-
-
-_TERMINAL_EP = {EpStatus.DONE, EpStatus.BATCH_DONE, EpStatus.TRACK_ONLY}
-
-
-def _merge_anime(current: Anime, updated: Anime) -> Anime:
-    """GUI-side wins for user-edited fields and terminal episode states; thread wins otherwise."""
-    current.status = updated.status
-    current.next_eta = updated.next_eta
-    current.last_aired_episode = updated.last_aired_episode
-    current.total_episodes = updated.total_episodes
-
-    by_ep = {ep.ep: ep for ep in updated.episodes}
-    merged_eps = []
-    for cur_ep in current.episodes:
-        thread_ep = by_ep.get(cur_ep.ep)
-        if thread_ep is None:
-            merged_eps.append(cur_ep)
-            continue
-        if cur_ep.status in _TERMINAL_EP:
-            merged_eps.append(cur_ep)
-        else:
-            merged_eps.append(thread_ep)
-    seen = {ep.ep for ep in merged_eps}
-    for thread_ep in updated.episodes:
-        if thread_ep.ep not in seen:
-            merged_eps.append(thread_ep)
-    current.episodes = merged_eps
-    return current
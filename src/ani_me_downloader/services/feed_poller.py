@@ -0,0 +1,142 @@
+# coding: utf-8
+"""Library-wide Nyaa feed polling with persisted high-water marks."""
+import threading
+import time
+from dataclasses import astuple, dataclass, field
+from functools import cached_property
+from pathlib import Path
+from typing import Callable
+from xml.etree import ElementTree
+
+import requests
+
+from ..persistence.json_store import read_json, write_json_atomic
+from ..search.nyaa import NyaaResult, fetch_feed
+from ..search.release import ReleaseIndex
+
+
+@dataclass
+class FeedPoll:
+    """Items uploaded since the last committed poll, plus items held over
+    from earlier polls, seed-sorted.
+
+    `gap` is True when a feed could not be read, or when every item it
+    returned was new: the feed only holds its newest 75 uploads, so older
+    ones since the mark may have been missed. Anime then fall back to a
+    per-anime search for that pass.
+
+    `take` records the items the pass attached; anime are prepared on
+    several threads, hence the lock."""
+    items: list[NyaaResult] = field(default_factory=list)
+    marks: dict[str, int] = field(default_factory=dict)
+    gap: bool = False
+    used: set[str] = field(default_factory=set)  # magnets attached this pass
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @cached_property
+    def index(self) -> ReleaseIndex:
+        """Items by episode number, built once and shared by the whole pass."""
+        return ReleaseIndex(self.items)
+
+    def take(self, magnets) -> None:
+        with self._lock:
+            self.used.update(magnets)
+
+
+class FeedPoller:
+    """One feed request per uploader per pass, independent of library size.
+
+    Marks are the highest nyaa view id seen per feed ("*" for the site-wide
+    one) and are written only by `commit`, after the pass used the items, so
+    a pass that dies halfway sees the same items again next time.
+
+    The mark passes every item it has seen, so `commit` holds back the
+    unused items that belong to an anime in the library (an episode whose
+    metadata has not caught up yet, or an anime outside this pass) and
+    `poll` offers them again, for up to `hold_seconds()`. After that the
+    per-anime backfill search covers them. Items no anime owns are
+    dropped."""
+
+    def __init__(
+        self,
+        path,
+        *,
+        use_proxy: Callable[[], bool],
+        uploaders: Callable[[], list[str]] = lambda: [],
+        hold_seconds: Callable[[], float] = lambda: 86400,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = Path(path)
+        self._use_proxy = use_proxy
+        self._uploaders = uploaders
+        self._hold_seconds = hold_seconds
+        self._clock = clock
+        self._marks: dict[str, int] = {}
+        # magnet -> (item, first seen)
+        self._held: dict[str, tuple[NyaaResult, float]] = {}
+        data = read_json(self.path, {})
+        if isinstance(data, dict) and isinstance(data.get("marks"), dict):
+            self._marks = data["marks"]
+            for row in data.get("held") or ():
+                try:
+                    item = NyaaResult(*row[:5])
+                    self._held[item.magnet] = (item, float(row[5]))
+                except (IndexError, TypeError, ValueError):
+                    continue
+        elif isinstance(data, dict):
+            self._marks = data  # marks only, as written before items were held
+
+    def poll(self) -> FeedPoll:
+        out = FeedPoll(marks=dict(self._marks))
+        horizon = self._clock() - self._hold_seconds()
+        held = [item for item, seen in self._held.values() if seen > horizon]
+        seen: set[str] = {item.magnet for item in held}
+        out.items.extend(held)
+        for uploader in self._uploaders() or [""]:
+            key = uploader or "*"
+            try:
+                items = fetch_feed(use_proxy=self._use_proxy(), uploader=uploader)
+            except (requests.exceptions.RequestException, ElementTree.ParseError) as e:
+                print(f"Could not read Nyaa feed {key}: {e}")
+                out.gap = True
+                continue
+            mark = self._marks.get(key, 0)
+            new = [r for r in items if r.id > mark]
+            if not mark or (new and len(new) == len(items)):
+                out.gap = True
+            if items:
+                out.marks[key] = max(mark, max(r.id for r in items))
+            for r in new:
+                if r.magnet not in seen:
+                    seen.add(r.magnet)
+                    out.items.append(r)
+        out.items.sort(key=lambda r: r.seeds, reverse=True)
+        print(
+            f"Feed: {len(out.items) - len(held)} new item(s), {len(held)} held"
+            f"{' (gap)' if out.gap else ''}"
+        )
+        return out
+
+    def commit(self, poll: FeedPoll, owned: Callable[[NyaaResult], bool]) -> None:
+        """Advance the marks to `poll`'s and hold its unused items that
+        `owned` assigns to an anime in the library."""
+        now = self._clock()
+        horizon = now - self._hold_seconds()
+        held: dict[str, tuple[NyaaResult, float]] = {}
+        for item in poll.items:
+            if item.magnet in poll.used:
+                continue
+            since = self._held[item.magnet][1] if item.magnet in self._held else now
+            if since > horizon and owned(item):
+                held[item.magnet] = (item, since)
+        if poll.marks == self._marks and held.keys() == self._held.keys():
+            return
+        self._marks, self._held = dict(poll.marks), held
+        data = {
+            "marks": self._marks,
+            "held": [[*astuple(item), since] for item, since in held.values()],
+        }
+        try:
+            write_json_atomic(self.path, data)
+        except OSError as e:
+            print(f"Could not save feed marks: {e}")
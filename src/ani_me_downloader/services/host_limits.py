@@ -0,0 +1,65 @@
+# coding: utf-8
+"""Per-host concurrency limits and request budgets for the anime pass."""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from ..search.hedge import Cancelled
+
+_POLL = 0.05  # seconds between cancel checks while waiting for a slot
+
+
+class HostLimits:
+    """One counting semaphore per host (or provider group), created on
+    first use with `per_host()` slots. Requests to different hosts never
+    wait on each other. A waiter whose `cancel` event is set gives up with
+    Cancelled instead of taking the slot."""
+
+    def __init__(self, per_host: Callable[[], int]):
+        self._per_host = per_host
+        self._lock = threading.Lock()
+        self._slots: dict[str, threading.BoundedSemaphore] = {}
+
+    @contextmanager
+    def slot(self, host: str, cancel: threading.Event | None = None) -> Iterator[None]:
+        with self._lock:
+            sem = self._slots.get(host)
+            if sem is None:
+                sem = self._slots[host] = threading.BoundedSemaphore(max(1, self._per_host()))
+        if cancel is None:
+            sem.acquire()
+        else:
+            while not sem.acquire(timeout=_POLL):
+                if cancel.is_set():
+                    raise Cancelled()
+        try:
+            yield
+        finally:
+            sem.release()
+
+
+class RequestBudget:
+    """Token bucket allowing `per_hour()` requests an hour, in bursts of
+    up to a quarter of that. `take()` spends a token if one is left."""
+
+    def __init__(self, per_hour: Callable[[], int], clock: Callable[[], float] = time.monotonic):
+        self._per_hour = per_hour
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens: float | None = None
+        self._at = clock()
+
+    def take(self) -> bool:
+        rate = max(0, self._per_hour())
+        size = max(1.0, rate / 4)
+        with self._lock:
+            now = self._clock()
+            if self._tokens is None:
+                self._tokens = size
+            self._tokens = min(size, self._tokens + (now - self._at) * rate / 3600)
+            self._at = now
+            if rate == 0 or self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
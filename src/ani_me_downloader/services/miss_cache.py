@@ -0,0 +1,174 @@
+# coding: utf-8
+"""Persisted per-episode search misses with exponential backoff."""
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable
+
+from ..persistence.json_store import read_json, write_json_atomic
+
+# Minutes between release-window searches; the last step repeats.
+BURST_STEPS = (2, 5, 10, 20)
+
+
+def burst_offsets(first: float, steps: Iterable[float], window: float) -> tuple[float, ...]:
+    """Seconds after an episode airs to look for it: `first`, then `steps`
+    apart with the last step repeating, up to `window`."""
+    steps = [s for s in steps if s > 0]
+    out: list[float] = []
+    t = first
+    i = 0
+    while t <= window:
+        out.append(t)
+        if not steps:
+            break
+        t += steps[min(i, len(steps) - 1)]
+        i += 1
+    return tuple(out)
+
+
+class MissCache:
+    """(anime id, episode) → consecutive misses and when to search again.
+
+    The n-th consecutive miss holds the episode back for
+    `base * 2**(n-1)` seconds, capped at `cap`, +/- `jitter` of that so
+    stuck shows added together do not retry together. A match clears the
+    record; a newly aired episode clears the anime's records. Times are
+    wall-clock so the backoff survives restarts. Thread-safe.
+
+    An episode marked `aired` is in its release window: a miss retries at
+    the next of `burst()` (seconds after airing) instead, without counting
+    toward the backoff, while `budget()` grants the extra search. Past the
+    last offset it backs off as usual."""
+
+    def __init__(
+        self,
+        path,
+        *,
+        base: Callable[[], float] = lambda: 1800,
+        cap: Callable[[], float] = lambda: 172800,
+        jitter: float = 0.2,
+        burst: Callable[[], tuple[float, ...]] = lambda: (),
+        budget: Callable[[], bool] = lambda: True,
+        clock: Callable[[], float] = time.time,
+        rng: Callable[[], float] = random.random,
+    ):
+        self.path = Path(path)
+        self._base = base
+        self._cap = cap
+        self._jitter = jitter
+        self._burst = burst
+        self._budget = budget
+        self._clock = clock
+        self._rng = rng
+        self._lock = threading.Lock()
+        self._dirty = False
+        # (count, retry_at, aired_at or None)
+        self._misses: dict[tuple[int, int], tuple[int, float, float | None]] = {}
+        data = read_json(self.path, {})
+        for key, value in (data.items() if isinstance(data, dict) else ()):
+            try:
+                aid, ep = key.split(":")
+                aired = float(value[2]) if len(value) > 2 else None
+                self._misses[(int(aid), int(ep))] = (int(value[0]), float(value[1]), aired)
+            except (AttributeError, IndexError, TypeError, ValueError):
+                continue
+
+    def __len__(self) -> int:
+        return len(self._misses)
+
+    def ready(self, anime_id: int, episodes: Iterable[int]) -> list[int]:
+        """The episodes not held back by a recent miss."""
+        now = self._clock()
+        with self._lock:
+            return [
+                ep for ep in episodes
+                if (rec := self._misses.get((anime_id, ep))) is None or rec[1] <= now
+            ]
+
+    def retry_at(self, anime_id: int, episodes: Iterable[int]) -> float | None:
+        """When the first of `episodes` may be searched again, or None when
+        one of them has no miss recorded."""
+        with self._lock:
+            times = []
+            for ep in episodes:
+                rec = self._misses.get((anime_id, ep))
+                if rec is None:
+                    return None
+                times.append(rec[1])
+            return min(times, default=None)
+
+    def aired(self, anime_id: int, episode: int, at: float) -> None:
+        """The episode aired at `at`; its misses follow the release window."""
+        with self._lock:
+            count, retry_at, _ = self._misses.get((anime_id, episode), (0, at, None))
+            self._misses[(anime_id, episode)] = (count, retry_at, at)
+            self._dirty = True
+
+    def in_window(self, anime_id: int, episode: int) -> bool:
+        with self._lock:
+            rec = self._misses.get((anime_id, episode))
+        return rec is not None and rec[2] is not None and self._next_burst(rec[2]) is not None
+
+    def bursting(self, anime_id: int, episode: int) -> bool:
+        """The episode's next search is one of its release-window searches.
+        Those look for an upload minutes old, so they must reach Nyaa."""
+        with self._lock:
+            rec = self._misses.get((anime_id, episode))
+        if rec is None or rec[2] is None:
+            return False
+        offsets = self._burst()
+        return bool(offsets) and rec[1] <= rec[2] + offsets[-1]
+
+    def _next_burst(self, aired_at: float) -> float | None:
+        now = self._clock()
+        return next((aired_at + t for t in self._burst() if aired_at + t > now), None)
+
+    def miss(self, anime_id: int, episode: int) -> float:
+        """Record a miss; returns the seconds until the next attempt."""
+        with self._lock:
+            count, _, aired = self._misses.get((anime_id, episode), (0, 0.0, None))
+            now = self._clock()
+            slot = self._next_burst(aired) if aired is not None else None
+            if slot is not None and self._budget():
+                self._misses[(anime_id, episode)] = (count, slot, aired)
+                self._dirty = True
+                return slot - now
+            count += 1
+            delay = min(self._cap(), self._base() * 2 ** (count - 1))
+            delay *= 1 + self._jitter * (2 * self._rng() - 1)
+            self._misses[(anime_id, episode)] = (count, now + delay, aired)
+            self._dirty = True
+            return delay
+
+    def hit(self, anime_id: int, episode: int) -> None:
+        with self._lock:
+            if self._misses.pop((anime_id, episode), None) is not None:
+                self._dirty = True
+
+    def reset(self, anime_id: int) -> None:
+        """A new episode aired: search everything for this anime again."""
+        with self._lock:
+            stale = [k for k in self._misses if k[0] == anime_id]
+            for k in stale:
+                del self._misses[k]
+            self._dirty = self._dirty or bool(stale)
+
+    def save(self) -> None:
+        """Write the records if they changed. Ones expired for longer than
+        the cap are dropped; they belong to episodes found or removed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            horizon = self._clock() - self._cap()
+            data = {
+                f"{aid}:{ep}": [count, retry_at] + ([aired] if aired is not None else [])
+                for (aid, ep), (count, retry_at, aired) in self._misses.items()
+                if retry_at > horizon
+            }
+            self._dirty = False
+        try:
+            write_json_atomic(self.path, data)
+        except OSError as e:
+            print(f"Could not save search misses: {e}")
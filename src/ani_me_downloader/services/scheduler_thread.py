@@ -0,0 +1,80 @@
+# coding: utf-8
+"""Wakes when the next anime is due, plus a low-frequency sweep."""
+import threading
+import time
+from typing import Callable, Iterable
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from ..core.anime import Anime
+from .airing_schedule import AiringSchedule
+
+# Due times are wall-clock; re-read the clock at least this often so a
+# machine waking from sleep does not oversleep a due anime.
+MAX_SLEEP = 300
+
+
+class SchedulerThread(QThread):
+    """Emit `due(ids)` when anime on the schedule come due and `sweep(ids)`
+    every `sweep_seconds()` as a safety net; the sweep's `ids` are the anime
+    that came due in the same wakeup, covered by the full pass. Sleeps
+    until the earlier of the two; `reschedule` and `stop` wake it early."""
+    due = pyqtSignal(list)
+    sweep = pyqtSignal(list)
+
+    def __init__(
+        self,
+        schedule: AiringSchedule,
+        sweep_seconds: Callable[[], float],
+        clock: Callable[[], float] = time.time,
+    ):
+        super().__init__()
+        self._schedule = schedule
+        self._sweep_seconds = sweep_seconds
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._stop = False
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        self.requestInterruption()
+
+    def reschedule(self, animes: Iterable[Anime]) -> None:
+        """Recompute due times for the library; drops anime not in it.
+        Reads every episode list: call once they are decoded, on the thread
+        that changes them."""
+        animes = list(animes)
+        with self._cond:
+            self._schedule.retain(a.id for a in animes)
+            self._schedule.update(animes)
+            self._cond.notify()
+
+    def ran(self, ids: Iterable[int]) -> None:
+        with self._cond:
+            self._schedule.ran(ids)
+
+    def run(self) -> None:
+        next_sweep = self._clock() + max(60, self._sweep_seconds())
+        while True:
+            with self._cond:
+                if self._stop or self.isInterruptionRequested():
+                    return
+                now = self._clock()
+                swept = now >= next_sweep
+                if swept:
+                    next_sweep = now + max(60, self._sweep_seconds())
+                ids = self._schedule.pop_due()
+                if not ids and not swept:
+                    due = self._schedule.next_due()
+                    wake = next_sweep if due is None else min(due, next_sweep)
+                    self._cond.wait(min(wake - now, MAX_SLEEP))
+                    continue
+            if swept:
+                if ids:
+                    print(f"{len(ids)} anime due for a check, run with the sweep")
+                self.sweep.emit(ids)
+            else:
+                print(f"{len(ids)} anime due for a check")
+                self.due.emit(ids)
@@ -8,7 +8,6 @@ import time
 from PyQt5.QtCore import QThread, pyqtSignal
 
 from ..core.torrent import FilePriority, Torrent, TorrentStatus
-from ..download import resume
 from ..download.commands import (
     AddTorrent,
     Command,
@@ -17,6 +16,7 @@ from ..download.commands import (
     ResumeTorrent,
     SetFilePriority,
 )
+from ..download.resume import ResumeStore
 from ..download.session import TorrentSession, default_settings, lt
 
 
@@ -44,9 +44,12 @@ class TorrentThread(QThread):
         torrents: list[Torrent],
         cmd_queue: "queue.Queue[Command]",
         max_concurrent_downloads: int,
+        resume_file: str,
     ):
         super().__init__()
         self._initial = torrents
+        self._resume_file = resume_file
+        self._resume: ResumeStore | None = None
         self._cmd_queue = cmd_queue
         self._max = max_concurrent_downloads
         self._stop = False
@@ -62,10 +65,13 @@ class TorrentThread(QThread):
             )
             return
         try:
-            sess = TorrentSession(default_settings(self._max))
+            store = ResumeStore(self._resume_file)
+            store.migrate_sidecars(self._initial)
+            sess = TorrentSession(default_settings(self._max), store)
         except Exception as exc:
             self.error.emit(str(exc))
             return
+        self._resume = store
 
         self._enforce_concurrency_on_load()
         for t in self._initial:
@@ -94,6 +100,7 @@ class TorrentThread(QThread):
         while time.time() < deadline:
             self._drain_alerts(sess)
             time.sleep(0.05)
+        store.close()
         self.exited.emit(self._initial)
 
     def _drain_commands(self, sess: TorrentSession) -> None:
@@ -155,11 +162,8 @@ class TorrentThread(QThread):
             ih = sess.info_hash_for(alert.handle)
             if ih is None:
                 return
-            t = sess.torrent_for(ih)
-            if t is None:
-                return
             blob = lt.write_resume_data_buf(alert.params)
-            resume.save_resume(t, blob)
+            self._resume.save(ih, bytes(blob))
             return
 
         if isinstance(alert, lt.save_resume_data_failed_alert):
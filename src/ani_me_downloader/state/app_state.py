@@ -1,101 +1,253 @@
 # coding: utf-8
 """In-memory canonical state plus persistence binding."""
-from ..core.anime import Anime, EpStatus
+import threading
+from typing import Callable
+
+from ..core.anime import Anime, EpState, EpStatus
+from ..core.identity import info_hash_from_magnet
 from ..core.torrent import Torrent
-from ..persistence.anime_repo import AnimeRepository
-from ..persistence.torrent_repo import TorrentRepository
+from ..persistence.write_behind import WriteBehind
+
+_IN_FLIGHT = (EpStatus.DOWNLOADING, EpStatus.BATCH_PENDING)
 
 
 class AppState:
-    """Owns the canonical animes/torrents lists and their repositories."""
+    """Owns the canonical animes/torrents lists and their repositories.
+
+    Lookups go through dict indexes: anime by MAL id, torrent by info_hash,
+    and info_hash → [(anime_id, ep)] for episodes holding a magnet. The
+    id/hash indexes are rebuilt whenever `animes`/`torrents` is reassigned.
+    The episode index is built on first use after `animes` is assigned and
+    extended by `index_episode`; entries are re-checked against the EpState
+    on read, so cleared magnets never need an explicit unindex.
+
+    Repositories may hand back anime with deferred episode lists. Nothing
+    here decodes an anime with no in-flight episodes (per its status
+    counts); `materialize_async` decodes the rest off the GUI thread.
+
+    `save` hands a write-behind worker a copy of each anime and torrent,
+    which it commits together through `store` (a JsonStateStore or
+    SqliteStateStore); the worker never reads objects this thread keeps
+    changing. Only entries whose fields or episode list changed since the
+    last save are copied again (one dict comparison and a revision check
+    each); the others reuse their last copy, which nothing mutates. Saves inside `coalesce_seconds` of each other
+    collapse into one commit. Call `flush()` when the data must be on disk
+    before continuing. `consistent` is the store's verdict at load: both
+    collections came from the same commit, so `reconcile` has nothing to
+    repair."""
 
     def __init__(
         self,
         animes: list[Anime],
         torrents: list[Torrent],
-        anime_repo: AnimeRepository,
-        torrent_repo: TorrentRepository,
+        store,
+        *,
+        consistent: bool = False,
+        coalesce_seconds: float = 0.25,
     ):
         self.animes = animes
         self.torrents = torrents
-        self._anime_repo = anime_repo
-        self._torrent_repo = torrent_repo
+        self.consistent = consistent
+        self._store = store
+        self._writer = WriteBehind(coalesce_seconds, name="state-writer")
+        # id -> (live anime, copy, fields at copy time, episode set, its revision)
+        self._saved_animes: dict[int, tuple] = {}
+        # info_hash -> (live torrent, copy, fields at copy time)
+        self._saved_torrents: dict[str, tuple] = {}
 
     @classmethod
-    def load(cls, anime_repo: AnimeRepository, torrent_repo: TorrentRepository) -> "AppState":
-        return cls(
-            animes=anime_repo.load(),
-            torrents=torrent_repo.load(),
-            anime_repo=anime_repo,
-            torrent_repo=torrent_repo,
+    def load(cls, store, *, coalesce_seconds: float = 0.25) -> "AppState":
+        animes, torrents = store.load()
+        state = cls(
+            animes=animes,
+            torrents=torrents,
+            store=store,
+            consistent=store.consistent,
+            coalesce_seconds=coalesce_seconds,
         )
+        if store.needs_migration:
+            state.save()  # one-time rewrite in the current schema, off-thread
+        return state
+
+    @property
+    def animes(self) -> list[Anime]:
+        return self._animes
+
+    @animes.setter
+    def animes(self, animes: list[Anime]) -> None:
+        self._animes = animes
+        self._anime_by_id = {a.id: a for a in animes}
+        self._eps_by_hash: dict[str, list[tuple[int, int]]] | None = None
+
+    @property
+    def torrents(self) -> list[Torrent]:
+        return self._torrents
+
+    @torrents.setter
+    def torrents(self, torrents: list[Torrent]) -> None:
+        self._torrents = torrents
+        self._torrent_by_hash = {t.info_hash: t for t in torrents}
 
     def add_anime(self, a: Anime) -> None:
-        self.animes.insert(0, a)
+        self._animes.insert(0, a)
+        self._anime_by_id[a.id] = a
+        if self._eps_by_hash is not None and _has_in_flight(a):
+            for n, magnet in a.episodes.magnets().items():
+                self.index_episode(a.id, n, magnet)
 
     def remove_anime(self, id: int) -> Anime | None:
-        for i, a in enumerate(self.animes):
-            if a.id == id:
-                return self.animes.pop(i)
-        return None
+        a = self._anime_by_id.pop(id, None)
+        if a is not None:
+            self._animes.remove(a)
+        return a
 
     def get_anime(self, id: int) -> Anime | None:
-        return next((a for a in self.animes if a.id == id), None)
+        return self._anime_by_id.get(id)
 
     def add_torrent(self, t: Torrent) -> Torrent:
         """Add or merge owners. Returns the canonical row."""
-        for existing in self.torrents:
-            if existing.info_hash == t.info_hash:
-                existing.anime_ids |= t.anime_ids
-                return existing
-        self.torrents.append(t)
+        existing = self._torrent_by_hash.get(t.info_hash)
+        if existing is not None:
+            existing.anime_ids |= t.anime_ids
+            return existing
+        self._torrents.append(t)
+        self._torrent_by_hash[t.info_hash] = t
         return t
 
     def remove_torrent(self, info_hash: str) -> Torrent | None:
-        for i, t in enumerate(self.torrents):
-            if t.info_hash == info_hash:
-                return self.torrents.pop(i)
-        return None
+        t = self._torrent_by_hash.pop(info_hash, None)
+        if t is not None:
+            self._torrents.remove(t)
+        return t
 
     def get_torrent(self, info_hash: str) -> Torrent | None:
-        return next((t for t in self.torrents if t.info_hash == info_hash), None)
+        return self._torrent_by_hash.get(info_hash)
+
+    def index_episode(self, anime_id: int, ep: int, magnet: str) -> None:
+        """Record that episode `ep` of `anime_id` now holds `magnet`."""
+        if self._eps_by_hash is None:
+            return  # picked up when the index is built
+        ih = info_hash_from_magnet(magnet)
+        if not ih:
+            return
+        owners = self._eps_by_hash.setdefault(ih, [])
+        if (anime_id, ep) not in owners:
+            owners.append((anime_id, ep))
 
-    def save_animes(self) -> None:
-        self._anime_repo.save(self.animes)
+    def episodes_for(self, info_hash: str) -> list[tuple[Anime, EpState]]:
+        """Episodes whose magnet resolves to `info_hash`. Prunes stale entries."""
+        if self._eps_by_hash is None:
+            self._build_episode_index()
+        owners = self._eps_by_hash.get(info_hash)
+        if not owners:
+            return []
+        out: list[tuple[Anime, EpState]] = []
+        live: list[tuple[int, int]] = []
+        for anime_id, n in owners:
+            anime = self._anime_by_id.get(anime_id)
+            if anime is None:
+                continue
+            ep = anime.episodes.get(n)
+            if ep is None or info_hash_from_magnet(ep.magnet or "") != info_hash:
+                continue
+            out.append((anime, ep))
+            live.append((anime_id, n))
+        if live:
+            self._eps_by_hash[info_hash] = live
+        else:
+            del self._eps_by_hash[info_hash]
+        return out
 
-    def save_torrents(self) -> None:
-        self._torrent_repo.save(self.torrents)
+    def _build_episode_index(self) -> None:
+        self._eps_by_hash = {}
+        for a in self._animes:
+            if not _has_in_flight(a):
+                continue
+            for n, magnet in a.episodes.magnets().items():
+                self.index_episode(a.id, n, magnet)
+
+    def materialize_async(self, done: Callable[[], None] | None = None) -> threading.Thread:
+        """Decode every deferred episode list on a daemon thread, then call
+        `done()` on that thread."""
+        animes = list(self._animes)
+
+        def run():
+            for a in animes:
+                a.episodes.materialize()
+            if done is not None:
+                done()
+
+        thread = threading.Thread(target=run, name="state-materialize", daemon=True)
+        thread.start()
+        return thread
+
+    def save(self) -> None:
+        saved_animes, self._saved_animes = self._saved_animes, {}
+        saved_torrents, self._saved_torrents = self._saved_torrents, {}
+        animes = [self._anime_copy(a, saved_animes.get(a.id)) for a in self._animes]
+        torrents = [self._torrent_copy(t, saved_torrents.get(t.info_hash)) for t in self._torrents]
+        self._writer.submit("state", lambda: self._store.save(animes, torrents))
+
+    def _anime_copy(self, a: Anime, saved: tuple | None) -> Anime:
+        eps = a.episodes
+        if (saved is None or saved[0] is not a or saved[3] is not eps
+                or saved[4] != eps.revision or saved[2] != a.__dict__):
+            copy = a.copy()
+            # The copy's own dict stands in for watch_urls: it never changes.
+            saved = (a, copy, {**a.__dict__, "watch_urls": copy.watch_urls}, eps, eps.revision)
+        self._saved_animes[a.id] = saved
+        return saved[1]
+
+    def _torrent_copy(self, t: Torrent, saved: tuple | None) -> Torrent:
+        if saved is None or saved[0] is not t or saved[2] != t.__dict__:
+            copy = t.copy()
+            saved = (t, copy, {**t.__dict__, "anime_ids": copy.anime_ids, "files": copy.files})
+        self._saved_torrents[t.info_hash] = saved
+        return saved[1]
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Block until every save requested so far has been attempted.
+        False on timeout or if the last attempt failed."""
+        return self._writer.flush(timeout)
+
+    def close(self) -> None:
+        """Write pending saves, stop the writer and close the store. Idempotent."""
+        self._writer.close()
+        self._store.close()
 
     def reconcile(self) -> int:
         """Recreate Torrent rows for in-flight EpStates that lost them."""
-        from ..core.identity import info_hash_from_magnet
         from ..core.torrent import TorrentStatus
         from ..core.episodes import episode_display_name
 
         added = 0
         for anime in self.animes:
-            for ep in anime.episodes:
-                if ep.status not in (EpStatus.DOWNLOADING, EpStatus.BATCH_PENDING):
-                    continue
-                if not ep.magnet:
+            if not _has_in_flight(anime):
+                continue
+            for n, magnet in list(anime.episodes.magnets().items()):
+                ep = anime.episodes.get(n)
+                if ep.status not in _IN_FLIGHT:
                     continue
-                ih = info_hash_from_magnet(ep.magnet)
+                ih = info_hash_from_magnet(magnet)
                 if not ih:
                     continue
                 existing = self.get_torrent(ih)
                 if existing is not None:
                     existing.anime_ids.add(anime.id)
                     continue
-                t = Torrent(
+                self.add_torrent(Torrent(
                     info_hash=ih,
                     magnet=ep.magnet,
                     name=episode_display_name(anime, ep.ep),
                     save_path=anime.output_dir,
                     anime_ids={anime.id},
                     desired_state=TorrentStatus.DOWNLOADING,
-                )
-                self.torrents.append(t)
+                ))
                 added += 1
         if added:
             print(f"[reconcile] Recovered {added} missing torrent(s).")
         return added
+
+
+def _has_in_flight(anime: Anime) -> bool:
+    return any(anime.episodes.count(st) for st in _IN_FLIGHT)
@@ -0,0 +1,28 @@
+# coding: utf-8
+"""Merging an anime pass's results back into the canonical list. No PyQt."""
+from ..core.anime import Anime, EpStatus
+
+_TERMINAL_EP = {EpStatus.DONE, EpStatus.BATCH_DONE, EpStatus.TRACK_ONLY}
+
+
+def merge_anime(current: Anime, updated: Anime) -> Anime:
+    """GUI-side wins for user-edited fields and terminal episode states; thread wins otherwise."""
+    current.status = updated.status
+    current.next_eta = updated.next_eta
+    current.last_aired_episode = updated.last_aired_episode
+    current.total_episodes = updated.total_episodes
+
+    if updated.episodes.derives_from(current.episodes):
+        # Nothing on the GUI side touched the list since the pass copied it,
+        # so the pass's list is the merge; comparing would decode both here.
+        current.episodes = updated.episodes
+        return current
+    if updated.episodes == current.episodes:
+        return current
+    eps = current.episodes
+    for thread_ep in updated.episodes:
+        cur_ep = eps.get(thread_ep.ep)
+        if cur_ep is not None and (cur_ep.status in _TERMINAL_EP or cur_ep == thread_ep):
+            continue
+        eps.set(thread_ep.ep, thread_ep.status, thread_ep.magnet)
+    return current
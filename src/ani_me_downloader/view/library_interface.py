@@ -26,10 +26,9 @@ _DOWNLOADED = {EpStatus.DONE, EpStatus.BATCH_DONE}
 
 def _downloaded_count(anime: Anime) -> tuple[int, bool]:
     """Returns (count, fully_downloaded). Batch counts as total_episodes."""
-    has_batch_done = any(ep.status is EpStatus.BATCH_DONE and ep.ep == 0 for ep in anime.episodes)
-    if has_batch_done:
+    if anime.episodes.count(EpStatus.BATCH_DONE):
         return anime.total_episodes, True
-    count = sum(1 for ep in anime.episodes if ep.status is EpStatus.DONE)
+    count = anime.episodes.count(EpStatus.DONE)
     return count, count >= anime.total_episodes > 0
 
 
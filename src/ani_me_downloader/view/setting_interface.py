@@ -48,13 +48,21 @@ class SettingInterface(ScrollArea):
             "Maximum number of items to download at once",
             self.downloadGroup,
         )
-        self.checkEpisodeIntervalCard = RangeSettingCard(
-            cfg.checkEpisodeInterval,
+        self.sweepIntervalCard = RangeSettingCard(
+            cfg.sweepInterval,
             FIF.UPDATE,
-            "Check for new episodes (sec)",
-            "How frequently to check for new episodes (in seconds)",
+            "Full check interval (sec)",
+            "How often to check every anime; airing ones are also checked when an episode airs",
             self.downloadGroup,
         )
+        self.storageBackendCard = OptionsSettingCard(
+            cfg.storageBackend,
+            FIF.SAVE,
+            self.tr("Library storage"),
+            self.tr("JSON files or a single SQLite database (the library moves over on restart)"),
+            texts=[self.tr("JSON files"), self.tr("SQLite database")],
+            parent=self.downloadGroup,
+        )
 
         self.compressionGroup = SettingCardGroup(self.tr("Compression"), self.scrollWidget)
         self.compressVideosCard = SwitchSettingCard(
@@ -80,6 +88,21 @@ class SettingInterface(ScrollArea):
             configItem=cfg.useProxy,
             parent=self.qualityandprovider,
         )
+        self.searchBackendCard = OptionsSettingCard(
+            cfg.searchBackend,
+            FIF.SEARCH,
+            self.tr("Nyaa search"),
+            self.tr("The RSS feed is lighter to parse; the HTML listing is used if it fails"),
+            texts=[self.tr("HTML listing"), self.tr("RSS feed")],
+            parent=self.qualityandprovider,
+        )
+        self.feedPollingCard = SwitchSettingCard(
+            FIF.SYNC,
+            self.tr("Poll the release feed"),
+            self.tr("One Nyaa request per check for the whole library; each show is searched only to backfill older episodes"),
+            configItem=cfg.feedPolling,
+            parent=self.qualityandprovider,
+        )
         self.onlineMvQualityCard = OptionsSettingCard(
             cfg.onlineMvQuality,
             FIF.VIDEO,
@@ -157,8 +180,11 @@ class SettingInterface(ScrollArea):
         self.settingLabel.move(36, 30)
         self.downloadGroup.addSettingCard(self.downloadFolderCard)
         self.downloadGroup.addSettingCard(self.downloadLimitCard)
-        self.downloadGroup.addSettingCard(self.checkEpisodeIntervalCard)
+        self.downloadGroup.addSettingCard(self.sweepIntervalCard)
+        self.downloadGroup.addSettingCard(self.storageBackendCard)
         self.qualityandprovider.addSettingCard(self.useProxyCard)
+        self.qualityandprovider.addSettingCard(self.searchBackendCard)
+        self.qualityandprovider.addSettingCard(self.feedPollingCard)
         self.qualityandprovider.addSettingCard(self.onlineMvQualityCard)
         self.compressionGroup.addSettingCard(self.compressVideosCard)
         self.compressionGroup.addSettingCard(self.compressUseCudaCard)
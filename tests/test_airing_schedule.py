@@ -0,0 +1,82 @@
+from ani_me_downloader.core.anime import AiringStatus, Anime, DownloadMode, EpisodeSet, EpStatus
+from ani_me_downloader.services.airing_schedule import AiringSchedule
+from ani_me_downloader.services.miss_cache import MissCache
+
+
+class Clock:
+    def __init__(self, now: float = 10_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _airing(aid: int, next_eta: int, aired: int = 2) -> Anime:
+    return Anime(
+        aid, f"anime {aid}", status=AiringStatus.RELEASING, next_eta=next_eta,
+        last_aired_episode=aired, total_episodes=12,
+        episodes=EpisodeSet.from_range(1, aired, EpStatus.DONE),
+    )
+
+
+def test_due_times_follow_airing_plus_grace():
+    clock = Clock()
+    schedule = AiringSchedule(grace=lambda: 100, clock=clock)
+    later, sooner = _airing(1, 20_000), _airing(2, 15_000)
+    schedule.update([later, sooner])
+    assert schedule.next_due() == 15_100
+    assert schedule.pop_due() == []
+    clock.now = 20_100
+    assert schedule.pop_due() == [2, 1]
+    assert schedule.next_due() is None
+
+
+def test_pending_episodes_are_due_now_or_at_retry(tmp_path):
+    clock = Clock()
+    misses = MissCache(tmp_path / "misses.json", base=lambda: 500, jitter=0, clock=clock)
+    schedule = AiringSchedule(misses=misses, clock=clock)
+    behind = _airing(1, 20_000)
+    behind.last_aired_episode = 3
+    assert schedule.due_at(behind) == 0.0
+    misses.miss(1, 3)
+    assert schedule.due_at(behind) == clock.now + 500
+
+
+def test_finished_and_track_only_anime_are_left_to_the_sweep():
+    schedule = AiringSchedule()
+    done = _airing(1, 0)
+    done.status = AiringStatus.FINISHED
+    tracked = _airing(2, 20_000, aired=3)
+    tracked.download_mode = DownloadMode.TRACK_ONLY
+    tracked.status = AiringStatus.FINISHED
+    schedule.update([done, tracked])
+    assert len(schedule) == 0
+
+
+def test_update_replaces_old_due_time():
+    clock = Clock()
+    schedule = AiringSchedule(grace=lambda: 0, clock=clock)
+    a = _airing(1, 20_000)
+    schedule.update([a])
+    a.next_eta = 30_000
+    schedule.update([a])
+    clock.now = 25_000
+    assert schedule.pop_due() == []
+    assert schedule.next_due() == 30_000
+
+
+def test_ran_pushes_an_unchanged_due_time_to_retry():
+    clock = Clock()
+    schedule = AiringSchedule(grace=lambda: 0, retry=lambda: 1800, clock=clock)
+    a = _airing(1, 9_000)  # aired already, nothing new yet
+    schedule.ran([1])
+    schedule.update([a])
+    assert schedule.next_due() == clock.now + 1800
+
+
+def test_retain_forgets_removed_anime():
+    schedule = AiringSchedule(clock=Clock())
+    schedule.update([_airing(1, 20_000), _airing(2, 20_000)])
+    schedule.retain([2])
+    assert len(schedule) == 1
+    assert schedule.pop_due() == [] and schedule.next_due() == 20_900
@@ -0,0 +1,88 @@
+import json
+
+from ani_me_downloader.core.anime import Anime, AiringStatus, DownloadMode, EpisodeSet, EpStatus
+from ani_me_downloader.persistence.anime_repo import ANIME_SCHEMA, AnimeRepository
+
+
+def _anime(aid: int) -> Anime:
+    eps = EpisodeSet.from_range(1, 10, EpStatus.DONE)
+    eps.set(11, EpStatus.DOWNLOADING, f"magnet:{aid}:11")
+    return Anime(
+        aid, f"anime {aid}", search_name=f"search {aid}", status=AiringStatus.RELEASING,
+        next_eta=1700000000, last_aired_episode=11, total_episodes=24,
+        watch_urls={"animekai": f"https://example.com/{aid}"}, episodes=eps,
+    )
+
+
+def test_schema_2_round_trip(tmp_path):
+    path = tmp_path / "anime_file.json"
+    animes = [_anime(1), _anime(2)]
+    AnimeRepository(path).save(animes)  # first save goes to the journal
+
+    repo = AnimeRepository(path)
+    loaded = repo.load()
+    assert not repo.needs_migration
+    assert all(a.episodes.is_deferred for a in loaded)
+    assert loaded == animes
+
+    repo.save(loaded[::-1])  # order change: snapshot rewritten
+    assert json.loads(path.read_text())["schema"] == ANIME_SCHEMA
+    assert AnimeRepository(path).load() == animes[::-1]
+
+
+def test_unchanged_deferred_anime_saves_nothing(tmp_path):
+    path = tmp_path / "anime_file.json"
+    AnimeRepository(path).save([_anime(1)])
+    repo = AnimeRepository(path)
+    loaded = repo.load()
+    records, reorder = repo.stage(loaded)
+    assert records == [] and not reorder
+    assert loaded[0].episodes.is_deferred
+
+
+def test_legacy_rows_need_migration(tmp_path):
+    path = tmp_path / "anime_file.json"
+    path.write_text(json.dumps([{
+        "id": 7,
+        "name": "legacy",
+        "status": "releasing",
+        "last_aired_episode": 2,
+        "total_episodes": 12,
+        "episodes": [
+            {"ep": 1, "status": "done"},
+            {"ep": 2, "status": "downloading", "magnet": "magnet:7:2"},
+            {"ep": 3, "status": "not_aired"},
+        ],
+    }]))
+    repo = AnimeRepository(path)
+    (a,) = repo.load()
+    assert repo.needs_migration
+    assert a.download_mode is DownloadMode.EPISODES
+    assert a.episodes.runs() == [(1, 1, EpStatus.DONE), (2, 2, EpStatus.DOWNLOADING)]
+
+    repo.save([a])
+    assert not repo.needs_migration
+    data = json.loads(path.read_text())
+    assert data["schema"] == ANIME_SCHEMA
+    assert data["items"][0]["runs"] == [[1, 1, "done"], [2, 2, "downloading"]]
+    assert AnimeRepository(path).load() == [a]
+
+
+def test_malformed_runs_are_dropped_at_load(tmp_path, caplog):
+    path = tmp_path / "anime_file.json"
+    repo = AnimeRepository(path)
+    repo.save([_anime(1), _anime(2)])
+    repo.save([_anime(2), _anime(1)])  # snapshot
+    data = json.loads(path.read_text())
+    data["items"][0]["runs"].append([12, "13", "done"])
+    data["items"][0]["magnets"].append([12])
+    data["items"][1]["runs"] = None
+    path.write_text(json.dumps(data))
+
+    repo = AnimeRepository(path)
+    (a,) = repo.load()
+    assert "corrupt" in caplog.text
+    assert a.id == 2 and not a.episodes.is_deferred
+    assert a.episodes == _anime(2).episodes
+    records, _ = repo.stage([a])
+    assert [r["op"] for r in records] == ["put"]  # rewritten without the bad entries
@@ -0,0 +1,70 @@
+from ani_me_downloader.core.anime import AiringStatus, Anime, EpisodeSet, EpStatus
+from ani_me_downloader.search.cache import SearchCache
+from ani_me_downloader.search.nyaa import NyaaResult
+from ani_me_downloader.services import anime_service
+from ani_me_downloader.services.anime_service import AnimeService
+from ani_me_downloader.services.miss_cache import MissCache, burst_offsets
+
+STEPS = [120, 300, 600, 1200]
+
+
+class Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _service(tmp_path, clock, monkeypatch):
+    queries = []
+
+    def search_nyaa(query, **kwargs):
+        queries.append((clock.now, query, kwargs["page"]))
+        # Some other show's release: a miss, but one the cache would keep.
+        return [NyaaResult("[SubsPlease] Other Show - 01 (1080p)", "magnet:?xt=1", "1 GiB", 9, 1)]
+
+    monkeypatch.setattr(anime_service, "search_nyaa", search_nyaa)
+    misses = MissCache(
+        tmp_path / "misses.json", jitter=0, clock=clock,
+        burst=lambda: burst_offsets(0, STEPS, 3600),
+    )
+    service = AnimeService(
+        use_proxy=lambda: False,
+        search_cache=SearchCache(ttl=lambda: 600, clock=clock),
+        page_budget=lambda: 1,
+        misses=misses,
+    )
+    return service, misses, queries
+
+
+def _anime() -> Anime:
+    return Anime(
+        1, "Show", status=AiringStatus.UNKNOWN, last_aired_episode=5, total_episodes=12,
+        episodes=EpisodeSet.from_range(1, 4, EpStatus.DONE),
+    )
+
+
+def test_release_window_retries_reach_nyaa_every_time(tmp_path, monkeypatch):
+    clock = Clock()
+    service, misses, queries = _service(tmp_path, clock, monkeypatch)
+    anime, aired = _anime(), clock.now
+    misses.aired(anime.id, 5, aired)
+
+    for offset in burst_offsets(0, STEPS, 3600):
+        clock.now = aired + offset
+        assert misses.ready(anime.id, [5]) == [5]
+        service.prepare(anime)
+        assert queries[-1] == (clock.now, "Show", 1)
+    assert len(queries) == len(burst_offsets(0, STEPS, 3600))
+
+
+def test_searches_outside_the_window_use_the_cache(tmp_path, monkeypatch):
+    clock = Clock()
+    service, misses, queries = _service(tmp_path, clock, monkeypatch)
+    anime = _anime()
+    service.prepare(anime)
+    misses.hit(anime.id, 5)  # searchable again at once
+    clock.now += 60
+    service.prepare(anime)
+    assert len(queries) == 1
@@ -0,0 +1,18 @@
+from ani_me_downloader.core.anime import Anime, EpisodeSet, EpStatus
+from ani_me_downloader.services.anime_thread import AnimeThread
+
+
+def test_pass_copies_leave_episode_lists_deferred():
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return EpisodeSet.from_range(1, 12, EpStatus.DONE)
+
+    anime = Anime(1, "Show", episodes=EpisodeSet.deferred(loader, {EpStatus.DONE: 12}))
+    thread = AnimeThread([anime], service=None)
+    (copied,) = thread._animes
+    assert anime.episodes.is_deferred and copied.episodes.is_deferred
+    assert calls == []
+    assert copied.episodes.runs() == [(1, 12, EpStatus.DONE)]
+    assert anime.episodes.is_deferred
@@ -0,0 +1,70 @@
+from ani_me_downloader.core.anime import AiringStatus, Anime, EpisodeSet, EpStatus
+from ani_me_downloader.core.torrent import Torrent, TorrentStatus
+from ani_me_downloader.state.app_state import AppState
+
+
+class Store:
+    def __init__(self):
+        self.saves = []
+
+    def save(self, animes, torrents):
+        self.saves.append((animes, torrents))
+
+    def close(self):
+        pass
+
+
+def _state():
+    animes = [Anime(i, f"anime {i}", episodes=EpisodeSet.from_range(1, 3, EpStatus.DONE))
+              for i in range(3)]
+    torrents = [Torrent(f"{i:040x}", f"magnet:?xt=urn:btih:{i:040x}", "t", "/tmp", {i})
+                for i in range(3)]
+    store = Store()
+    return AppState(animes, torrents, store, coalesce_seconds=0), store
+
+
+def _save(state, store):
+    state.save()
+    assert state.flush(5)
+    return store.saves[-1]
+
+
+def test_save_copies_only_what_changed():
+    state, store = _state()
+    animes, torrents = _save(state, store)
+    assert all(a is not live for a, live in zip(animes, state.animes))
+
+    state.animes[0].episodes.set(4, EpStatus.DOWNLOADING, "magnet:?xt=4")
+    state.animes[1].status = AiringStatus.FINISHED
+    state.animes[2].watch_urls["site"] = "https://example"
+    state.torrents[0].anime_ids.add(9)
+    state.torrents[1].desired_state = TorrentStatus.PAUSED
+    again, again_torrents = _save(state, store)
+    assert [a is b for a, b in zip(again, animes)] == [False, False, False]
+    assert [t is u for t, u in zip(again_torrents, torrents)] == [False, False, True]
+    assert again[0].episodes.get(4).status is EpStatus.DOWNLOADING
+    assert again[2].watch_urls == {"site": "https://example"}
+    assert again_torrents[0].anime_ids == {0, 9}
+
+    third, third_torrents = _save(state, store)
+    assert all(a is b for a, b in zip(third, again))
+    assert all(t is u for t, u in zip(third_torrents, again_torrents))
+
+
+def test_saved_copies_do_not_follow_later_changes():
+    state, store = _state()
+    animes, _ = _save(state, store)
+    state.animes[0].episodes.set(1, EpStatus.TRACK_ONLY)
+    state.animes[0].name = "renamed"
+    assert animes[0].name == "anime 0"
+    assert animes[0].episodes.get(1).status is EpStatus.DONE
+
+
+def test_new_episode_list_object_is_copied():
+    state, store = _state()
+    animes, _ = _save(state, store)
+    state.animes[0].episodes = EpisodeSet.from_range(1, 5, EpStatus.DONE)
+    again, _ = _save(state, store)
+    assert again[0] is not animes[0]
+    assert again[0].episodes.runs() == [(1, 5, EpStatus.DONE)]
+    assert again[1] is animes[1]
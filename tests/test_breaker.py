@@ -0,0 +1,94 @@
+from ani_me_downloader.metadata.breaker import BreakerState, CircuitBreaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _breaker(clock, changes=None) -> CircuitBreaker:
+    return CircuitBreaker(
+        "source", window=10, min_calls=4, failure_rate=0.5, cooldown=60,
+        max_cooldown=200, on_change=None if changes is None else changes.append, clock=clock,
+    )
+
+
+def test_opens_once_enough_calls_fail():
+    breaker = _breaker(Clock())
+    for _ in range(3):
+        breaker.failure()
+    assert breaker.health().state is BreakerState.CLOSED  # below min_calls
+    breaker.success()
+    breaker.failure()
+    assert breaker.health().state is BreakerState.OPEN  # 4 of 5 failed
+    assert not breaker.allow()
+
+
+def test_failure_rate_below_threshold_stays_closed():
+    breaker = _breaker(Clock())
+    for _ in range(3):
+        breaker.failure()
+        breaker.success()
+        breaker.success()
+    assert breaker.health().state is BreakerState.CLOSED
+
+
+def test_single_probe_after_cooldown_closes_on_success():
+    clock = Clock()
+    changes = []
+    breaker = _breaker(clock, changes)
+    breaker.trip()
+    clock.now = 59
+    assert not breaker.allow()
+    clock.now = 60
+    assert breaker.allow()
+    assert not breaker.allow()  # one probe at a time
+    breaker.success()
+    assert breaker.allow()
+    assert [h.state for h in changes] == [
+        BreakerState.OPEN, BreakerState.HALF_OPEN, BreakerState.CLOSED,
+    ]
+    assert breaker.health().failure_rate == 0
+
+
+def test_failed_probe_doubles_cooldown_up_to_max():
+    clock = Clock()
+    breaker = _breaker(clock)
+    breaker.trip()
+    for cooldown in (120, 200, 200):
+        clock.now += breaker.health().retry_in
+        assert breaker.allow()
+        breaker.failure()
+        health = breaker.health()
+        assert health.state is BreakerState.OPEN
+        assert health.retry_in == cooldown
+
+
+def test_success_resets_cooldown():
+    clock = Clock()
+    breaker = _breaker(clock)
+    breaker.trip()
+    clock.now += 60
+    breaker.allow()
+    breaker.failure()  # cooldown 120
+    clock.now += 120
+    breaker.allow()
+    breaker.success()
+    breaker.trip()
+    assert breaker.health().retry_in == 60
+
+
+def test_trip_during_probe_doubles_cooldown_like_failure():
+    clock = Clock()
+    breaker = _breaker(clock)
+    breaker.trip()
+    for cooldown in (120, 200):
+        clock.now += breaker.health().retry_in
+        assert breaker.allow()
+        breaker.trip()
+        health = breaker.health()
+        assert health.state is BreakerState.OPEN
+        assert health.retry_in == cooldown
@@ -0,0 +1,73 @@
+from ani_me_downloader.core.anime import EpisodeSet, EpState, EpStatus
+
+
+def test_set_merges_adjacent_runs():
+    eps = EpisodeSet()
+    for n in (1, 2, 3, 5):
+        eps.set(n, EpStatus.DONE)
+    eps.set(4, EpStatus.DONE)
+    eps.set(6, EpStatus.DOWNLOADING, "magnet:?xt=urn:btih:6")
+    assert eps.runs() == [(1, 5, EpStatus.DONE), (6, 6, EpStatus.DOWNLOADING)]
+    assert eps.magnets() == {6: "magnet:?xt=urn:btih:6"}
+    assert len(eps) == 6
+
+
+def test_discard_splits_run():
+    eps = EpisodeSet.from_range(1, 10, EpStatus.DONE)
+    eps.discard(4)
+    assert eps.runs() == [(1, 3, EpStatus.DONE), (5, 10, EpStatus.DONE)]
+    assert 4 not in eps
+    assert eps.missing(1, 12) == [4, 11, 12]
+
+
+def test_runs_round_trip():
+    eps = EpisodeSet([
+        EpState(1, EpStatus.DONE),
+        EpState(2, EpStatus.DONE),
+        EpState(3, EpStatus.DOWNLOADING, "m3"),
+        EpState(7, EpStatus.TRACK_ONLY),
+    ])
+    again = EpisodeSet.from_runs(eps.runs(), eps.magnets())
+    assert again == eps
+    assert list(again) == list(eps)
+
+
+def test_from_runs_merges_unsorted_input():
+    eps = EpisodeSet.from_runs([(5, 6, EpStatus.DONE), (1, 4, EpStatus.DONE)])
+    assert eps.runs() == [(1, 6, EpStatus.DONE)]
+
+
+def _deferred(calls):
+    def load():
+        calls.append(1)
+        return EpisodeSet.from_range(1, 3, EpStatus.DONE)
+    return EpisodeSet.deferred(load, {EpStatus.DONE: 3})
+
+
+def test_deferred_counts_without_decoding():
+    calls = []
+    eps = _deferred(calls)
+    assert eps.is_deferred
+    assert eps.count(EpStatus.DONE) == 3
+    assert eps.status_counts() == {EpStatus.DONE: 3}
+    assert not calls
+
+
+def test_deferred_decodes_once_on_first_use():
+    calls = []
+    eps = _deferred(calls)
+    assert 2 in eps
+    assert list(eps) == [EpState(n, EpStatus.DONE) for n in (1, 2, 3)]
+    eps.set(4, EpStatus.DONE)
+    assert eps.runs() == [(1, 4, EpStatus.DONE)]
+    assert calls == [1]
+    assert not eps.is_deferred
+
+
+def test_copy_of_deferred_set_stays_deferred():
+    calls = []
+    eps = _deferred(calls)
+    copy = eps.copy()
+    assert copy.is_deferred and eps.is_deferred and not calls
+    copy.set(9, EpStatus.DONE)
+    assert 9 not in eps
@@ -0,0 +1,69 @@
+from ani_me_downloader.search.nyaa import NyaaResult
+from ani_me_downloader.search.selector import library_matcher
+from ani_me_downloader.services import feed_poller
+from ani_me_downloader.services.feed_poller import FeedPoller
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _item(view_id: int, title: str) -> NyaaResult:
+    return NyaaResult(title, f"magnet:?xt=urn:btih:{view_id:040x}", "1 GiB", 5, view_id)
+
+
+def _owned_by(*names):
+    matcher = library_matcher((n, "") for n in names)
+    return lambda item: matcher(item.title)
+
+
+def _poller(tmp_path, clock, monkeypatch, feed):
+    monkeypatch.setattr(feed_poller, "fetch_feed", lambda **kwargs: list(feed))
+    return FeedPoller(tmp_path / "feed.json", use_proxy=lambda: False,
+                      hold_seconds=lambda: 3600, clock=clock)
+
+
+def test_unused_items_of_library_anime_are_offered_again(tmp_path, monkeypatch):
+    clock = Clock()
+    early = _item(11, "[SubsPlease] Frieren - 13 (1080p)")
+    other = _item(12, "[SubsPlease] Not In Library - 01 (1080p)")
+    picked = _item(10, "[SubsPlease] Frieren - 12 (1080p)")
+    feed = [early, other, picked]
+    poller = _poller(tmp_path, clock, monkeypatch, feed)
+
+    poll = poller.poll()
+    poll.take([picked.magnet])  # ep 13 was not pending yet
+    poller.commit(poll, _owned_by("Frieren"))
+
+    feed.clear()  # nothing new upstream
+    again = FeedPoller(tmp_path / "feed.json", use_proxy=lambda: False,
+                       hold_seconds=lambda: 3600, clock=clock).poll()
+    assert again.items == [early]
+    assert again.marks == {"*": 12}
+
+
+def test_held_items_expire_after_hold_seconds(tmp_path, monkeypatch):
+    clock = Clock()
+    item = _item(11, "[SubsPlease] Frieren - 13 (1080p)")
+    feed = [item]
+    poller = _poller(tmp_path, clock, monkeypatch, feed)
+    poller.commit(poller.poll(), _owned_by("Frieren"))
+    feed.clear()
+    clock.now += 1800
+    poll = poller.poll()
+    assert poll.items == [item]
+    poller.commit(poll, _owned_by("Frieren"))  # keeps its first-seen time
+    clock.now += 1801
+    assert poller.poll().items == []
+
+
+def test_reads_marks_written_before_items_were_held(tmp_path, monkeypatch):
+    (tmp_path / "feed.json").write_text('{"*": 40}')
+    feed = [_item(41, "a"), _item(40, "b")]
+    poll = _poller(tmp_path, Clock(), monkeypatch, feed).poll()
+    assert [r.id for r in poll.items] == [41]
+    assert not poll.gap
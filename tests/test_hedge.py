@@ -0,0 +1,102 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+from ani_me_downloader.search import nyaa
+from ani_me_downloader.search.hedge import Cancelled, Hedge
+from ani_me_downloader.search.nyaa import NYAA_URL, PROXY_URL, search_nyaa
+from ani_me_downloader.services.host_limits import HostLimits
+
+
+class _Response:
+    def __init__(self, url):
+        self.url = url
+        self.content = b"<html></html>"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, size):
+        yield self.content
+
+
+def test_hedged_html_request_holds_its_own_host_slot_and_honours_cancel(monkeypatch):
+    release_slow = threading.Event()
+    parsed, held = [], []
+
+    def get(base, params, timeout, stream):
+        if base == PROXY_URL:
+            release_slow.wait(5)  # the preferred origin answers late
+        return _Response(base)
+
+    def parse(rows_of, content):
+        parsed.append(threading.current_thread().name)
+        return []
+
+    @contextmanager
+    def slot(host, cancel):
+        held.append(host)
+        yield
+
+    monkeypatch.setattr(nyaa.requests, "get", get)
+    monkeypatch.setattr(nyaa.parse_pool, "run", parse)
+    hedge = Hedge(initial_delay=0.05)
+
+    assert search_nyaa("x", use_proxy=True, hedge=hedge, slot=slot) == []
+    release_slow.set()
+    hedge._pool.shutdown(wait=True)
+
+    assert held == ["ani-me-downloader-proxy.vercel.app", "nyaa.si"]
+    assert len(parsed) == 1  # the late proxy response was dropped unparsed
+    assert hedge.tracker.error_rate(NYAA_URL) == 0.0
+
+
+def test_latency_sample_starts_once_the_host_slot_is_held():
+    hedge = Hedge()
+
+    def call(origin, cancel, started):
+        time.sleep(0.2)  # queued behind other requests to the host
+        started()
+        return origin
+
+    for _ in range(5):
+        assert hedge._timed(call, NYAA_URL, threading.Event()) == NYAA_URL
+    hedge._pool.shutdown(wait=True)
+    assert hedge.tracker.quantile(NYAA_URL, 1.0) < 0.1
+
+
+def test_cancelled_request_gives_up_its_host_slot_wait(monkeypatch):
+    limits = HostLimits(lambda: 1)
+    cancel = threading.Event()
+    outcome = []
+
+    def get(base, params, timeout, stream):
+        outcome.append("requested")
+        return _Response(base)
+
+    def wait_for_slot():
+        try:
+            nyaa._fetch(NYAA_URL, cancel, params={}, timeout=1, backend="html", slot=limits.slot)
+        except Cancelled:
+            outcome.append("cancelled")
+
+    monkeypatch.setattr(nyaa.requests, "get", get)
+    with limits.slot("nyaa.si"):
+        waiter = threading.Thread(target=wait_for_slot)
+        waiter.start()
+        time.sleep(0.1)
+        cancel.set()
+        waiter.join(1)
+        assert not waiter.is_alive()  # returned while the slot was still taken
+    assert outcome == ["cancelled"]
+
+    with pytest.raises(Cancelled):  # already lost: never queues for the slot
+        nyaa._fetch(NYAA_URL, cancel, params={}, timeout=1, backend="html", slot=None)
@@ -0,0 +1,40 @@
+from ani_me_downloader.core.anime import Anime, EpisodeSet, EpStatus
+from ani_me_downloader.state.merge import merge_anime
+
+
+def _library_anime(calls):
+    def loader():
+        calls.append(1)
+        return EpisodeSet.from_range(1, 4, EpStatus.DONE)
+
+    return Anime(1, "Show", episodes=EpisodeSet.deferred(loader, {EpStatus.DONE: 4}))
+
+
+def test_merge_adopts_the_pass_list_without_decoding_the_library_one():
+    calls = []
+    current = _library_anime(calls)
+    updated = current.copy()
+    updated.episodes.set(5, EpStatus.DOWNLOADING, "magnet:?xt=5")  # decoded on the pass
+    assert calls == [1]
+
+    merged = merge_anime(current, updated)
+    assert calls == [1]
+    assert merged.episodes.runs() == [(1, 4, EpStatus.DONE), (5, 5, EpStatus.DOWNLOADING)]
+
+
+def test_untouched_deferred_copies_compare_equal_without_decoding():
+    calls = []
+    current = _library_anime(calls)
+    assert current.copy().episodes == current.episodes
+    assert merge_anime(current, current.copy()) is current
+    assert calls == []
+
+
+def test_gui_side_terminal_states_still_win():
+    calls = []
+    current = _library_anime(calls)
+    updated = current.copy()
+    updated.episodes.set(5, EpStatus.DOWNLOADING, "magnet:?xt=5")
+    current.episodes.set(5, EpStatus.DONE)  # decodes: the GUI edited the list
+    merged = merge_anime(current, updated)
+    assert merged.episodes.get(5).status is EpStatus.DONE
@@ -0,0 +1,115 @@
+import threading
+import time
+
+import pytest
+
+from ani_me_downloader.metadata.cache import MAX_AGE, MetadataCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _cache(tmp_path, clock) -> MetadataCache:
+    return MetadataCache(tmp_path / "metadata.json", ttl={"airing": lambda: 600}, clock=clock)
+
+
+def _wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_fresh_entry_is_served_without_loading(tmp_path):
+    clock = Clock()
+    cache = _cache(tmp_path, clock)
+    assert cache.get("airing", "1", lambda: {"ep": 1}) == {"ep": 1}
+    clock.now += 599
+    assert cache.get("airing", "1", lambda: pytest.fail("loaded a fresh entry")) == {"ep": 1}
+    stats = cache.stats()
+    assert (stats.misses, stats.fresh) == (1, 1)
+
+
+def test_stale_entry_is_served_while_it_refreshes(tmp_path):
+    clock = Clock()
+    cache = _cache(tmp_path, clock)
+    cache.put("airing", "1", {"ep": 1})
+    clock.now += 601
+    release = threading.Event()
+
+    def load():
+        release.wait(5)
+        return {"ep": 2}
+
+    assert cache.get("airing", "1", load) == {"ep": 1}
+    assert cache.get("airing", "1", load) == {"ep": 1}  # one refresh in flight
+    release.set()
+    _wait_for(lambda: cache.get("airing", "1", load) == {"ep": 2})
+    assert cache.stats().stale >= 2
+
+
+def test_unusable_entry_is_reloaded(tmp_path):
+    cache = _cache(tmp_path, Clock())
+    cache.put("airing", "1", {"eta": 0})
+    got = cache.get("airing", "1", lambda: {"eta": 5}, usable=lambda v: v["eta"] > 0)
+    assert got == {"eta": 5}
+
+
+def test_entry_is_served_offline_when_loading_fails(tmp_path):
+    clock = Clock()
+    cache = _cache(tmp_path, clock)
+    cache.put("airing", "1", {"ep": 1})
+    cache.save()
+    clock.now += 86400
+
+    def down():
+        raise OSError("offline")
+
+    again = _cache(tmp_path, clock)
+    assert again.get("airing", "1", down, usable=lambda v: False) == {"ep": 1}
+    assert again.stats().offline == 1
+    with pytest.raises(OSError):
+        again.get("airing", "2", down)
+
+
+def test_save_drops_entries_past_max_age(tmp_path):
+    clock = Clock()
+    cache = _cache(tmp_path, clock)
+    cache.put("airing", "old", 1)
+    clock.now += MAX_AGE + 1
+    cache.put("airing", "new", 2)
+    cache.save()
+    assert _cache(tmp_path, clock).stats().entries == 1
+
+
+def test_misses_are_written_once_on_save(tmp_path, monkeypatch):
+    cache = _cache(tmp_path, Clock())
+    writes = []
+    monkeypatch.setattr("ani_me_downloader.metadata.cache.write_json_atomic",
+                        lambda path, data: writes.append(dict(data)))
+    for key in "123":
+        cache.get("airing", key, lambda: {"ep": 1})
+    assert writes == []
+    cache.save()
+    cache.save()  # nothing new since
+    assert [sorted(w) for w in writes] == [["airing:1", "airing:2", "airing:3"]]
+
+
+def test_flush_cache_saves_and_logs_stats(tmp_path, caplog):
+    from ani_me_downloader.metadata import orchestrator
+
+    cache = _cache(tmp_path, Clock())
+    cache.get("airing", "1", lambda: {"ep": 1})
+    orchestrator.use_cache(cache)
+    try:
+        with caplog.at_level("INFO", logger="ani_me_downloader.metadata.orchestrator"):
+            orchestrator.flush_cache()
+    finally:
+        orchestrator.use_cache(None)
+    assert (tmp_path / "metadata.json").exists()
+    assert "Metadata cache: 0% hit rate (0 fresh, 0 stale, 0 offline, 1 misses)" in caplog.text
@@ -0,0 +1,81 @@
+import pytest
+
+from ani_me_downloader.services.miss_cache import MissCache, burst_offsets
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _cache(tmp_path, clock, **kwargs) -> MissCache:
+    kwargs.setdefault("base", lambda: 100)
+    kwargs.setdefault("cap", lambda: 350)
+    return MissCache(tmp_path / "misses.json", jitter=0, clock=clock, **kwargs)
+
+
+def test_misses_back_off_exponentially_up_to_cap(tmp_path):
+    clock = Clock()
+    misses = _cache(tmp_path, clock)
+    assert [misses.miss(1, 5) for _ in range(4)] == [100, 200, 350, 350]
+    assert misses.ready(1, [5, 6]) == [6]
+    assert misses.retry_at(1, [5]) == clock.now + 350
+    assert misses.retry_at(1, [5, 6]) is None
+    clock.now += 350
+    assert misses.ready(1, [5]) == [5]
+
+
+def test_jitter_stays_within_bounds(tmp_path):
+    for rng in (0.0, 1.0):
+        misses = MissCache(tmp_path / "m.json", base=lambda: 100, jitter=0.2,
+                           clock=Clock(), rng=lambda: rng)
+        assert misses.miss(1, 1) == pytest.approx(80 if rng == 0 else 120)
+
+
+def test_hit_and_reset_clear_records(tmp_path):
+    misses = _cache(tmp_path, Clock())
+    misses.miss(1, 1)
+    misses.miss(1, 2)
+    misses.miss(2, 1)
+    misses.hit(1, 1)
+    assert misses.ready(1, [1, 2]) == [1]
+    misses.reset(1)
+    assert len(misses) == 1
+
+
+def test_records_survive_restart(tmp_path):
+    clock = Clock()
+    misses = _cache(tmp_path, clock)
+    misses.miss(1, 1)
+    misses.aired(1, 2, clock.now)
+    misses.save()
+    again = _cache(tmp_path, clock)
+    assert again.retry_at(1, [1]) == clock.now + 100
+    assert again.in_window(1, 1) is False
+
+
+def test_burst_offsets():
+    assert burst_offsets(900, [120, 300], 1800) == (900, 1020, 1320, 1620)
+    assert burst_offsets(900, [], 1800) == (900,)
+    assert burst_offsets(900, [60], 600) == ()
+
+
+def test_release_window_retries_at_burst_offsets(tmp_path):
+    clock = Clock()
+    aired_at = clock.now
+    budget = iter([True, True, False])
+    misses = _cache(tmp_path, clock, burst=lambda: (60, 180, 600),
+                    budget=lambda: next(budget))
+    misses.aired(1, 3, aired_at)
+    assert misses.in_window(1, 3)
+    assert misses.miss(1, 3) == 60
+    clock.now = aired_at + 60
+    assert misses.miss(1, 3) == 120
+    clock.now = aired_at + 180
+    # Out of budget: back off as usual; the window did not count as misses.
+    assert misses.miss(1, 3) == 100
+    clock.now = aired_at + 601
+    assert not misses.in_window(1, 3)
@@ -0,0 +1,108 @@
+import threading
+import time
+
+from ani_me_downloader.search.cache import SearchCache
+from ani_me_downloader.search.nyaa import NyaaResult
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def _results(tag: str) -> list[NyaaResult]:
+    return [NyaaResult(f"[Group] Show - 01 [{tag}]", f"magnet:{tag}", "1 GiB", 10)]
+
+
+def test_entries_expire_after_ttl():
+    clock = Clock()
+    cache = SearchCache(ttl=lambda: 60, clock=clock)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return _results(str(len(loads)))
+
+    assert cache.get_or_load("q", load) == _results("1")
+    clock.now = 59
+    assert cache.get_or_load("q", load) == _results("1")
+    clock.now = 60
+    assert cache.get_or_load("q", load) == _results("2")
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.expired) == (1, 2, 1)
+
+
+def test_empty_results_are_not_cached():
+    cache = SearchCache(ttl=lambda: 60)
+    loads = []
+    for _ in range(2):
+        cache.get_or_load("q", lambda: loads.append(1) or [])
+    assert len(loads) == 2
+
+
+def test_concurrent_lookups_share_one_load():
+    cache = SearchCache(ttl=lambda: 60)
+    started, release = threading.Event(), threading.Event()
+    loads = []
+
+    def load():
+        loads.append(1)
+        started.set()
+        release.wait(5)
+        return _results("x")
+
+    out = []
+    leader = threading.Thread(target=lambda: out.append(cache.get_or_load("q", load)))
+    leader.start()
+    assert started.wait(5)
+    followers = [
+        threading.Thread(target=lambda: out.append(cache.get_or_load("q", load)))
+        for _ in range(3)
+    ]
+    for t in followers:
+        t.start()
+    _wait_for(lambda: cache.stats().coalesced == 3)
+    release.set()
+    for t in (leader, *followers):
+        t.join(5)
+    assert loads == [1]
+    assert out == [_results("x")] * 4
+
+
+def test_followers_see_the_leaders_error():
+    cache = SearchCache(ttl=lambda: 60)
+    started, release = threading.Event(), threading.Event()
+
+    def load():
+        started.set()
+        release.wait(5)
+        raise OSError("offline")
+
+    errors = []
+
+    def lookup():
+        try:
+            cache.get_or_load("q", load)
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=lookup)]
+    threads[0].start()
+    assert started.wait(5)
+    threads.append(threading.Thread(target=lookup))
+    threads[1].start()
+    _wait_for(lambda: cache.stats().coalesced == 1)
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert len(errors) == 2
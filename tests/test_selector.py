@@ -0,0 +1,138 @@
+import itertools
+import re
+
+import pytest
+
+from ani_me_downloader.search.nyaa import NyaaResult
+from ani_me_downloader.search.release import ReleaseIndex, parse_release
+from ani_me_downloader.search.selector import library_matcher, select_torrents
+from ani_me_downloader.search.uploader_rules import DEFAULT_RULES, UploaderRule
+
+NAME, SEARCH_NAME = "Kusuriya no Hitorigoto", "The Apothecary Diaries"
+
+
+def _reference(results, *, name, search_name, season, episodes, rules):
+    """The selector spelled out: every title against every rule, per episode."""
+    n, sn = re.escape(name), re.escape(search_name)
+    regex = re.compile(rf"\b(1080p.*({n}|{sn})|({n}|{sn}).*1080p)\b", re.IGNORECASE)
+    picks = {}
+    for episode in episodes:
+        for r in results:
+            release = parse_release(r.title)
+            t = release.title_lower
+            if (release.resolution != 1080 or "vostfr" in release.languages
+                    or not regex.search(r.title)):
+                continue
+            present = [rule for rule in rules if rule.tag in t]
+            if episode is None:
+                season_ok = (release.season == season if season > 1
+                             else release.season in (None, 1))
+                ok = season_ok and any(
+                    rule.accepts_batch
+                    and (release.batch or any(k in t for k in rule.batch_keywords))
+                    for rule in present
+                )
+            else:
+                ok = any(
+                    rule.accepts_episodes
+                    and rule.episode_pattern.format(season=season, episode=episode) in t
+                    for rule in present
+                ) or release.episodes == (episode, episode) and (
+                    release.season == season if release.season is not None
+                    else season < 2 and f" e{episode:02d} " in t
+                )
+            if ok:
+                picks[episode] = r.magnet
+                break
+    return picks
+
+
+def _corpus() -> list[NyaaResult]:
+    titles = []
+    for ep, (group, fmt) in itertools.product(range(1, 26), [
+        ("[SubsPlease]", "{name} - {ep:02} (1080p) [ABCD1234].mkv"),
+        ("[Erai-raws]", "{name} - {ep:02} [1080p][Multiple Subtitle]"),
+        ("[Ember]", "{name} S02E{ep:02} 1080p x265 10bit"),
+        ("[ToonsHub]", "{name} E{ep} 1080p WEB-DL"),
+        ("[Judas]", "{name} S01E{ep:02} [1080p][HEVC x265 10bit]"),
+        ("[Other]", "{name} - {ep:02} VOSTFR 1080p"),
+        ("[Other]", "{name} - {ep:02} (720p)"),
+        ("[Other]", "{name} - {ep:02} (720p) (1080p)"),
+        ("[Other]", "{name} S02E{ep:02} [1080p]"),
+    ]):
+        for name in (NAME, SEARCH_NAME, "Another Show"):
+            titles.append(f"{group} {fmt.format(name=name, ep=ep)}")
+    titles += [
+        f"[Ember] {NAME} (Season 2) 1080p Batch",
+        f"[Ember] {NAME} 2nd Season 1080p Complete",
+        f"[Judas] {NAME} S01E01-12 [1080p]",
+        f"[Judas] {SEARCH_NAME} (Season 1) Complete 1080p",
+        f"[SubsPlease] {NAME} (01-12) (1080p) [Batch]",
+    ]
+    seeds = itertools.cycle([50, 3, 17, 120, 8, 0, 64])
+    rows = [
+        NyaaResult(t, f"magnet:?xt=urn:btih:{i:040x}", "1 GiB", next(seeds), i)
+        for i, t in enumerate(titles)
+    ]
+    return sorted(rows, key=lambda r: r.seeds, reverse=True)
+
+
+_NOT_INDEXABLE = DEFAULT_RULES + (UploaderRule("[asw]", "[ep{episode}]"),)
+
+
+@pytest.mark.parametrize("rules", [DEFAULT_RULES, _NOT_INDEXABLE], ids=["indexed", "scan"])
+@pytest.mark.parametrize("season", [1, 2])
+def test_select_torrents_matches_reference(rules, season):
+    results = _corpus()
+    episodes = [None, *range(1, 28)]
+    kwargs = dict(name=NAME, search_name=SEARCH_NAME, season=season,
+                  episodes=episodes, rules=rules)
+    expected = _reference(results, **kwargs)
+    assert expected  # the corpus exercises real picks
+    assert select_torrents(results, **kwargs) == expected
+    assert select_torrents(iter(results), **kwargs) == expected
+    assert select_torrents(ReleaseIndex(results), **kwargs) == expected
+
+
+def test_parse_release_fields():
+    release = parse_release("[SubsPlease] Show - 07 (1080p) x265 ")
+    assert release.group == "[subsplease]"
+    assert (release.season, release.episodes, release.resolution) == (None, (7, 7), 1080)
+    assert not release.batch
+    assert {7, 265, 65, 5} <= release.numbers
+    assert "vostfr" in parse_release("[X] Show - 01 VOSTFR 1080p").languages
+
+    release = parse_release("[Judas] Show 2nd Season S02E01-12 [1080p]")
+    assert (release.season, release.episodes, release.batch) == (2, (1, 12), True)
+    release = parse_release("[Ember] Show (Season 3) 720p Batch")
+    assert (release.season, release.episodes, release.resolution) == (3, None, 720)
+    assert release.batch and release.group == "[ember]"
+    assert parse_release("Show E05 BD1080p").resolution == 1080
+    assert parse_release("Show 05").group == ""
+
+
+def test_library_matcher_needs_name_and_resolution():
+    owned = library_matcher([(NAME, SEARCH_NAME), ("Frieren", "")])
+    assert owned(f"[SubsPlease] {SEARCH_NAME} - 03 (1080p)")
+    assert owned("[SubsPlease] Frieren - 03 (1080p)")
+    assert not owned("[SubsPlease] Frieren - 03 (720p)")
+    assert not owned("[SubsPlease] Another Show - 03 (1080p)")
+
+
+def test_parsed_season_decides_fallback_and_batch_picks():
+    def row(title, i):
+        return NyaaResult(title, f"magnet:?xt=urn:btih:{i:040x}", "1 GiB", 10 - i, i)
+
+    results = [
+        row(f"[Other] {NAME} S02E07 [1080p]", 1),
+        row(f"[Ember] {NAME} 2nd Season 1080p Complete", 2),
+        row(f"[Ember] {NAME} (720p) (1080p) Batch", 3),
+    ]
+
+    def pick(season):
+        return select_torrents(
+            results, name=NAME, search_name=SEARCH_NAME, season=season, episodes=[None, 7]
+        )
+
+    assert pick(2) == {7: results[0].magnet, None: results[1].magnet}
+    assert pick(1) == {}
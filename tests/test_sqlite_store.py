@@ -0,0 +1,94 @@
+import pytest
+
+from ani_me_downloader.core.anime import Anime, EpisodeSet, EpStatus
+from ani_me_downloader.core.torrent import Torrent
+from ani_me_downloader.persistence import sqlite_store
+from ani_me_downloader.persistence.sqlite_store import (
+    SqliteStateStore,
+    SqliteStore,
+    export_json,
+    import_json,
+)
+from ani_me_downloader.persistence.state_store import JsonStateStore
+
+
+@pytest.fixture
+def json_files(tmp_path):
+    files = tmp_path / "anime.json", tmp_path / "torrent.json"
+    JsonStateStore(*files).save(
+        [Anime(i, f"anime {i}", episodes=EpisodeSet.from_range(1, 3, EpStatus.DONE))
+         for i in range(1, 4)],
+        [Torrent("ab" * 20, "magnet:?xt=urn:btih:" + "ab" * 20, "t", "/tmp", {1})],
+    )
+    return files
+
+
+def test_import_json_copies_both_collections(tmp_path, json_files):
+    store = SqliteStore(tmp_path / "state.db")
+    assert import_json(store, *json_files)
+    state = SqliteStateStore(store)
+    animes, torrents = state.load()
+    assert [a.id for a in animes] == [1, 2, 3]
+    assert animes[0].episodes.runs() == [(1, 3, EpStatus.DONE)]
+    assert torrents[0].anime_ids == {1}
+    assert state.consistent
+    assert not import_json(store, *json_files)
+
+
+def test_failed_import_leaves_nothing_behind(tmp_path, json_files, monkeypatch):
+    store = SqliteStore(tmp_path / "state.db")
+
+    def fail(self, conn):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as m:
+        m.setattr(sqlite_store.SqliteTorrentRepository, "write", fail)
+        with pytest.raises(OSError):
+            import_json(store, *json_files)
+    assert store.conn.execute("SELECT COUNT(*) FROM anime").fetchone() == (0,)
+    assert store.get_meta("imported_json") is None
+    assert import_json(store, *json_files)
+
+
+def _open(tmp_path, json_files, backend):
+    """What app._state_store does at start for `backend`."""
+    if backend == "sqlite":
+        store = SqliteStore(tmp_path / "state.db")
+        import_json(store, *json_files)
+        return SqliteStateStore(store)
+    if (tmp_path / "state.db").exists():
+        store = SqliteStore(tmp_path / "state.db")
+        export_json(store, *json_files)
+        store.close()
+    return JsonStateStore(*json_files)
+
+
+def _add(state, aid):
+    animes, torrents = state.load()
+    animes.append(Anime(aid, f"anime {aid}", episodes=EpisodeSet.from_range(1, 2, EpStatus.DONE)))
+    ih = f"{aid:040x}"
+    torrents.append(Torrent(ih, "magnet:?xt=urn:btih:" + ih, "t", "/tmp", {aid}))
+    state.save(animes, torrents)
+    state.close()
+
+
+def test_switching_backends_carries_the_library_both_ways(tmp_path, json_files):
+    for aid, backend in enumerate(["sqlite", "json", "sqlite", "json"], start=10):
+        _add(_open(tmp_path, json_files, backend), aid)
+    for backend in ("sqlite", "json"):
+        state = _open(tmp_path, json_files, backend)
+        animes, torrents = state.load()
+        assert [a.id for a in animes] == [1, 2, 3, 10, 11, 12, 13], backend
+        assert {t.info_hash for t in torrents} >= {f"{aid:040x}" for aid in (10, 11, 12, 13)}
+        assert animes[-1].episodes.runs() == [(1, 2, EpStatus.DONE)]
+        state.close()
+
+
+def test_torrents_without_animes_are_imported(tmp_path):
+    files = tmp_path / "anime.json", tmp_path / "torrent.json"
+    JsonStateStore(*files).save(
+        [], [Torrent("cd" * 20, "magnet:?xt=urn:btih:" + "cd" * 20, "t", "/tmp", set())]
+    )
+    store = SqliteStore(tmp_path / "state.db")
+    assert import_json(store, *files)
+    assert [t.info_hash for t in SqliteStateStore(store).load()[1]] == ["cd" * 20]